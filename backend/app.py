@@ -1,13 +1,45 @@
-from fastapi import FastAPI, Query, Body, Request
-from fastapi.responses import JSONResponse
-import yfinance as yf
-import pandas as pd
+import asyncio
+import base64
+import contextvars
+import json
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Query, Body, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from typing import Optional, Dict, List
 from fastapi.middleware.cors import CORSMiddleware
 import numpy as np
 from pydantic import BaseModel
+import backtest
+import calendars
+import live
+import market_data
+import metrics
+import montecarlo
+import optimizer
+import portfolio
+import workers
+from encoding import FormatError, encode_columns, negotiate_format
+from errors import RequestError
+from pipeline import (
+    FetchedInputs, StageTimings, StrategyDataError, check_request, pipeline, select_strike, validate_quote,
+)
+from pricing import RISK_FREE_RATE, chain_greeks, leg_vols, legs_value_grid, years_to_expiry
+from payoff import (
+    STRATEGY_NAMES, LegArrays, legs_pnl, payoff_summary, price_grid, rounded_list, strategy_leg_arrays, pnl_rows,
+)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # A restarted worker picks up the chains it stored before going down
+    market_data.warm_cache()
+    yield
+    workers.shutdown_pools()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,9 +47,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
-LOT_SIZE = 100
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Request counts and latency per route template; stage spans recorded by the pipeline
+    # during the request go into a Server-Timing header when it's asked for
+    start = time.perf_counter()
+    spans, token = metrics.start_request_spans()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        metrics.end_request_spans(token)
+        elapsed = time.perf_counter() - start
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        metrics.http_requests.inc(path, request.method, str(status))
+        metrics.http_request_seconds.observe(elapsed, path, request.method)
+    if metrics.wants_server_timing(request.headers):
+        response.headers["Server-Timing"] = metrics.server_timing_header(spans, elapsed)
+    return response
+
 
 def normalize_premiums(premium_dict):
     if not premium_dict:
@@ -37,7 +91,7 @@ class PremiumData(BaseModel):
     puts: Dict[float, float] = {}   # {strike: premium}
 
 class OptionLeg(BaseModel):
-    type: str  # "call" or "put"
+    type: str  # "call", "put" or "stock" (premium is the entry price)
     strike: float
     expiry: str  # in ISO format like "2025-06-27"
     action: str  # "buy" or "sell"
@@ -48,460 +102,71 @@ class StrategyRequest(BaseModel):
     spot_price: float
     legs: List[OptionLeg]
 
-class OptionStrategies:
-    def __init__(self, price, selected_strike, current_price, calls, puts, user_premiums=None, user_strategy_premiums=None):
-        self.price = price
-        self.selected_strike = selected_strike
-        self.current_price = current_price
-        self.calls = calls
-        self.puts = puts
-        self.user_premiums = user_premiums
-        self.user_strategy_premiums = user_strategy_premiums or {}
-        self.available_call_strikes = set(self.calls['strike'].values)
-        self.available_put_strikes = set(self.puts['strike'].values)
-
-    def get_price(self, df, strike, is_call=True):
-        strike = float(strike)
-        premium_type = "calls" if is_call else "puts"
-        # Custom premium check (calls/puts by strike)
-        if self.user_premiums:
-            premium_dict = self.user_premiums.calls if is_call else self.user_premiums.puts
-            if strike in premium_dict:
-                premium = round(premium_dict[strike], 3)
-                return premium
-        # Fallback to market data
-        row = df[df['strike'] == strike]
-        if not row.empty:
-            bid = row.iloc[0].get('bid', np.nan)
-            ask = row.iloc[0].get('ask', np.nan)
-            if not pd.isna(bid) and not pd.isna(ask) and bid > 0 and ask > 0:
-                premium = round((bid + ask) / 2, 3)
-                return premium
-            else:
-                premium = round(row.iloc[0]['lastPrice'], 3)
-                return premium
-        available_strikes = self.available_call_strikes if is_call else self.available_put_strikes
-        if not available_strikes:
-            return 0.0
-        closest_strike = min(available_strikes, key=lambda x: abs(x - strike))
-        row = df[df['strike'] == closest_strike]
-        if not row.empty:
-            bid = row.iloc[0].get('bid', np.nan)
-            ask = row.iloc[0].get('ask', np.nan)
-            if not pd.isna(bid) and not pd.isna(ask) and bid > 0 and ask > 0:
-                premium = round((bid + ask) / 2, 3)
-                return premium
-            else:
-                premium = round(row.iloc[0]['lastPrice'], 3)
-                return premium
-        return 0.0
-
-    def get_nearest_strike(self, target_strike, is_call=True):
-        strikes = self.available_call_strikes if is_call else self.available_put_strikes
-        if not strikes:
-            return target_strike
-        return min(strikes, key=lambda x: abs(x - target_strike))
-    
-    def premium_breakdown(self):
-        breakdown = {}
-
-        # Long Call
-        call_price = self.get_price(self.calls, self.selected_strike, is_call=True)
-        breakdown["long_call"] = {
-            "call_strike": self.selected_strike,
-            "call_premium": call_price
-        }
-
-        # Covered Call (modified)
-        call_strike = self.get_nearest_strike(self.selected_strike + 5, is_call=True)
-        call_price_covered = self.get_price(self.calls, call_strike, is_call=True)
-        breakdown["covered_call"] = {
-            "call_strike": call_strike,
-            "call_premium": call_price_covered
-        }
-
-        # Long Put 
-        put_price = self.get_price(self.puts, self.selected_strike, is_call=False)
-        breakdown["long_put"] = {
-            "put_strike": self.selected_strike,
-            "put_premium": put_price
-        }
-        # Protective Put (modified)
-        put_strike = self.get_nearest_strike(self.selected_strike - 5, is_call=False)
-        put_price_protect = self.get_price(self.puts, put_strike, is_call=False)
-        breakdown["protective_put"] = {
-            "put_strike": put_strike,
-            "put_premium": put_price_protect
-        }
-
-        # Straddle
-        breakdown["straddle"] = {
-            "call_strike": self.selected_strike,
-            "call_premium": call_price,
-            "put_strike": self.selected_strike,
-            "put_premium": put_price
-        }
-
-        # Strangle
-        call_strike_strangle = self.get_nearest_strike(self.selected_strike + 5, is_call=True)
-        put_strike_strangle = self.get_nearest_strike(self.selected_strike - 5, is_call=False)
-        call_premium_strangle = self.get_price(self.calls, call_strike_strangle, is_call=True)
-        put_premium_strangle = self.get_price(self.puts, put_strike_strangle, is_call=False)
-        breakdown["strangle"] = {
-            "call_strike": call_strike_strangle,
-            "call_premium": call_premium_strangle,
-            "put_strike": put_strike_strangle,
-            "put_premium": put_premium_strangle
-        }
+class BatchScenario(BaseModel):
+    ticker: str
+    expiry: Optional[str] = None
+    strike: Optional[float] = None
 
-        # Bull Call Spread (Debit)
-        upper = self.get_nearest_strike(self.selected_strike + 10, is_call=True)
-        lower_price = call_price
-        upper_price = self.get_price(self.calls, upper, is_call=True)
-        breakdown["bull_call_spread"] = {
-            "buy_strike": self.selected_strike,
-            "buy_premium": lower_price,
-            "sell_strike": upper,
-            "sell_premium": upper_price
-        }
+class BatchRequest(BaseModel):
+    scenarios: List[BatchScenario]
 
-        # Bear Put Spread (Debit)
-        higher = self.get_nearest_strike(self.selected_strike + 10, is_call=False)
-        premium_bought = self.get_price(self.puts, higher, is_call=False)
-        premium_sold = put_price
-        breakdown["bear_put_spread"] = {
-            "buy_strike": higher,
-            "buy_premium": premium_bought,
-            "sell_strike": self.selected_strike,
-            "sell_premium": premium_sold
-        }
+MAX_BATCH_SCENARIOS = 500
 
-        # Bear Call Spread (Credit)
-        lower_bear_call = self.selected_strike - 10
-        premium_sold_bear_call = self.get_price(self.calls, lower_bear_call, is_call=True)
-        premium_bought_bear_call = call_price
-        breakdown["bear_call_spread"] = {
-            "sell_strike": lower_bear_call,
-            "sell_premium": premium_sold_bear_call,
-            "buy_strike": self.selected_strike,
-            "buy_premium": premium_bought_bear_call
-        }
+class PortfolioPosition(BaseModel):
+    ticker: str
+    legs: List[OptionLeg]
+    label: Optional[str] = None
 
-        # Bull Put Spread (Credit)
-        lower_bull_put = self.selected_strike
-        higher_bull_put = lower_bull_put + 10
-        premium_sold_bull_put = put_price
-        premium_bought_bull_put = self.get_price(self.puts, higher_bull_put, is_call=False)
-        breakdown["bull_put_spread"] = {
-            "sell_strike": lower_bull_put,
-            "sell_premium": premium_sold_bull_put,
-            "buy_strike": higher_bull_put,
-            "buy_premium": premium_bought_bull_put
-        }
+class PortfolioRequest(BaseModel):
+    positions: List[PortfolioPosition]
+    shocks: Optional[List[float]] = None  # spot moves as fractions, e.g. -0.1 for -10%
 
-        # Iron Condor
-        put_sell = self.get_nearest_strike(self.selected_strike - 5, is_call=False)
-        put_buy = self.get_nearest_strike(put_sell - 5, is_call=False)
-        call_sell = self.get_nearest_strike(self.selected_strike + 5, is_call=True)
-        call_buy = self.get_nearest_strike(call_sell + 5, is_call=True)
-        breakdown["iron_condor"] = {
-            "put_buy_strike": put_buy,
-            "put_buy_premium": self.get_price(self.puts, put_buy, is_call=False),
-            "put_sell_strike": put_sell,
-            "put_sell_premium": self.get_price(self.puts, put_sell, is_call=False),
-            "call_sell_strike": call_sell,
-            "call_sell_premium": self.get_price(self.calls, call_sell, is_call=True),
-            "call_buy_strike": call_buy,
-            "call_buy_premium": self.get_price(self.calls, call_buy, is_call=True)
-        }
+class BacktestRequest(BaseModel):
+    tickers: List[str]
+    strategy: str
+    start: Optional[str] = None
+    end: Optional[str] = None
+    min_days_to_expiry: int = 1
 
-        # Butterfly Spread
-        lower_butterfly = self.get_nearest_strike(self.selected_strike - 10, is_call=True)
-        upper_butterfly = self.get_nearest_strike(self.selected_strike + 10, is_call=True)
-        lower_price_butterfly = self.get_price(self.calls, lower_butterfly, is_call=True)
-        center_price_butterfly = call_price
-        upper_price_butterfly = self.get_price(self.calls, upper_butterfly, is_call=True)
-        breakdown["butterfly_spread"] = {
-            "buy_lower_strike": lower_butterfly,
-            "buy_lower_premium": lower_price_butterfly,
-            "sell_center_strike": self.selected_strike,
-            "sell_center_premium": center_price_butterfly,
-            "buy_upper_strike": upper_butterfly,
-            "buy_upper_premium": upper_price_butterfly
-        }
+def render(evaluation, fmt, timings):
+    # Serialized and JSON encoded in the calling thread, so endpoints can keep both off the event loop
+    body = pipeline.serialize(evaluation, fmt, timings)
+    return body if isinstance(body, Response) else JSONResponse(jsonable_encoder(body))
 
-        return breakdown
-
-    def long_call(self):
-        strat_prem = self.user_strategy_premiums.get("long_call", {})
-        call_price = strat_prem.get("call_premium")
-        if call_price is None:
-            call_price = self.get_price(self.calls, self.selected_strike, is_call=True)
-        profit = (max(self.price - self.selected_strike, 0) - call_price) * LOT_SIZE
-        return round(profit, 3)
-
-    def long_put(self):
-        strat_prem = self.user_strategy_premiums.get("long_put", {})
-        put_price = strat_prem.get("put_premium")
-        if put_price is None:
-            put_price = self.get_price(self.puts, self.selected_strike, is_call=False)
-        profit = (max(self.selected_strike - self.price, 0) - put_price) * LOT_SIZE
-        return round(profit, 3)
-
-    def covered_call(self):
-        strat_prem = self.user_strategy_premiums.get("covered_call", {})
-        call_strike = self.get_nearest_strike(self.selected_strike + 5, is_call=True)
-        call_price = strat_prem.get("call_premium")
-        if call_price is None:
-            call_price = self.get_price(self.calls, call_strike, is_call=True)
-        profit = ((self.price - self.current_price) + call_price - max(self.price - call_strike, 0)) * LOT_SIZE
-        return round(profit, 3)
-
-    def protective_put(self):
-        strat_prem = self.user_strategy_premiums.get("protective_put", {})
-        put_strike = self.get_nearest_strike(self.selected_strike - 5, is_call=False)
-        put_price = strat_prem.get("put_premium")
-        if put_price is None:
-            put_price = self.get_price(self.puts, put_strike, is_call=False)
-        profit = ((self.price - self.current_price) - put_price + max(put_strike - self.price, 0)) * LOT_SIZE
-        return round(profit, 3)
-
-    def straddle(self):
-        strat_prem = self.user_strategy_premiums.get("straddle", {})
-        call_price = strat_prem.get("call_premium")
-        put_price = strat_prem.get("put_premium")
-        if call_price is None:
-            call_price = self.get_price(self.calls, self.selected_strike, is_call=True)
-        if put_price is None:
-            put_price = self.get_price(self.puts, self.selected_strike, is_call=False)
-        profit = (max(self.price - self.selected_strike, 0) + max(self.selected_strike - self.price, 0) - call_price - put_price) * LOT_SIZE
-        return round(profit, 3)
-
-    def strangle(self):
-        strat_prem = self.user_strategy_premiums.get("strangle", {})
-        call_strike = self.get_nearest_strike(self.selected_strike + 5, is_call=True)
-        put_strike = self.get_nearest_strike(self.selected_strike - 5, is_call=False)
-        call_premium = strat_prem.get("call_premium")
-        put_premium = strat_prem.get("put_premium")
-        if call_premium is None:
-            call_premium = self.get_price(self.calls, call_strike, is_call=True)
-        if put_premium is None:
-            put_premium = self.get_price(self.puts, put_strike, is_call=False)
-        profit_per_unit = (max(self.price - call_strike, 0) + max(put_strike - self.price, 0) - (call_premium + put_premium))
-        return round(profit_per_unit * LOT_SIZE, 2)
-
-    def bull_call_spread(self):
-        strat_prem = self.user_strategy_premiums.get("bull_call_spread", {})
-        lower = self.selected_strike
-        upper = self.get_nearest_strike(lower + 10, is_call=True)
-        lower_price = strat_prem.get("buy_premium")
-        upper_price = strat_prem.get("sell_premium")
-        if lower_price is None:
-            lower_price = self.get_price(self.calls, lower, is_call=True)
-        if upper_price is None:
-            upper_price = self.get_price(self.calls, upper, is_call=True)
-        profit = (max(self.price - lower, 0) - max(self.price - upper, 0) - (lower_price - upper_price)) * LOT_SIZE
-        return round(profit, 3)
-
-    def bear_put_spread(self):
-        strat_prem = self.user_strategy_premiums.get("bear_put_spread", {})
-        lower = self.selected_strike
-        higher = self.get_nearest_strike(lower + 10, is_call=False)
-        premium_bought = strat_prem.get("buy_premium")
-        premium_sold = strat_prem.get("sell_premium")
-        if premium_bought is None:
-            premium_bought = self.get_price(self.puts, higher, is_call=False)
-        if premium_sold is None:
-            premium_sold = self.get_price(self.puts, lower, is_call=False)
-        net_payoff = max(higher - self.price, 0) - max(lower - self.price, 0)
-        profit_per_unit = net_payoff - (premium_bought - premium_sold)
-        return round(profit_per_unit * LOT_SIZE, 2)
-
-    def bear_call_spread(self):
-        strat_prem = self.user_strategy_premiums.get("bear_call_spread", {})
-        upper = self.selected_strike
-        lower = upper - 10
-        premium_sold = strat_prem.get("sell_premium")
-        premium_bought = strat_prem.get("buy_premium")
-        if premium_sold is None:
-            premium_sold = self.get_price(self.calls, lower, is_call=True)
-        if premium_bought is None:
-            premium_bought = self.get_price(self.calls, upper, is_call=True)
-        net_payoff = max(self.price - lower, 0) - max(self.price - upper, 0)
-        profit_per_unit = (premium_sold - premium_bought) - net_payoff
-        return round(profit_per_unit * LOT_SIZE, 2)
-
-    def bull_put_spread(self):
-        strat_prem = self.user_strategy_premiums.get("bull_put_spread", {})
-        lower = self.selected_strike
-        higher = lower + 10
-        premium_sold = strat_prem.get("sell_premium")
-        premium_bought = strat_prem.get("buy_premium")
-        if premium_sold is None:
-            premium_sold = self.get_price(self.puts, lower, is_call=False)
-        if premium_bought is None:
-            premium_bought = self.get_price(self.puts, higher, is_call=False)
-        net_payoff = max(lower - self.price, 0) - max(higher - self.price, 0)
-        profit_per_unit = (premium_sold - premium_bought) - net_payoff
-        return round(profit_per_unit * LOT_SIZE, 2)
-
-    def iron_condor(self):
-        strat_prem = self.user_strategy_premiums.get("iron_condor", {})
-        put_sell = self.get_nearest_strike(round(self.selected_strike - 5, 2), is_call=False)
-        put_buy = self.get_nearest_strike(round(put_sell - 5, 2), is_call=False)
-        call_sell = self.get_nearest_strike(round(self.selected_strike + 5, 2), is_call=True)
-        call_buy = self.get_nearest_strike(round(call_sell + 5, 2), is_call=True)
-        premium_put_sell = strat_prem.get("put_sell_premium")
-        premium_put_buy = strat_prem.get("put_buy_premium")
-        premium_call_sell = strat_prem.get("call_sell_premium")
-        premium_call_buy = strat_prem.get("call_buy_premium")
-        if premium_put_sell is None:
-            premium_put_sell = self.get_price(self.puts, put_sell, is_call=False)
-        if premium_put_buy is None:
-            premium_put_buy = self.get_price(self.puts, put_buy, is_call=False)
-        if premium_call_sell is None:
-            premium_call_sell = self.get_price(self.calls, call_sell, is_call=True)
-        if premium_call_buy is None:
-            premium_call_buy = self.get_price(self.calls, call_buy, is_call=True)
-
-        net_credit = premium_put_sell - premium_put_buy + premium_call_sell - premium_call_buy
-
-        if self.price <= put_buy:
-            profit = (net_credit - (put_sell - put_buy)) * LOT_SIZE
-        elif self.price <= put_sell:
-            profit = (net_credit - (put_sell - self.price)) * LOT_SIZE
-        elif self.price <= call_sell:
-            profit = net_credit * LOT_SIZE
-        elif self.price <= call_buy:
-            profit = (net_credit - (self.price - call_sell)) * LOT_SIZE
-        else:
-            profit = (net_credit - (call_buy - call_sell)) * LOT_SIZE
-
-        return round(profit, 3)
-
-    def butterfly_spread(self):
-        strat_prem = self.user_strategy_premiums.get("butterfly_spread", {})
-        center = self.selected_strike
-        lower = self.get_nearest_strike(center - 10, is_call=True)
-        upper = self.get_nearest_strike(center + 10, is_call=True)
-        lower_price = strat_prem.get("buy_lower_premium")
-        center_price = strat_prem.get("sell_center_premium")
-        upper_price = strat_prem.get("buy_upper_premium")
-        if lower_price is None:
-            lower_price = self.get_price(self.calls, lower, is_call=True)
-        if center_price is None:
-            center_price = self.get_price(self.calls, center, is_call=True)
-        if upper_price is None:
-            upper_price = self.get_price(self.calls, upper, is_call=True)
-        net_debit = lower_price + upper_price - 2 * center_price
-        lower_call_payoff = max(self.price - lower, 0)
-        center_call_payoff = max(self.price - center, 0)
-        upper_call_payoff = max(self.price - upper, 0)
-        net_payoff = lower_call_payoff + upper_call_payoff - 2 * center_call_payoff
-        profit = (net_payoff - net_debit) * LOT_SIZE
-        return round(profit, 2)
 
 @app.get("/options-strategy-pnl")
-def get_strategy_pnl(
+async def get_strategy_pnl(
     ticker: str = Query(...), 
     expiry: Optional[str] = Query(None), 
-    strike: Optional[float] = Query(None)
+    strike: Optional[float] = Query(None),
+    response_format: Optional[str] = Query(None, alias="format"),
+    request: Request = None
 ):
+    timings = StageTimings()
     try:
-        stock = yf.Ticker(ticker.upper())
-        current_price = stock.history(period='1d')['Close'].iloc[-1]
-        if pd.isna(current_price) or current_price <= 0:
-            return JSONResponse({"error": f"Invalid price data for {ticker}."}, status_code=400)
-
-        expiry_list = stock.options
-        if not expiry_list:
-            return JSONResponse({"error": "No options data available."}, status_code=400)
-
-        available_expiries = expiry_list[:4]
-        selected_expiry = expiry if expiry in expiry_list else expiry_list[0]
-        opt_chain = stock.option_chain(selected_expiry)
-        calls = opt_chain.calls
-        puts = opt_chain.puts
-
-        valid_call_strikes = set(calls['strike'])
-        valid_put_strikes = set(puts['strike'])
-        valid_strikes = sorted(valid_call_strikes.union(valid_put_strikes))
-
-        atm_strike = min(valid_strikes, key=lambda x: abs(x - current_price))
-        selected_strike = strike if strike in valid_strikes else atm_strike
-
-        atm_index = valid_strikes.index(atm_strike)
-        start_idx = max(0, atm_index - 7)
-        end_idx = min(len(valid_strikes), atm_index + 8)
-        available_strikes = valid_strikes[start_idx:end_idx]
-
-        lower_bound = selected_strike * 0.9
-        upper_bound = selected_strike * 1.1
-        price_points = [s for s in valid_strikes if lower_bound <= s <= upper_bound]
-
-        results = []
-        for price in price_points:
-            row = {'Price at Expiry': f"${round(price, 2)}"}
-            strategies = OptionStrategies(price, selected_strike, current_price, calls, puts)
-            for strat in [
-                "long_call", "long_put", "covered_call", "protective_put",
-                "straddle", "strangle", "bull_call_spread", "bear_put_spread",
-                "bear_call_spread", "bull_put_spread", "iron_condor", "butterfly_spread"
-            ]:
-                try:
-                    pnl = getattr(strategies, strat)()
-                    row[strat] = round(pnl, 2) if pnl is not None else "N/A"
-                except Exception:
-                    row[strat] = "N/A"
-            row['premium_breakdown'] = strategies.premium_breakdown()
-            results.append(row)
-
-        df = pd.DataFrame(results)
-
-        call_premiums = {}
-        put_premiums = {}
-
-        for strike in sorted(valid_call_strikes):
-            row = calls[calls['strike'] == strike]
-            if not row.empty:
-                bid = row.iloc[0].get('bid', np.nan)
-                ask = row.iloc[0].get('ask', np.nan)
-                mid_price = (bid + ask) / 2 if bid > 0 and ask > 0 else row.iloc[0]['lastPrice']
-                call_premiums[round(strike, 2)] = round(mid_price, 3)
-
-        for strike in sorted(valid_put_strikes):
-            row = puts[puts['strike'] == strike]
-            if not row.empty:
-                bid = row.iloc[0].get('bid', np.nan)
-                ask = row.iloc[0].get('ask', np.nan)
-                mid_price = (bid + ask) / 2 if bid > 0 and ask > 0 else row.iloc[0]['lastPrice']
-                put_premiums[round(strike, 2)] = round(mid_price, 3)
-
-        return {
-            "ticker": ticker.upper(),
-            "current_price": round(current_price, 2),
-            "atm_strike": round(atm_strike, 2),
-            "selected_strike": round(selected_strike, 2),
-            "expiry": selected_expiry,
-            "available_expiries": available_expiries,
-            "available_strikes": [round(s, 2) for s in available_strikes],
-            "strategies": df.to_dict(orient="records"),
-            "premiums": {
-                "calls": call_premiums,
-                "puts": put_premiums
-            }
-        }
-
+        fmt = negotiate_format(request.headers.get("accept") if request else None, response_format)
+        evaluation = await pipeline.run(ticker, expiry, strike, timings=timings)
+        evaluation.payload["context_id"] = pipeline.open_session(evaluation)
+        return await asyncio.get_running_loop().run_in_executor(None, render, evaluation, fmt, timings)
+    except RequestError as e:
+        return JSONResponse({"error": e.message}, status_code=e.status_code)
     except Exception as e:
         return JSONResponse(content={"error": f"An error occurred: {str(e)}"}, status_code=500)
+    finally:
+        pipeline.record(timings, "/options-strategy-pnl")
 
 @app.post("/options-strategy-pnl-custom")
 async def get_strategy_pnl_custom(
     ticker: str = Query(...),
     expiry: Optional[str] = Query(None),
     strike: Optional[float] = Query(None),
+    response_format: Optional[str] = Query(None, alias="format"),
     request: Request = None
 ):
+    try:
+        fmt = negotiate_format(request.headers.get("accept"), response_format)
+    except FormatError as e:
+        return JSONResponse({"error": e.message}, status_code=e.status_code)
     json_body = await request.json()
     premium_data = None
     strategy_premiums = {}
@@ -514,104 +179,522 @@ async def get_strategy_pnl_custom(
     else:
         strategy_premiums = json_body  # e.g. {"bull_call_spread": {"buy_premium": ...}}
 
+    timings = StageTimings()
+    try:
+        # Only evaluate re-runs when the chain and resolved legs are still cached
+        evaluation = await pipeline.run(
+            ticker, expiry, strike, premium_data=premium_data, strategy_premiums=strategy_premiums, timings=timings
+        )
+        evaluation.payload["user_provided_premiums"] = {
+            "calls": premium_data.calls if premium_data else {},
+            "puts": premium_data.puts if premium_data else {},
+        }
+        evaluation.payload["context_id"] = pipeline.open_session(evaluation)
+        return await asyncio.get_running_loop().run_in_executor(None, render, evaluation, fmt, timings)
+
+    except StrategyDataError as e:
+        return JSONResponse({"error": e.message}, status_code=e.status_code)
+    except Exception as e:
+        return JSONResponse(content={"error": f"An error occurred: {str(e)}"}, status_code=500)
+    finally:
+        pipeline.record(timings, "/options-strategy-pnl-custom")
+
+
+@app.post("/options-strategy-pnl-delta")
+async def get_strategy_pnl_delta(
+    context_id: str = Query(...),
+    delta: Dict[str, Optional[Dict[str, Optional[float]]]] = Body(...),
+):
+    # Premium edits against a context returned by the GET/custom endpoints,
+    # e.g. {"bull_call_spread": {"sell_premium": 1.2}}; only those columns come back
+    timings = StageTimings()
+    try:
+        return pipeline.apply_delta(context_id, delta, timings)
+    except StrategyDataError as e:
+        return JSONResponse({"error": e.message}, status_code=e.status_code)
+    except Exception as e:
+        return JSONResponse(content={"error": f"An error occurred: {str(e)}"}, status_code=500)
+    finally:
+        pipeline.record(timings, "/options-strategy-pnl-delta")
+
+
+async def _fetch_batch_inputs(scenarios):
+    # Every distinct ticker and chain is fetched once, however many scenarios share it
+    async def settle(coro):
+        try:
+            return await coro
+        except Exception as e:
+            return e
+
+    tickers = sorted({s.ticker.upper() for s in scenarios})
+    fetched = await asyncio.gather(*[
+        settle(asyncio.gather(market_data.fetch_spot(t), market_data.fetch_expiries(t))) for t in tickers
+    ])
+    quotes = dict(zip(tickers, fetched))
+
+    chain_keys = set()
+    for s in scenarios:
+        quote = quotes[s.ticker.upper()]
+        if isinstance(quote, Exception) or not quote[1]:
+            continue
+        expiry_list = quote[1]
+        chain_keys.add((s.ticker.upper(), s.expiry if s.expiry in expiry_list else expiry_list[0]))
+    chain_keys = sorted(chain_keys)
+    chains = await asyncio.gather(*[settle(market_data.fetch_option_chain(t, e)) for t, e in chain_keys])
+    return quotes, dict(zip(chain_keys, chains))
+
+
+def _evaluate_batch_scenario(index, scenario, quotes, chains):
+    line = {"index": index, "scenario": scenario.model_dump()}
     try:
-        stock = yf.Ticker(ticker.upper())
-        current_price = stock.history(period='1d')['Close'].iloc[-1]
-        if pd.isna(current_price) or current_price <= 0:
-            return JSONResponse({"error": f"Invalid price data for {ticker}."}, status_code=400)
-
-        expiry_list = stock.options
-        if not expiry_list:
-            return JSONResponse({"error": "No options data available."}, status_code=400)
-
-        available_expiries = expiry_list[:4]
-        selected_expiry = expiry if expiry in expiry_list else expiry_list[0]
-        opt_chain = stock.option_chain(selected_expiry)
-        calls = opt_chain.calls
-        puts = opt_chain.puts
-
-        valid_call_strikes = set(calls['strike'])
-        valid_put_strikes = set(puts['strike'])
-        valid_strikes = sorted(valid_call_strikes.union(valid_put_strikes))
-
-        atm_strike = min(valid_strikes, key=lambda x: abs(x - current_price))
-        selected_strike = strike if strike in valid_strikes else atm_strike
-
-        atm_index = valid_strikes.index(atm_strike)
-        start_idx = max(0, atm_index - 7)
-        end_idx = min(len(valid_strikes), atm_index + 8)
-        available_strikes = valid_strikes[start_idx:end_idx]
-
-        lower_bound = selected_strike * 0.9
-        upper_bound = selected_strike * 1.1
-        price_points = [s for s in valid_strikes if lower_bound <= s <= upper_bound]
-
-        results = []
-        for price in price_points:
-            row = {'Price at Expiry': f"${round(price, 2)}"}
-            strategies = OptionStrategies(
-                price, selected_strike, current_price, calls, puts,
-                user_premiums=premium_data, user_strategy_premiums=strategy_premiums
+        check_request(scenario.ticker, scenario.expiry)
+        quote = quotes[scenario.ticker.upper()]
+        if isinstance(quote, Exception):
+            raise quote
+        current_price, expiry_list = quote
+        selected_expiry = validate_quote(scenario.ticker, current_price, expiry_list, scenario.expiry)
+        chain = chains[(scenario.ticker.upper(), selected_expiry)]
+        if isinstance(chain, Exception):
+            raise chain
+        calls, puts = chain
+        inputs = FetchedInputs(scenario.ticker, current_price, expiry_list, selected_expiry, calls, puts)
+        timings = StageTimings()
+        context = pipeline.resolve(inputs, scenario.strike, timings)
+        line["status"] = 200
+        line["result"] = pipeline.serialize(pipeline.evaluate(context, timings=timings), "json", timings)
+        pipeline.record(timings, "/options-strategy-pnl-batch")
+    except StrategyDataError as e:
+        line["status"] = e.status_code
+        line["error"] = e.message
+    except Exception as e:
+        line["status"] = 500
+        line["error"] = f"An error occurred: {str(e)}"
+    return jsonable_encoder(line)
+
+
+@app.post("/options-strategy-pnl-batch")
+async def get_strategy_pnl_batch(
+    body: BatchRequest,
+    stream: bool = Query(True)
+):
+    if not body.scenarios:
+        return JSONResponse({"error": "At least one scenario is required."}, status_code=400)
+    if len(body.scenarios) > MAX_BATCH_SCENARIOS:
+        return JSONResponse({"error": f"At most {MAX_BATCH_SCENARIOS} scenarios per batch."}, status_code=400)
+
+    quotes, chains = await _fetch_batch_inputs(body.scenarios)
+    loop = asyncio.get_running_loop()
+    # Each scenario runs in a copy of the request context so its stage spans reach Server-Timing.
+    # A streamed response sends its headers before any scenario finishes, so only the
+    # non-streamed one carries them.
+    tasks = [
+        loop.run_in_executor(None, contextvars.copy_context().run, _evaluate_batch_scenario, i, s, quotes, chains)
+        for i, s in enumerate(body.scenarios)
+    ]
+
+    if not stream:
+        return {"results": await asyncio.gather(*tasks)}
+
+    async def ndjson_lines():
+        # Scenarios are written as they finish, `index` ties each line back to the request
+        for finished in asyncio.as_completed(tasks):
+            yield json.dumps(await finished) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@app.post("/backtest")
+async def run_strategy_backtest(body: BacktestRequest):
+    # Replays a built-in strategy over the snapshot store, see backtest.py
+    if market_data.store is None:
+        return JSONResponse({"error": "Snapshot storage is not enabled."}, status_code=404)
+    if not body.tickers:
+        return JSONResponse({"error": "At least one ticker is required."}, status_code=400)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: backtest.run_backtest(
+            market_data.store.root, body.tickers, body.strategy, body.start, body.end, body.min_days_to_expiry
+        ))
+    except backtest.BacktestError as e:
+        return JSONResponse({"error": e.message}, status_code=e.status_code)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse(content={"error": f"An error occurred: {str(e)}"}, status_code=500)
+
+
+@app.post("/portfolio-pnl")
+async def get_portfolio_pnl(
+    body: PortfolioRequest,
+    shock_range: float = Query(0.2, gt=0, lt=1),
+    shock_steps: int = Query(9, ge=2, le=portfolio.MAX_SHOCKS),
+    rate: float = Query(RISK_FREE_RATE),
+):
+    # Whole book under a ladder of spot shocks applied to every underlying at once
+    if not body.positions:
+        return JSONResponse({"error": "At least one position is required."}, status_code=400)
+    if len(body.positions) > portfolio.MAX_PORTFOLIO_POSITIONS:
+        return JSONResponse({"error": f"At most {portfolio.MAX_PORTFOLIO_POSITIONS} positions."}, status_code=400)
+    if sum(len(p.legs) for p in body.positions) > portfolio.MAX_PORTFOLIO_LEGS:
+        return JSONResponse({"error": f"At most {portfolio.MAX_PORTFOLIO_LEGS} legs."}, status_code=400)
+    if body.shocks is not None:
+        if len(body.shocks) > portfolio.MAX_SHOCKS or any(s <= -1 for s in body.shocks):
+            return JSONResponse(
+                {"error": f"At most {portfolio.MAX_SHOCKS} shocks, each above -1."}, status_code=400
             )
-            for strat in [
-                "long_call", "long_put", "covered_call", "protective_put",
-                "straddle", "strangle", "bull_call_spread", "bear_put_spread",
-                "bear_call_spread", "bull_put_spread", "iron_condor", "butterfly_spread"
-            ]:
-                try:
-                    pnl = getattr(strategies, strat)()
-                    row[strat] = round(pnl, 2) if pnl is not None else "N/A"
-                except Exception:
-                    row[strat] = "N/A"
-            row['premium_breakdown'] = strategies.premium_breakdown()
-            results.append(row)
-
-        df = pd.DataFrame(results)
-
-        # Build premium summary
-        call_premiums = {}
-        put_premiums = {}
-
-        for strike in sorted(valid_call_strikes):
-            row = calls[calls['strike'] == strike]
-            if not row.empty:
-                bid = row.iloc[0].get('bid', np.nan)
-                ask = row.iloc[0].get('ask', np.nan)
-                mid_price = (bid + ask) / 2 if bid > 0 and ask > 0 else row.iloc[0]['lastPrice']
-                call_premiums[round(strike, 2)] = round(mid_price, 3)
-
-        for strike in sorted(valid_put_strikes):
-            row = puts[puts['strike'] == strike]
-            if not row.empty:
-                bid = row.iloc[0].get('bid', np.nan)
-                ask = row.iloc[0].get('ask', np.nan)
-                mid_price = (bid + ask) / 2 if bid > 0 and ask > 0 else row.iloc[0]['lastPrice']
-                put_premiums[round(strike, 2)] = round(mid_price, 3)
-
-        # Override with user provided premiums (if any)
-        if premium_data:
-            call_premiums.update({round(k, 2): round(v, 3) for k, v in premium_data.calls.items()})
-            put_premiums.update({round(k, 2): round(v, 3) for k, v in premium_data.puts.items()})
+        shocks = np.unique(np.round(np.append(np.asarray(body.shocks, dtype=float), 0.0), 6))
+    else:
+        shocks = portfolio.shock_ladder(shock_range, shock_steps)
+    try:
+        return await portfolio.evaluate_portfolio(body.positions, shocks, rate)
+    except StrategyDataError as e:
+        return JSONResponse({"error": e.message}, status_code=e.status_code)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse(content={"error": f"An error occurred: {str(e)}"}, status_code=500)
+
+
+@app.post("/options-strategy-legs")
+def get_strategy_legs_pnl(
+    body: StrategyRequest,
+    price_range: float = Query(0.1, gt=0, lt=1),
+    points: int = Query(41, ge=2, le=2000)
+):
+    if body.spot_price <= 0:
+        return JSONResponse({"error": "spot_price must be positive."}, status_code=400)
+    if not body.legs:
+        return JSONResponse({"error": "At least one leg is required."}, status_code=400)
+    try:
+        legs = LegArrays.from_legs(body.legs)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    price_points = price_grid(body.spot_price, price_range, points, legs.strikes)
+    pnl = legs_pnl(price_points, legs)[:, 0]
+    return {
+        "spot_price": round(body.spot_price, 2),
+        "legs": [leg.model_dump() for leg in body.legs],
+        "payoff_summary": {"custom_strategy": payoff_summary(legs)},
+        "strategies": pnl_rows(price_points.tolist(), {"custom_strategy": pnl}),
+    }
+
+
+@app.get("/options-strategy-optimize")
+async def get_strategy_optimize(
+    ticker: str = Query(...),
+    strategy: str = Query(...),
+    expiry: Optional[str] = Query(None),
+    top_k: int = Query(10, ge=1, le=optimizer.MAX_TOP_K),
+    sort_by: str = Query("risk_reward"),
+    strike_range: Optional[float] = Query(None, gt=0, le=1),
+    defined_risk: bool = Query(False),
+):
+    # Every valid strike combination of one strategy family, scored analytically, best top_k first
+    if strategy not in optimizer.FAMILY_ORDER:
+        return JSONResponse({"error": f"Unknown strategy '{strategy}'."}, status_code=400)
+    if sort_by not in optimizer.SORT_KEYS:
+        return JSONResponse({"error": f"sort_by must be one of {list(optimizer.SORT_KEYS)}."}, status_code=400)
+    try:
+        inputs = await pipeline.fetch(ticker, expiry)
+        chain = pipeline.index(inputs)
+        current_price = float(inputs.current_price)
+        loop = asyncio.get_running_loop()
+        best, _, quantities = await loop.run_in_executor(None, lambda: optimizer.score_family(
+            strategy, chain, current_price, strike_range=strike_range, defined_risk=defined_risk,
+            sort_by=sort_by, k=top_k,
+        ))
+        return {
+            "ticker": ticker.upper(),
+            "current_price": round(current_price, 2),
+            "expiry": inputs.selected_expiry,
+            "strategy": strategy,
+            "sort_by": sort_by,
+            "results": optimizer.combination_rows(strategy, best, quantities),
+        }
+    except StrategyDataError as e:
+        return JSONResponse({"error": e.message}, status_code=e.status_code)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse(content={"error": f"An error occurred: {str(e)}"}, status_code=500)
+
 
+@app.get("/options-strategy-montecarlo")
+async def get_strategy_montecarlo(
+    ticker: str = Query(...),
+    expiry: Optional[str] = Query(None),
+    strike: Optional[float] = Query(None),
+    paths: int = Query(100_000, ge=1000, le=montecarlo.MAX_PATHS),
+    model: str = Query("lognormal"),
+    vol_source: str = Query("implied"),
+    confidence: float = Query(0.95, gt=0.5, lt=1),
+    seed: Optional[int] = Query(None, ge=0),
+    rate: float = Query(RISK_FREE_RATE),
+):
+    # Probability of profit, expected P&L and VaR/CVaR at expiry for every strategy on shared paths
+    if model not in montecarlo.MODELS:
+        return JSONResponse({"error": f"model must be one of {list(montecarlo.MODELS)}."}, status_code=400)
+    if vol_source not in montecarlo.VOL_SOURCES:
+        return JSONResponse({"error": f"vol_source must be one of {list(montecarlo.VOL_SOURCES)}."}, status_code=400)
+    try:
+        inputs = await pipeline.fetch(ticker, expiry)
+        context = pipeline.resolve(inputs, strike)
+        current_price = float(inputs.current_price)
+        t = years_to_expiry(inputs.selected_expiry)
+
+        closes = None
+        if model == "bootstrap" or vol_source == "historical":
+            try:
+                closes = await market_data.fetch_history(ticker)
+            except Exception:
+                if model == "bootstrap":
+                    raise
+        returns = montecarlo.log_returns(closes) if closes is not None else None
+        if model == "bootstrap" and (returns is None or len(returns) == 0):
+            return JSONResponse({"error": f"Not enough price history for {ticker.upper()}."}, status_code=400)
+        sigma = montecarlo.resolve_vol(vol_source, context.chain, current_price, t, rate, closes)
+
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(None, lambda: montecarlo.run_simulation(
+            context.legs, current_price, t, rate, paths, model=model, sigma=sigma, returns=returns,
+            confidence=confidence, seed=seed,
+        ))
         return {
+            "ticker": inputs.ticker,
+            "current_price": round(current_price, 2),
+            "selected_strike": round(context.selected_strike, 2),
+            "expiry": inputs.selected_expiry,
+            "years_to_expiry": round(t, 6),
+            "model": model,
+            "vol": round(sigma, 6) if model == "lognormal" else None,
+            "rate": rate,
+            "paths": paths,
+            "seed": seed,
+            "confidence": confidence,
+            "strategies": results,
+        }
+    except StrategyDataError as e:
+        return JSONResponse({"error": e.message}, status_code=e.status_code)
+    except Exception as e:
+        return JSONResponse(content={"error": f"An error occurred: {str(e)}"}, status_code=500)
+
+
+@app.get("/options-strategy-calendar")
+async def get_strategy_calendar(
+    ticker: str = Query(...),
+    expiry: Optional[str] = Query(None),
+    strike: Optional[float] = Query(None),
+    expiries: int = Query(4, ge=2, le=calendars.MAX_TERM_EXPIRIES),
+    price_range: float = Query(0.1, gt=0, lt=1),
+    points: int = Query(81, ge=2, le=2000),
+    rate: float = Query(RISK_FREE_RATE),
+):
+    # Calendar and diagonal spreads from the selected (near) expiry to each later loaded expiry,
+    # valued at the near expiry with the far legs marked by Black-Scholes
+    timings = StageTimings()
+    try:
+        inputs, term = await pipeline.fetch_term(ticker, expiry, expiries, timings)
+        if len(term) < 2:
+            return JSONResponse({"error": f"No later expiry than {inputs.selected_expiry} is listed."}, status_code=400)
+        current_price = float(inputs.current_price)
+        _, _, selected_strike = select_strike(pipeline.index(inputs, timings), current_price, strike)
+        with timings.stage("evaluate"):
+            spreads = calendars.term_spreads(term, selected_strike)
+            if not spreads:
+                return JSONResponse({"error": "No expiry pair lists the sides these spreads need."}, status_code=400)
+            legs, years_left, sigmas = calendars.spread_leg_inputs(term, spreads, current_price, rate)
+            prices = price_grid(current_price, price_range, points, legs.strikes)
+            pnl = calendars.near_expiry_pnl(prices, legs, years_left, sigmas, len(spreads), rate)
+        with timings.stage("serialize"):
+            for i, spread in enumerate(spreads):
+                spread["net_premium"] = round(sum(
+                    leg["premium"] * (1 if leg["action"] == "buy" else -1) * leg["quantity"] for leg in spread["legs"]
+                ), 3)
+                spread["max_pnl"] = round(float(np.nanmax(pnl[:, i])), 2)
+                spread["min_pnl"] = round(float(np.nanmin(pnl[:, i])), 2)
+                spread["pnl"] = rounded_list(pnl[:, i], 2)
+            return {
+                "ticker": inputs.ticker,
+                "current_price": round(current_price, 2),
+                "selected_strike": round(selected_strike, 2),
+                "near_expiry": inputs.selected_expiry,
+                "available_expiries": inputs.expiry_list,
+                "term_structure": calendars.term_structure_summary(term, current_price, rate),
+                "rate": rate,
+                "prices": rounded_list(prices, 2),
+                "spreads": spreads,
+            }
+    except StrategyDataError as e:
+        return JSONResponse({"error": e.message}, status_code=e.status_code)
+    except Exception as e:
+        return JSONResponse(content={"error": f"An error occurred: {str(e)}"}, status_code=500)
+    finally:
+        pipeline.record(timings, "/options-strategy-calendar")
+
+
+@app.get("/options-greeks")
+async def get_option_greeks(
+    ticker: str = Query(...),
+    expiry: Optional[str] = Query(None),
+    rate: float = Query(RISK_FREE_RATE)
+):
+    try:
+        inputs = await pipeline.fetch(ticker, expiry)
+        chain = pipeline.index(inputs)
+        current_price, selected_expiry = inputs.current_price, inputs.selected_expiry
+        t = years_to_expiry(selected_expiry)
+
+        result = {
+            "ticker": ticker.upper(),
+            "current_price": round(current_price, 2),
+            "expiry": selected_expiry,
+            "years_to_expiry": round(t, 6),
+            "rate": rate,
+        }
+        for name, side, is_call in (("calls", chain.calls, True), ("puts", chain.puts, False)):
+            greeks = chain_greeks(side, current_price, t, rate, is_call)
+            result[name] = {
+                "strike": rounded_list(greeks["strike"], 2),
+                "premium": rounded_list(greeks["premium"], 3),
+                "iv": rounded_list(greeks["iv"], 4),
+                "delta": rounded_list(greeks["delta"], 4),
+                "gamma": rounded_list(greeks["gamma"], 6),
+                "theta": rounded_list(greeks["theta"], 4),
+                "vega": rounded_list(greeks["vega"], 4),
+            }
+        return result
+
+    except StrategyDataError as e:
+        return JSONResponse({"error": e.message}, status_code=e.status_code)
+    except Exception as e:
+        return JSONResponse(content={"error": f"An error occurred: {str(e)}"}, status_code=500)
+
+
+def encode_float32(values):
+    return base64.b64encode(np.ascontiguousarray(values, dtype='<f4').tobytes()).decode('ascii')
+
+
+@app.get("/options-strategy-surface")
+async def get_strategy_surface(
+    ticker: str = Query(...),
+    expiry: Optional[str] = Query(None),
+    strike: Optional[float] = Query(None),
+    price_points: int = Query(500, ge=2, le=1000),
+    day_points: int = Query(60, ge=1, le=120),
+    price_range: float = Query(0.2, gt=0, lt=1),
+    rate: float = Query(RISK_FREE_RATE),
+    response_format: Optional[str] = Query(None, alias="format"),
+    request: Request = None
+):
+    try:
+        fmt = negotiate_format(request.headers.get("accept") if request else None, response_format)
+        inputs = await pipeline.fetch(ticker, expiry)
+        context = pipeline.resolve(inputs, strike)
+        chain, legs, selected_strike = context.chain, context.legs, context.selected_strike
+        current_price, selected_expiry = inputs.current_price, inputs.selected_expiry
+        leg_arrays = strategy_leg_arrays(legs, current_price)
+
+        t = years_to_expiry(selected_expiry)
+        sigmas = leg_vols(chain, leg_arrays, current_price, t, rate)
+        days_to_expiry = t * 365
+        days_elapsed = np.linspace(0, days_to_expiry, day_points) if day_points > 1 else np.array([days_to_expiry])
+        prices = np.linspace(current_price * (1 - price_range), current_price * (1 + price_range), price_points)
+        years_left = (days_to_expiry - days_elapsed) / 365
+
+        surfaces = legs_value_grid(prices, years_left, leg_arrays, sigmas, rate, n_groups=len(STRATEGY_NAMES))
+        payload = {
             "ticker": ticker.upper(),
             "current_price": round(current_price, 2),
-            "atm_strike": round(atm_strike, 2),
             "selected_strike": round(selected_strike, 2),
             "expiry": selected_expiry,
-            "available_expiries": available_expiries,
-            "available_strikes": [round(s, 2) for s in available_strikes],
-            "strategies": df.to_dict(orient="records"),
-            "premiums": {
-                "calls": call_premiums,
-                "puts": put_premiums
+            "rate": rate,
+            "axes": {
+                "days_elapsed": rounded_list(days_elapsed, 4),
+                "price": rounded_list(prices, 4),
             },
-            "user_provided_premiums": {
-                "calls": premium_data.calls if premium_data else {},
-                "puts": premium_data.puts if premium_data else {},
-            
-            }
+            "shape": [len(days_elapsed), len(prices)],
+            "premium_breakdown": legs.breakdown(),
         }
-
+        if fmt != "json":
+            # One flattened row-major column per strategy, axes and shape travel in the metadata
+            return encode_columns(fmt, payload, {name: surfaces[i].ravel() for i, name in enumerate(STRATEGY_NAMES)})
+
+        # Each surface is row-major (days_elapsed x price) little-endian float32, base64 encoded
+        payload["dtype"] = "float32"
+        payload["encoding"] = "base64"
+        payload["surfaces"] = {name: encode_float32(surfaces[i]) for i, name in enumerate(STRATEGY_NAMES)}
+        return payload
+
+    except RequestError as e:
+        return JSONResponse({"error": e.message}, status_code=e.status_code)
     except Exception as e:
-        return JSONResponse(content={"error": f"An error occurred: {str(e)}"}, status_code=500)
\ No newline at end of file
+        return JSONResponse(content={"error": f"An error occurred: {str(e)}"}, status_code=500)
+
+
+@app.websocket("/ws/options-strategy-pnl")
+async def stream_strategy_pnl(
+    websocket: WebSocket,
+    ticker: str = Query(...),
+    expiry: Optional[str] = Query(None),
+    strike: Optional[float] = Query(None),
+):
+    # First message is a full snapshot, then only the rows and premiums that changed on each refresh
+    await websocket.accept()
+    subscriber = None
+    sender = None
+    try:
+        subscriber = await live.hub.subscribe(ticker, expiry, strike)
+
+        async def send_updates():
+            while True:
+                await websocket.send_json(await subscriber.queue.get())
+
+        sender = asyncio.create_task(send_updates())
+        # Nothing is expected from the client, reading just notices the disconnect
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if sender is not None:
+            sender.cancel()
+        if subscriber is not None:
+            live.hub.unsubscribe(subscriber)
+
+
+@app.get("/live/stats")
+def get_live_stats():
+    return live.hub.stats()
+
+
+@app.get("/market-data/cache-stats")
+def get_market_data_cache_stats():
+    return {
+        "provider": market_data.provider.name,
+        "provider_fallbacks": market_data.provider_stats()["fallbacks"],
+        "snapshots": market_data.store.stats() if market_data.store else None,
+        **market_data.cache.stats(),
+    }
+
+
+@app.get("/market-data/snapshots")
+def get_market_data_snapshots(ticker: str = Query(...), expiry: Optional[str] = Query(None)):
+    if market_data.store is None:
+        return JSONResponse({"error": "Snapshot storage is not enabled."}, status_code=404)
+    store = market_data.store
+    try:
+        expiries = [expiry] if expiry else store.expiries(ticker)
+        return {"ticker": ticker.upper(), "snapshots": {e: store.snapshots(ticker, e) for e in expiries}}
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+
+@app.get("/pipeline/stats")
+def get_pipeline_stats():
+    return pipeline.stats()
+
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
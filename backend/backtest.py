@@ -0,0 +1,188 @@
+import os
+from collections import defaultdict
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+
+import numpy as np
+
+import workers
+from chain import ChainIndex
+from errors import RequestError
+from payoff import LEG_TYPES, LOT_SIZE, STRATEGY_NAMES, LegArrays, legs_payoff, template_legs
+from snapshots import SnapshotStore, parse_timestamp
+from strategies import resolve_strategy_legs
+
+# Processes in the shared backtest pool, 1 runs every trade in the calling thread
+BACKTEST_WORKERS = int(os.environ.get("BACKTEST_WORKERS", os.cpu_count() or 1))
+
+
+class BacktestError(RequestError):
+    pass
+
+
+def daily_snapshots(store, ticker, start=None, end=None):
+    # {day: {expiry: timestamp}} keeping the last snapshot of each expiry per day
+    days = defaultdict(dict)
+    for expiry in store.expiries(ticker):
+        expiry_date = date.fromisoformat(expiry)
+        for timestamp in store.snapshots(ticker, expiry):
+            day = parse_timestamp(timestamp).date()
+            if (start and day < start) or (end and day > end) or day > expiry_date:
+                continue
+            days[day][expiry] = timestamp
+    return dict(sorted(days.items()))
+
+
+def plan_trades(days, min_days_to_expiry=1):
+    # One position at a time: open on the nearest expiry at least min_days_to_expiry out,
+    # hold it to expiry and roll into the next one on the first day after
+    trades = []
+    current = None
+    for day, expiries in days.items():
+        if current is not None and day > date.fromisoformat(current["expiry"]):
+            current = None
+        if current is None:
+            candidates = sorted(e for e in expiries if (date.fromisoformat(e) - day).days >= min_days_to_expiry)
+            if not candidates:
+                continue
+            current = {"expiry": candidates[0], "marks": []}
+            trades.append(current)
+        if current["expiry"] in expiries:
+            current["marks"].append((day, expiries[current["expiry"]]))
+    return trades
+
+
+def mark_legs(chain, legs, spot):
+    # Option legs at the chain premium of their strike (closest listed one), stock at spot
+    values = np.full(len(legs), float(spot))
+    for leg_type, side in ((LEG_TYPES["call"], chain.calls), (LEG_TYPES["put"], chain.puts)):
+        mask = legs.types == leg_type
+        if mask.any() and len(side):
+            values[mask] = side.premiums[side.nearest_indices(legs.strikes[mask])]
+    return values
+
+
+def run_trade(root, ticker, strategy, expiry, marks):
+    # Opens the strategy on the first marked day with the same strike rules as premium_breakdown,
+    # then marks it daily and settles at intrinsic value on the expiry date
+    store = SnapshotStore(root)
+    expiry_date = date.fromisoformat(expiry)
+    entry, legs, points = None, None, []
+    for day, timestamp in marks:
+        calls, puts, meta = store.load(ticker, expiry, timestamp)
+        spot = meta.get("spot")
+        if spot is None:
+            continue
+        chain = ChainIndex(calls, puts)
+        if entry is None:
+            if len(chain.strikes) == 0:
+                continue
+            selected_strike = chain.strikes[chain.atm_index(spot)].item()
+            resolved = resolve_strategy_legs(selected_strike, spot, calls, puts, chain=chain)
+            legs = LegArrays.from_legs(template_legs(strategy, resolved[strategy], spot))
+            entry = {"date": day.isoformat(), "spot": round(spot, 2), "legs": resolved[strategy]}
+        values = legs_payoff([spot], legs)[0] if day >= expiry_date else mark_legs(chain, legs, spot)
+        pnl = float(((values - legs.premiums) * legs.quantities).sum() * LOT_SIZE)
+        if np.isfinite(pnl):
+            points.append((day.isoformat(), pnl))
+    return {
+        "ticker": ticker,
+        "expiry": expiry,
+        "entry": entry,
+        "settled": bool(points) and points[-1][0] == expiry,
+        "marks": points,
+    }
+
+
+def equity_curve(trades):
+    # Settled P&L of earlier trades plus the mark of the one currently open
+    curve, realized = {}, 0.0
+    for trade in trades:
+        for day, pnl in trade["marks"]:
+            curve[day] = realized + pnl
+        if trade["marks"]:
+            realized += trade["marks"][-1][1]
+    return curve
+
+
+def curve_summary(curve):
+    days = sorted(curve)
+    equity = np.array([curve[d] for d in days], dtype=float)
+    peak = np.maximum.accumulate(np.maximum(equity, 0.0)) if len(equity) else equity
+    drawdown = equity - peak
+    return {
+        "points": [
+            {"date": d, "equity": round(e, 2), "drawdown": round(dd, 2)}
+            for d, e, dd in zip(days, equity.tolist(), drawdown.tolist())
+        ],
+        "final_equity": round(float(equity[-1]), 2) if len(equity) else 0.0,
+        "max_drawdown": round(float(drawdown.min()), 2) if len(drawdown) else 0.0,
+    }
+
+
+def combine_curves(curves):
+    # Portfolio equity over the union of days, each ticker carried forward between its marks
+    days = sorted({d for curve in curves for d in curve})
+    total = {d: 0.0 for d in days}
+    for curve in curves:
+        last = 0.0
+        for d in days:
+            last = curve.get(d, last)
+            total[d] += last
+    return total
+
+
+def run_backtest(root, tickers, strategy, start=None, end=None, min_days_to_expiry=1):
+    if strategy not in STRATEGY_NAMES:
+        raise BacktestError(f"Unknown strategy '{strategy}'.")
+    start = date.fromisoformat(start) if isinstance(start, str) else start
+    end = date.fromisoformat(end) if isinstance(end, str) else end
+    store = SnapshotStore(root)
+
+    jobs = []
+    for ticker in dict.fromkeys(t.upper() for t in tickers):
+        for trade in plan_trades(daily_snapshots(store, ticker, start, end), min_days_to_expiry):
+            jobs.append((ticker, trade["expiry"], trade["marks"]))
+    if not jobs:
+        raise BacktestError("No stored snapshots in the requested range.", 404)
+
+    # Trades roll on the calendar, not on P&L, so every (ticker, expiry) position is independent
+    args = [[root] * len(jobs), [t for t, _, _ in jobs], [strategy] * len(jobs),
+            [e for _, e, _ in jobs], [m for _, _, m in jobs]]
+    if BACKTEST_WORKERS > 1 and len(jobs) > 1:
+        try:
+            pool = workers.process_pool("backtest", BACKTEST_WORKERS)
+            chunksize = max(1, len(jobs) // (min(BACKTEST_WORKERS, len(jobs)) * 4))
+            results = list(pool.map(run_trade, *args, chunksize=chunksize))
+        except BrokenProcessPool:
+            workers.discard_pool("backtest")
+            raise
+    else:
+        results = list(map(run_trade, *args))
+
+    by_ticker = defaultdict(list)
+    for result in results:
+        by_ticker[result["ticker"]].append(result)
+    curves, per_ticker = [], {}
+    for ticker, trades in by_ticker.items():
+        curve = equity_curve(trades)
+        curves.append(curve)
+        per_ticker[ticker] = {
+            "trades": [
+                {
+                    "expiry": t["expiry"],
+                    "entry": t["entry"],
+                    "settled": t["settled"],
+                    "pnl": round(t["marks"][-1][1], 2) if t["marks"] else None,
+                }
+                for t in trades
+            ],
+            **curve_summary(curve),
+        }
+    return {
+        "strategy": strategy,
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+        "tickers": per_ticker,
+        "portfolio": curve_summary(combine_curves(curves)),
+    }
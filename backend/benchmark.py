@@ -0,0 +1,281 @@
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from pricing import bs_price
+
+# Run from backend/ like the server:  python benchmark.py --sizes 50,500,5000 --output bench.json
+# and compare two runs with:          python benchmark.py --compare old.json new.json
+DEFAULT_SIZES = (50, 200, 1000, 5000)
+DEFAULT_REPEAT = 7
+TICKER = "SYNTH"
+SPOT = 100.0
+
+
+def synthetic_chain(n_strikes, spot=SPOT, seed=0, years=30 / 365, rate=0.045):
+    # Black-Scholes quotes on a skewed smile over strikes from half to one and a half times spot,
+    # with the gaps real chains have: a few missing bids and asks and puts not listed on every strike
+    rng = np.random.default_rng(seed)
+    strikes = np.unique(np.round(np.linspace(spot * 0.5, spot * 1.5, n_strikes), 2))
+    moneyness = np.log(strikes / spot)
+    vols = 0.25 - 0.1 * moneyness + 0.4 * moneyness * moneyness
+
+    def side(is_call):
+        fair = bs_price(spot, strikes, years, rate, vols, is_call)
+        spread = np.maximum(0.01, fair * 0.04)
+        bid = np.round(np.maximum(fair - spread / 2, 0.0), 2)
+        ask = np.round(fair + spread / 2, 2)
+        bid[rng.random(len(strikes)) < 0.05] = 0.0
+        ask[rng.random(len(strikes)) < 0.02] = np.nan
+        frame = pd.DataFrame({
+            "contractSymbol": [f"{TICKER}{'C' if is_call else 'P'}{i:05d}" for i in range(len(strikes))],
+            "strike": strikes,
+            "lastPrice": np.round(fair * (1 + rng.normal(0, 0.01, len(strikes))), 2),
+            "bid": bid,
+            "ask": ask,
+            "impliedVolatility": vols,
+            "volume": rng.integers(0, 500, len(strikes)).astype(float),
+            "openInterest": rng.integers(0, 5000, len(strikes)).astype(float),
+        })
+        if not is_call:
+            frame = frame[rng.random(len(frame)) >= 0.03].reset_index(drop=True)
+        return frame
+
+    return side(True), side(False)
+
+
+class SyntheticProvider:
+    # Offline chains of a fixed size, rebuilt on every load so cold runs pay the full fetch cost
+    name = "synthetic"
+
+    def __init__(self, n_strikes, seed=0, today=None):
+        self.n_strikes = n_strikes
+        self.seed = seed
+        today = today or date.today()
+        self._expiries = tuple((today + timedelta(days=d)).isoformat() for d in (30, 58, 86, 121))
+
+    def spot(self, ticker):
+        return SPOT
+
+    def expiries(self, ticker):
+        return self._expiries
+
+    def chain(self, ticker, expiry):
+        return synthetic_chain(self.n_strikes, seed=self.seed)
+
+    def history(self, ticker, period="1y"):
+        rng = np.random.default_rng(self.seed)
+        return SPOT * np.exp(np.cumsum(rng.normal(0, 0.015, 252)))
+
+
+def measure(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        "repeat": repeat,
+        "min_ms": round(min(samples) * 1000, 4),
+        "median_ms": round(statistics.median(samples) * 1000, 4),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 4),
+        "stdev_ms": round(statistics.stdev(samples) * 1000, 4) if len(samples) > 1 else 0.0,
+    }
+
+
+async def asgi_request(app, method, path, query="", body=None):
+    # One request through the full ASGI stack (middleware, routing, validation, rendering)
+    payload = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query.encode(), "root_path": "", "client": ("127.0.0.1", 0), "server": ("bench", 80),
+        "headers": [(b"host", b"bench"), (b"accept", b"application/json"),
+                    (b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())],
+    }
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await asyncio.Event().wait()
+
+    response = {"status": None, "bytes": 0}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["bytes"] += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    if response["status"] != 200:
+        raise RuntimeError(f"{method} {path}?{query} returned {response['status']}")
+    return response
+
+
+def bench_size(n_strikes, repeat, seed):
+    import market_data
+    from app import app
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from pipeline import pipeline
+    from payoff import STRATEGY_NAMES
+    from strategies import OptionStrategies
+
+    market_data.set_provider(SyntheticProvider(n_strikes, seed))
+    pipeline.clear()
+    loop = asyncio.new_event_loop()
+    results = {}
+    try:
+        inputs = loop.run_until_complete(pipeline.fetch(TICKER))
+        context = pipeline.resolve(inputs)
+        chain, legs, prices = context.chain, context.legs, context.price_points
+        calls, puts = inputs.calls, inputs.puts
+        strike = context.selected_strike
+
+        # Leg resolution from scratch: every get_price / nearest-strike lookup on a fresh index
+        results["premium_breakdown"] = measure(
+            lambda: OptionStrategies(None, strike, SPOT, calls, puts).premium_breakdown(), repeat
+        )
+        # Scalar strategy methods over the endpoint's price points, legs already resolved
+        for name in STRATEGY_NAMES:
+            results[f"strategy.{name}"] = measure(
+                lambda name=name: [
+                    getattr(OptionStrategies(p, strike, SPOT, calls, puts, legs=legs, chain=chain), name)()
+                    for p in prices
+                ],
+                repeat,
+            )
+        evaluation = pipeline.evaluate(context)
+        results["pipeline.evaluate"] = measure(lambda: pipeline.evaluate(context), repeat)
+        results["serialize.rows"] = measure(lambda: pipeline.serialize(evaluation, "json"), repeat)
+        payload = pipeline.serialize(evaluation, "json")
+        results["serialize.json"] = measure(lambda: JSONResponse(jsonable_encoder(payload)).body, repeat)
+
+        def cold():
+            market_data.cache.clear()
+            pipeline.clear()
+            return loop.run_until_complete(asgi_request(app, "GET", "/options-strategy-pnl", f"ticker={TICKER}"))
+
+        def warm():
+            return loop.run_until_complete(asgi_request(app, "GET", "/options-strategy-pnl", f"ticker={TICKER}"))
+
+        overrides = {"calls": {str(s): 1.0 for s in chain.strikes[:50].tolist()}}
+
+        def custom():
+            return loop.run_until_complete(
+                asgi_request(app, "POST", "/options-strategy-pnl-custom", f"ticker={TICKER}", overrides)
+            )
+
+        results["endpoint.get_cold"] = measure(cold, repeat)
+        results["endpoint.get_warm"] = measure(warm, repeat)
+        results["endpoint.custom"] = measure(custom, repeat)
+        response_bytes = warm()["bytes"]
+    finally:
+        loop.close()
+    return {
+        "strikes": int(len(chain.strikes)),
+        "price_points": int(len(prices)),
+        "response_bytes": response_bytes,
+        "cases": results,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(sizes, repeat, seed):
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "repeat": repeat,
+        "seed": seed,
+        "sizes": {str(n): bench_size(n, repeat, seed) for n in sizes},
+    }
+
+
+def compare(old, new, stat="median_ms"):
+    # Ratio new/old per case and size; above 1 is slower
+    rows = []
+    for size, result in new["sizes"].items():
+        before = old["sizes"].get(size, {}).get("cases", {})
+        for case, timing in result["cases"].items():
+            if case in before and before[case][stat] > 0:
+                rows.append((int(size), case, before[case][stat], timing[stat], timing[stat] / before[case][stat]))
+    return rows
+
+
+def _setup_offline():
+    # Keep the app off the network and off disk; the synthetic provider replaces this at run time
+    os.environ["MARKET_DATA_PROVIDER"] = "replay"
+    os.environ["MARKET_DATA_REPLAY_DIR"] = tempfile.gettempdir()
+    os.environ.pop("MARKET_DATA_FALLBACK_DIR", None)
+    os.environ.pop("MARKET_DATA_SNAPSHOT_DIR", None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the strategy computation path on synthetic chains.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma separated strike counts per chain")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two saved reports")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        print(f"{'strikes':>8}  {'case':<32} {'old ms':>10} {'new ms':>10} {'ratio':>7}")
+        for size, case, before, after, ratio in compare(old, new):
+            print(f"{size:>8}  {case:<32} {before:>10.3f} {after:>10.3f} {ratio:>7.2f}")
+        return 0
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    if any(n < 2 for n in sizes) or args.repeat < 1:
+        parser.error("sizes must be at least 2 strikes and repeat at least 1")
+    _setup_offline()
+    report = run(sizes, args.repeat, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
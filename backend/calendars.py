@@ -0,0 +1,97 @@
+import numpy as np
+
+from payoff import LEG_TYPES, LegArrays, group_pnl
+from pricing import RISK_FREE_RATE, atm_implied_vol, bs_price, leg_vols
+
+# Cross-expiry leg templates: (type, action, quantity, expiry, strike offset from the selected strike).
+# The near leg is sold and the far leg bought, diagonals move the short strike out of the money.
+CALENDAR_TEMPLATES = {
+    "calendar_call": [("call", "sell", 1, "near", 0), ("call", "buy", 1, "far", 0)],
+    "calendar_put": [("put", "sell", 1, "near", 0), ("put", "buy", 1, "far", 0)],
+    "diagonal_call": [("call", "sell", 1, "near", 5), ("call", "buy", 1, "far", 0)],
+    "diagonal_put": [("put", "sell", 1, "near", -5), ("put", "buy", 1, "far", 0)],
+}
+CALENDAR_NAMES = list(CALENDAR_TEMPLATES)
+MAX_TERM_EXPIRIES = 12
+
+
+def resolve_calendar_legs(term, selected_strike, near_expiry, far_expiry, name):
+    # Strikes snap to the closest listed one on each expiry's own chain, premiums are that chain's mid
+    legs = []
+    for leg_type, action, quantity, which, offset in CALENDAR_TEMPLATES[name]:
+        expiry = near_expiry if which == "near" else far_expiry
+        chain = term.chain(expiry)
+        is_call = leg_type == "call"
+        strike = chain.nearest_strike(selected_strike + offset, is_call=is_call)
+        legs.append({
+            "type": leg_type,
+            "action": action,
+            "quantity": quantity,
+            "strike": strike,
+            "premium": chain.price(strike, is_call=is_call),
+            "expiry": expiry,
+        })
+    return legs
+
+
+def term_spreads(term, selected_strike, names=CALENDAR_NAMES):
+    # Every cross-expiry template against every later expiry of the term structure
+    near_expiry = term.expiries[0]
+    near = term.chain(near_expiry)
+    spreads = []
+    for far_expiry in term.expiries[1:]:
+        far = term.chain(far_expiry)
+        for name in names:
+            # Skipped when either expiry lists nothing on a side the template trades
+            sides = {leg_type == "call" for leg_type, _, _, _, _ in CALENDAR_TEMPLATES[name]}
+            if any(len(near.side(is_call)) == 0 or len(far.side(is_call)) == 0 for is_call in sides):
+                continue
+            spreads.append({
+                "strategy": name,
+                "near_expiry": near_expiry,
+                "far_expiry": far_expiry,
+                "legs": resolve_calendar_legs(term, selected_strike, near_expiry, far_expiry, name),
+            })
+    return spreads
+
+
+def spread_leg_inputs(term, spreads, spot, rate=RISK_FREE_RATE):
+    # Stacks the legs of every spread, with each leg's time left once the near expiry is reached
+    # and the implied vol of its own chain, which the far legs keep until then
+    stacked = [leg for spread in spreads for leg in spread["legs"]]
+    groups = [i for i, spread in enumerate(spreads) for _ in spread["legs"]]
+    legs = LegArrays.from_legs(stacked, groups)
+    near_years = term.years_to(term.expiries[0])
+    expiries = np.array([leg["expiry"] for leg in stacked])
+    years_left = np.zeros(len(legs))
+    sigmas = np.zeros(len(legs))
+    for expiry in np.unique(expiries):
+        mask = expiries == expiry
+        t = term.years_to(expiry)
+        subset = LegArrays(legs.types[mask], legs.strikes[mask], legs.quantities[mask], legs.premiums[mask])
+        years_left[mask] = max(t - near_years, 0.0)
+        sigmas[mask] = leg_vols(term.chain(expiry), subset, spot, t, rate)
+    return legs, years_left, sigmas
+
+
+def near_expiry_pnl(prices, legs, years_left, sigmas, n_groups, rate=RISK_FREE_RATE):
+    # P&L of every spread at the near expiry over the price grid in one Black-Scholes call,
+    # shape (len(prices), n_groups). Legs expiring then have no time left and pay intrinsic value.
+    p = np.asarray(prices, dtype=float)[:, None]
+    is_call = legs.types == LEG_TYPES["call"]
+    values = bs_price(p, legs.strikes, years_left, rate, sigmas, is_call)
+    values = np.where(legs.types == LEG_TYPES["stock"], p, values)
+    return group_pnl(values, legs, n_groups)
+
+
+def term_structure_summary(term, spot, rate=RISK_FREE_RATE):
+    rows = []
+    for expiry, chain, years in zip(term.expiries, term.chains, term.years.tolist()):
+        iv = atm_implied_vol(chain, spot, years, rate) if years > 0 else None
+        rows.append({
+            "expiry": expiry,
+            "years_to_expiry": round(years, 6),
+            "atm_iv": round(iv, 4) if iv is not None else None,
+            "strikes": len(chain.strikes),
+        })
+    return rows
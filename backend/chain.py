@@ -0,0 +1,131 @@
+from bisect import bisect_left
+
+import numpy as np
+
+
+def mid_or_last(df):
+    # Mid of bid/ask when both sides are quoted, otherwise the last traded price
+    nan = np.full(len(df), np.nan)
+    bid = df['bid'].to_numpy(dtype=float) if 'bid' in df else nan
+    ask = df['ask'].to_numpy(dtype=float) if 'ask' in df else nan
+    last = df['lastPrice'].to_numpy(dtype=float) if 'lastPrice' in df else nan
+    quoted = (bid > 0) & (ask > 0)
+    return np.where(quoted, (bid + ask) / 2, last)
+
+
+def nearest_index(sorted_values, target):
+    # Index of the value closest to target, ties go to the lower value
+    i = bisect_left(sorted_values, target)
+    if i == 0:
+        return 0
+    if i == len(sorted_values):
+        return i - 1
+    return i if sorted_values[i] - target < target - sorted_values[i - 1] else i - 1
+
+
+class ChainSide:
+    # Calls or puts of one expiry, sorted by strike with one row per strike
+    def __init__(self, df):
+        strikes = df['strike'].to_numpy(dtype=float)
+        order = np.argsort(strikes, kind='stable')
+        # First listed row wins for duplicated strikes, like df[df['strike'] == k].iloc[0]
+        self.strikes, first = np.unique(strikes[order], return_index=True)
+        rows = order[first]
+        self.premiums = mid_or_last(df)[rows]
+        # Plain lists keep scalar lookups free of NumPy scalar boxing
+        self._strike_list = self.strikes.tolist()
+        self._premium_list = [round(p, 3) for p in self.premiums.tolist()]
+
+    def __len__(self):
+        return len(self._strike_list)
+
+    def find(self, strike):
+        i = bisect_left(self._strike_list, strike)
+        if i < len(self._strike_list) and self._strike_list[i] == strike:
+            return i
+        return None
+
+    def nearest_strike(self, target):
+        if not self._strike_list:
+            return target
+        return self._strike_list[nearest_index(self._strike_list, target)]
+
+    def nearest_indices(self, targets):
+        # Vectorized nearest_strike() as row positions, ties go to the lower strike
+        targets = np.asarray(targets, dtype=float)
+        if len(self.strikes) == 1:
+            return np.zeros(targets.shape, dtype=np.intp)
+        i = np.clip(np.searchsorted(self.strikes, targets), 1, len(self.strikes) - 1)
+        upper_closer = self.strikes[i] - targets < targets - self.strikes[i - 1]
+        return np.where(upper_closer, i, i - 1)
+
+    def premium_summary(self, overrides=None):
+        # {strike: premium} for the whole side, rounded like the response expects.
+        # Overrides are appended and the last entry per rounded strike wins.
+        strikes = np.round(self.strikes, 2)
+        premiums = np.round(self.premiums, 3)
+        if overrides:
+            strikes = np.concatenate([strikes, np.round(np.fromiter(overrides.keys(), dtype=float), 2)])
+            premiums = np.concatenate([premiums, np.round(np.fromiter(overrides.values(), dtype=float), 3)])
+        unique, last = np.unique(strikes[::-1], return_index=True)
+        return dict(zip(unique.tolist(), premiums[::-1][last].tolist()))
+
+    def price(self, strike):
+        if not self._strike_list:
+            return 0.0
+        i = self.find(strike)
+        if i is None:
+            i = nearest_index(self._strike_list, strike)
+        return self._premium_list[i]
+
+
+class ChainIndex:
+    def __init__(self, calls, puts):
+        self.calls = ChainSide(calls)
+        self.puts = ChainSide(puts)
+        self.strikes = np.union1d(self.calls.strikes, self.puts.strikes)
+        self._strike_list = self.strikes.tolist()
+
+    def side(self, is_call):
+        return self.calls if is_call else self.puts
+
+    def nearest_strike(self, target, is_call=True):
+        return self.side(is_call).nearest_strike(target)
+
+    def price(self, strike, is_call=True):
+        return self.side(is_call).price(strike)
+
+    def has_strike(self, strike):
+        if strike is None:
+            return False
+        i = bisect_left(self._strike_list, strike)
+        return i < len(self._strike_list) and self._strike_list[i] == strike
+
+    def strike_list(self):
+        return list(self._strike_list)
+
+    def atm_index(self, spot):
+        return nearest_index(self._strike_list, spot)
+
+    def strikes_between(self, lower, upper):
+        lo = np.searchsorted(self.strikes, lower, side='left')
+        hi = np.searchsorted(self.strikes, upper, side='right')
+        return self._strike_list[lo:hi]
+
+
+class TermStructure:
+    # Indexed chains of several expiries of one underlying, nearest expiry first
+    def __init__(self, expiries, chains, years):
+        self.expiries = list(expiries)
+        self.chains = list(chains)
+        self.years = np.asarray(years, dtype=float)
+        self._positions = {expiry: i for i, expiry in enumerate(self.expiries)}
+
+    def __len__(self):
+        return len(self.expiries)
+
+    def chain(self, expiry):
+        return self.chains[self._positions[expiry]]
+
+    def years_to(self, expiry):
+        return float(self.years[self._positions[expiry]])
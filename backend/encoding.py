@@ -0,0 +1,109 @@
+import json
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from errors import RequestError
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "msgpack": "application/x-msgpack",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+ACCEPT_ALIASES = {
+    "application/json": "json",
+    "application/x-msgpack": "msgpack",
+    "application/msgpack": "msgpack",
+    "application/vnd.msgpack": "msgpack",
+    "application/vnd.apache.arrow.stream": "arrow",
+}
+
+
+class FormatError(RequestError):
+    pass
+
+
+def available_formats():
+    formats = ["json"]
+    if msgpack is not None:
+        formats.append("msgpack")
+    if pa is not None:
+        formats.append("arrow")
+    return formats
+
+
+def _accept_quality(params):
+    for param in params:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 1.0
+    return 1.0
+
+
+def negotiate_format(accept=None, requested=None):
+    # An explicit ?format= wins, otherwise the recognized Accept type with the highest q-value
+    # (the first listed on a tie), otherwise JSON. q=0 rules a type out.
+    if requested:
+        fmt = requested.lower()
+        if fmt not in MEDIA_TYPES:
+            raise FormatError(f"Unknown format '{requested}', expected one of {sorted(MEDIA_TYPES)}.", 400)
+    else:
+        ranked = []
+        for position, part in enumerate((accept or "").split(",")):
+            media_type, *params = part.split(";")
+            media_type = media_type.strip().lower()
+            quality = _accept_quality(params)
+            if media_type in ACCEPT_ALIASES and quality > 0:
+                ranked.append((-quality, position, ACCEPT_ALIASES[media_type]))
+        available = available_formats()
+        ranked = [fmt for _, _, fmt in sorted(ranked)]
+        served = [fmt for fmt in ranked if fmt in available]
+        # Only listing formats this server can't encode is still a 406
+        fmt = (served or ranked or ["json"])[0]
+    if fmt not in available_formats():
+        raise FormatError(f"Format '{fmt}' is not available on this server.", 406)
+    return fmt
+
+
+def _float32(values):
+    return np.ascontiguousarray(values, dtype='<f4')
+
+
+def encode_columns(fmt, meta, columns):
+    # meta: JSON-able scalars and nested dicts; columns: name -> 1-D numeric array.
+    # msgpack carries each column as raw little-endian float32 bytes, Arrow as a float32 record batch.
+    # Round-trip through JSON so map keys are strings exactly as in the JSON responses
+    meta = json.loads(json.dumps(jsonable_encoder(meta)))
+    if fmt == "msgpack":
+        body = msgpack.packb({
+            "meta": meta,
+            "dtype": "float32",
+            "columns": {name: _float32(values).tobytes() for name, values in columns.items()},
+        }, use_bin_type=True)
+    elif fmt == "arrow":
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(_float32(values)) for values in columns.values()],
+            names=list(columns),
+        )
+        schema = batch.schema.with_metadata({"meta": json.dumps(meta)})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, schema) as writer:
+            writer.write_batch(batch.replace_schema_metadata(schema.metadata))
+        body = sink.getvalue().to_pybytes()
+    else:
+        raise FormatError(f"Format '{fmt}' has no columnar encoder.", 406)
+    return Response(content=body, media_type=MEDIA_TYPES[fmt])
@@ -0,0 +1,6 @@
+class RequestError(Exception):
+    # A request the endpoints answer with a JSON error and this status instead of a 500
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
@@ -0,0 +1,155 @@
+import asyncio
+import os
+
+from fastapi.encoders import jsonable_encoder
+
+from payoff import pnl_rows
+from pipeline import StageTimings, StrategyDataError, pipeline
+
+# Seconds between refreshes of a subscribed ticker; fresh data still comes through the market-data cache TTLs
+REFRESH_SECONDS = float(os.environ.get("LIVE_REFRESH_SECONDS", 15))
+SUBSCRIBER_QUEUE_SIZE = 32
+# Deltas reprice against the legs and price grid of their session, so changes to these reopen it
+SESSION_FIELDS = ("premium_breakdown", "current_price")
+
+
+class Subscriber:
+    def __init__(self, key):
+        self.key = key
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def push(self, message, state):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A client this far behind gets the latest full state instead of the backlog
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(state.snapshot() if state.payload is not None else message)
+
+
+class StreamState:
+    # Last state sent for one (ticker, expiry, strike), so refreshes only send what changed
+    def __init__(self):
+        self.subscribers = set()
+        self.payload = None
+        self.premiums = None
+        self.rows = {}
+        self.context_id = None
+
+    def snapshot(self):
+        return jsonable_encoder({
+            "type": "snapshot",
+            **self.payload,
+            "premiums": self.premiums,
+            "strategies": list(self.rows.values()),
+        })
+
+    def update(self, evaluation):
+        payload = dict(evaluation.payload)
+        premiums = payload.pop("premiums")
+        rows = {row["Price at Expiry"]: row for row in pnl_rows(evaluation.price_points, evaluation.curves)}
+        # One delta session serves every subscriber of the stream. A delta entry replaces that
+        # strategy's overrides, so each reply only depends on what its client sent.
+        if self.payload is None or any(payload.get(f) != self.payload.get(f) for f in SESSION_FIELDS):
+            self.context_id = pipeline.open_session(evaluation)
+        payload["context_id"] = self.context_id
+
+        if self.payload is None:
+            self.payload, self.premiums, self.rows = payload, premiums, rows
+            return self.snapshot()
+
+        fields = {key: value for key, value in payload.items() if self.payload.get(key) != value}
+        changed_rows = [row for label, row in rows.items() if self.rows.get(label) != row]
+        removed_rows = [label for label in self.rows if label not in rows]
+        changed_premiums = {
+            side: {k: v for k, v in values.items() if self.premiums[side].get(k) != v}
+            for side, values in premiums.items()
+        }
+        removed_premiums = {
+            side: [k for k in self.premiums[side] if k not in values] for side, values in premiums.items()
+        }
+        self.payload, self.premiums, self.rows = payload, premiums, rows
+
+        if not (fields or changed_rows or removed_rows
+                or any(changed_premiums.values()) or any(removed_premiums.values())):
+            return None
+        return jsonable_encoder({
+            "type": "update",
+            "fields": fields,
+            "rows": changed_rows,
+            "removed_rows": removed_rows,
+            "premiums": changed_premiums,
+            "removed_premiums": removed_premiums,
+        })
+
+
+class LiveHub:
+    # One refresher task per ticker evaluates every subscribed (expiry, strike) once per tick
+    # and fans the result out to all of its subscribers
+    def __init__(self, refresh_seconds=REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._streams = {}
+        self._refreshers = {}
+
+    async def subscribe(self, ticker, expiry=None, strike=None):
+        key = (ticker.upper(), expiry, strike)
+        subscriber = Subscriber(key)
+        state = self._streams.get(key)
+        if state is None:
+            state = self._streams[key] = StreamState()
+        state.subscribers.add(subscriber)
+        if state.payload is not None:
+            subscriber.push(state.snapshot(), state)
+        else:
+            await self._refresh(key, state)
+        if key[0] not in self._refreshers:
+            self._refreshers[key[0]] = asyncio.create_task(self._run(key[0]))
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        key = subscriber.key
+        state = self._streams.get(key)
+        if state is None:
+            return
+        state.subscribers.discard(subscriber)
+        if not state.subscribers:
+            del self._streams[key]
+        if not any(k[0] == key[0] for k in self._streams):
+            task = self._refreshers.pop(key[0], None)
+            if task is not None:
+                task.cancel()
+
+    async def _run(self, ticker):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            streams = [(key, state) for key, state in self._streams.items() if key[0] == ticker]
+            # Streams on the same expiry share one chain load through the market-data cache
+            await asyncio.gather(*(self._refresh(key, state) for key, state in streams))
+
+    async def _refresh(self, key, state):
+        ticker, expiry, strike = key
+        timings = StageTimings()
+        try:
+            evaluation = await pipeline.run(ticker, expiry, strike, timings=timings)
+            message = state.update(evaluation)
+        except StrategyDataError as e:
+            message = {"type": "error", "error": e.message}
+        except Exception as e:
+            message = {"type": "error", "error": f"An error occurred: {str(e)}"}
+        finally:
+            pipeline.record(timings, "/ws/options-strategy-pnl")
+        if message is None:
+            return
+        for subscriber in list(state.subscribers):
+            subscriber.push(message, state)
+
+    def stats(self):
+        return {
+            "tickers": sorted(self._refreshers),
+            "streams": len(self._streams),
+            "subscribers": sum(len(state.subscribers) for state in self._streams.values()),
+        }
+
+
+hub = LiveHub()
@@ -0,0 +1,269 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import metrics
+from providers import provider_from_env
+from snapshots import SnapshotStore, parse_timestamp, validate_expiry, validate_ticker
+
+# Seconds each kind of market data stays fresh, overridable per kind from the environment
+CACHE_TTLS = {
+    "spot": float(os.environ.get("MARKET_DATA_TTL_SPOT", 15)),
+    "expiries": float(os.environ.get("MARKET_DATA_TTL_EXPIRIES", 3600)),
+    "chain": float(os.environ.get("MARKET_DATA_TTL_CHAIN", 60)),
+    "history": float(os.environ.get("MARKET_DATA_TTL_HISTORY", 3600)),
+}
+CACHE_MAX_BYTES = int(float(os.environ.get("MARKET_DATA_CACHE_MB", 256)) * 1024 * 1024)
+# Upper bound on concurrent blocking provider calls
+FETCH_WORKERS = int(os.environ.get("MARKET_DATA_WORKERS", 8))
+# Directory every live chain fetch is appended to, unset to keep no history
+SNAPSHOT_DIR = os.environ.get("MARKET_DATA_SNAPSHOT_DIR")
+# Oldest stored chain a restarted worker serves from the snapshot store, in seconds. Warmed
+# chains are served until they reach this age, which may be shorter or longer than the chain TTL.
+WARM_MAX_AGE = float(os.environ.get("MARKET_DATA_WARM_MAX_AGE", CACHE_TTLS["chain"]))
+
+
+def estimate_size(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class MarketDataCache:
+    # Process-wide TTL cache with LRU eviction once the stored data exceeds max_bytes
+    def __init__(self, ttls=None, max_bytes=CACHE_MAX_BYTES, clock=time.monotonic):
+        self.ttls = dict(CACHE_TTLS if ttls is None else ttls)
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = {kind: 0 for kind in self.ttls}
+        self.misses = {kind: 0 for kind in self.ttls}
+        self.evictions = 0
+
+    def get(self, kind, key, count=True):
+        full_key = (kind,) + key
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and entry[0] > self.clock():
+                self._entries.move_to_end(full_key)
+                if count:
+                    self.hits[kind] = self.hits.get(kind, 0) + 1
+                return True, entry[2]
+            if entry is not None:
+                self._drop(full_key)
+            if count:
+                self.misses[kind] = self.misses.get(kind, 0) + 1
+            return False, None
+
+    def put(self, kind, key, value, ttl=None):
+        # An explicit ttl replaces the kind's TTL for this entry, warmed snapshots outlive it
+        ttl = self.ttls.get(kind, 0) if ttl is None else ttl
+        if ttl <= 0:
+            return
+        full_key = (kind,) + key
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if full_key in self._entries:
+                self._drop(full_key)
+            self._entries[full_key] = (self.clock() + ttl, size, value)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate(self, kind=None, key=None):
+        with self._lock:
+            for full_key in list(self._entries):
+                if kind is not None and full_key[0] != kind:
+                    continue
+                if key is not None and full_key[1:] != key:
+                    continue
+                self._drop(full_key)
+
+    def clear(self):
+        self.invalidate()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttls": dict(self.ttls),
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+                "evictions": self.evictions,
+            }
+
+    def _drop(self, full_key):
+        _, size, _ = self._entries.pop(full_key)
+        self._bytes -= size
+
+
+cache = MarketDataCache()
+store = SnapshotStore(SNAPSHOT_DIR) if SNAPSHOT_DIR else None
+provider = provider_from_env(store=store)
+
+
+def _cache_metrics():
+    stats = cache.stats()
+    kinds = sorted(set(stats["hits"]) | set(stats["misses"]))
+    return (
+        metrics.sample_lines("market_data_cache_hits_total", "Market data cache hits.", "counter",
+                             ("kind",), {(k,): stats["hits"].get(k, 0) for k in kinds})
+        + metrics.sample_lines("market_data_cache_misses_total", "Market data cache misses.", "counter",
+                               ("kind",), {(k,): stats["misses"].get(k, 0) for k in kinds})
+        + metrics.sample_lines("market_data_cache_bytes", "Estimated size of cached market data.", "gauge",
+                               (), {(): stats["bytes"]})
+    )
+
+
+def provider_stats():
+    return {"name": provider.name, "fallbacks": getattr(provider, "fallbacks", None)}
+
+
+def _provider_metrics():
+    fallbacks = getattr(provider, "fallbacks", None)
+    if fallbacks is None:
+        return []
+    return metrics.sample_lines(
+        "market_data_provider_fallbacks_total", "Provider calls answered by the fallback provider.", "counter",
+        ("provider",), {(provider.name,): fallbacks},
+    )
+
+
+metrics.registry.add_collector(_cache_metrics)
+metrics.registry.add_collector(_provider_metrics)
+
+
+def set_provider(new_provider):
+    # Swapping the source invalidates everything loaded from the old one
+    global provider
+    provider = new_provider
+    cache.clear()
+
+
+def warm_cache(now=None, max_age=None):
+    # Seeds the cache from the newest stored snapshot of every chain younger than max_age, served
+    # until it reaches that age, so a restarted worker doesn't refetch what it just had
+    if store is None:
+        return 0
+    now = now or datetime.now(timezone.utc)
+    max_age = WARM_MAX_AGE if max_age is None else max_age
+    warmed = 0
+    for ticker in store.tickers():
+        for expiry in store.expiries(ticker):
+            latest = store.latest(ticker, expiry)
+            if latest is None:
+                continue
+            age = (now - parse_timestamp(latest)).total_seconds()
+            if age >= max_age:
+                continue
+            calls, puts, meta = store.load(ticker, expiry, latest)
+            cache.put("chain", (ticker, expiry), (calls, puts), ttl=max_age - age)
+            if meta.get("spot") is not None and age < cache.ttls.get("spot", 0):
+                cache.put("spot", (ticker,), meta["spot"], ttl=cache.ttls.get("spot", 0) - age)
+            warmed += 1
+    return warmed
+
+
+def _load_spot(ticker):
+    return metrics.observe_upstream(provider.name, "spot", lambda: provider.spot(ticker))
+
+
+def _load_expiries(ticker):
+    return metrics.observe_upstream(provider.name, "expiries", lambda: tuple(provider.expiries(ticker)))
+
+
+def _load_chain(ticker, expiry):
+    return metrics.observe_upstream(provider.name, "chain", lambda: provider.chain(ticker, expiry))
+
+
+def _load_history(ticker, period):
+    return metrics.observe_upstream(provider.name, "history", lambda: provider.history(ticker, period))
+
+
+# Async access: blocking loads run on a bounded pool and identical in-flight loads are shared
+_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="market-data")
+_inflight = {}
+
+
+def _load_and_store(kind, key, loader):
+    value = loader()
+    cache.put(kind, key, value)
+    return value
+
+
+def _start_fetch(kind, key, loader):
+    loop = asyncio.get_running_loop()
+    inflight_key = (loop, kind) + key
+    future = _inflight.get(inflight_key)
+    if future is None:
+        future = loop.run_in_executor(_executor, _load_and_store, kind, key, loader)
+        _inflight[inflight_key] = future
+
+        def _done(f):
+            _inflight.pop(inflight_key, None)
+            # Mark the error as retrieved, waiters still see it
+            if not f.cancelled():
+                f.exception()
+
+        future.add_done_callback(_done)
+    return future
+
+
+async def _fetch(kind, key, loader):
+    found, value = cache.get(kind, key)
+    if found:
+        return value
+    # Shielded so one client disconnecting doesn't cancel the load for everyone else
+    return await asyncio.shield(_start_fetch(kind, key, loader))
+
+
+async def fetch_spot(ticker):
+    ticker = validate_ticker(ticker)
+    return await _fetch("spot", (ticker,), lambda: _load_spot(ticker))
+
+
+async def fetch_expiries(ticker):
+    ticker = validate_ticker(ticker)
+    return await _fetch("expiries", (ticker,), lambda: _load_expiries(ticker))
+
+
+async def fetch_option_chain(ticker, expiry):
+    ticker = validate_ticker(ticker)
+    expiry = validate_expiry(expiry)
+    return await _fetch("chain", (ticker, expiry), lambda: _load_chain(ticker, expiry))
+
+
+async def fetch_history(ticker, period="1y"):
+    # Daily closes as a float array, oldest first
+    ticker = validate_ticker(ticker)
+    return await _fetch("history", (ticker, period), lambda: _load_history(ticker, period))
+
+
+def prefetch_option_chain(ticker, expiry):
+    # Starts a chain load in the background that a later fetch_option_chain joins, only when the
+    # cached expiry list already shows the expiry is listed; otherwise the caller fetches it after validating
+    ticker = validate_ticker(ticker)
+    expiry = validate_expiry(expiry)
+    listed, expiry_list = cache.get("expiries", (ticker,), count=False)
+    if not listed or expiry not in expiry_list:
+        return
+    found, _ = cache.get("chain", (ticker, expiry), count=False)
+    if not found:
+        _start_fetch("chain", (ticker, expiry), lambda: _load_chain(ticker, expiry))
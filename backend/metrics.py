@@ -0,0 +1,203 @@
+import bisect
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+# Upper bounds in seconds, from cache hits up to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Send a Server-Timing header on every response instead of only when a request asks for one
+SERVER_TIMING_ALWAYS = os.environ.get("METRICS_SERVER_TIMING", "").lower() in ("1", "true", "yes")
+SERVER_TIMING_REQUEST_HEADER = "x-server-timing"
+
+# Stage spans of the request being handled, collected for its Server-Timing header
+_request_spans = ContextVar("request_spans", default=None)
+
+
+class RequestSpans:
+    def __init__(self):
+        self.durations = {}
+        self.cached = set()
+        # Executor threads working for the same request record into one RequestSpans
+        self.lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def sample_lines(name, help_text, kind, labels, samples):
+    # Exposition lines for a metric whose values are kept elsewhere, {label values: value}
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for values, value in sorted(samples.items()):
+        lines.append(f"{name}{_label_text(labels, values)} {_number(value)}")
+    return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            samples = dict(self._values)
+        return sample_lines(self.name, self.help, "counter", self.labels, samples)
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [counts per bucket (non-cumulative, last one +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, *label_values):
+        position = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][position] += 1
+            series[1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(values, list(counts), total) for values, (counts, total) in sorted(self._series.items())]
+        for values, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _label_text(self.labels + ("le",), values + (_number(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {_number(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        # collect() returns exposition lines for values owned elsewhere, read at scrape time
+        self._collectors.append(collect)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests handled, by route and status code.", ("route", "method", "status"),
+)
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "Time from request to response headers, by route.", ("route", "method"),
+)
+stage_seconds = registry.histogram(
+    "strategy_stage_duration_seconds", "Time spent in each pipeline stage, by route.", ("route", "stage"),
+)
+stage_cache_hits = registry.counter(
+    "strategy_stage_cache_hits_total", "Pipeline stages served from the pipeline caches, by route.", ("route", "stage"),
+)
+upstream_requests = registry.counter(
+    "market_data_upstream_requests_total", "Blocking calls made to the market data provider.", ("provider", "kind"),
+)
+upstream_errors = registry.counter(
+    "market_data_upstream_errors_total", "Market data provider calls that raised.", ("provider", "kind"),
+)
+upstream_seconds = registry.histogram(
+    "market_data_upstream_duration_seconds", "Latency of market data provider calls.", ("provider", "kind"),
+)
+
+
+def observe_upstream(provider_name, kind, load):
+    start = time.perf_counter()
+    upstream_requests.inc(provider_name, kind)
+    try:
+        return load()
+    except Exception:
+        upstream_errors.inc(provider_name, kind)
+        raise
+    finally:
+        upstream_seconds.observe(time.perf_counter() - start, provider_name, kind)
+
+
+def record_stages(timings, route):
+    for stage, seconds in timings.durations.items():
+        stage_seconds.observe(seconds, route, stage)
+    for stage in timings.cached:
+        stage_cache_hits.inc(route, stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        with spans.lock:
+            for stage, seconds in timings.durations.items():
+                spans.durations[stage] = spans.durations.get(stage, 0.0) + seconds
+            spans.cached.update(timings.cached)
+
+
+def start_request_spans():
+    # Returns the RequestSpans record_stages fills for the current request, and the token to reset it
+    spans = RequestSpans()
+    return spans, _request_spans.set(spans)
+
+
+def end_request_spans(token):
+    _request_spans.reset(token)
+
+
+def server_timing_header(spans, total_seconds):
+    # Stages answered from a pipeline cache carry desc="cached", with or without a duration
+    entries = []
+    for stage in list(spans.durations) + sorted(spans.cached - set(spans.durations)):
+        entry = stage + (';desc="cached"' if stage in spans.cached else "")
+        if stage in spans.durations:
+            entry += f";dur={spans.durations[stage] * 1000:.3f}"
+        entries.append(entry)
+    entries.append(f"total;dur={total_seconds * 1000:.3f}")
+    return ", ".join(entries)
+
+
+def wants_server_timing(headers):
+    return SERVER_TIMING_ALWAYS or headers.get(SERVER_TIMING_REQUEST_HEADER, "").lower() in ("1", "true", "yes")
@@ -0,0 +1,120 @@
+import math
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+import workers
+from payoff import STRATEGY_NAMES, legs_pnl, strategy_leg_arrays
+from pricing import DEFAULT_VOL, atm_implied_vol
+
+MODELS = ("lognormal", "bootstrap")
+VOL_SOURCES = ("implied", "historical")
+TRADING_DAYS = 252
+MAX_PATHS = 5_000_000
+# Simulated values held at once per chunk (paths x horizon days for the bootstrap model)
+CHUNK_ELEMENTS = int(os.environ.get("MONTECARLO_CHUNK_ELEMENTS", 2_000_000))
+# Processes in the shared simulation pool, 1 runs every chunk in the calling thread
+MONTECARLO_WORKERS = int(os.environ.get("MONTECARLO_WORKERS", 1))
+
+
+def log_returns(closes):
+    closes = np.asarray(closes, dtype=float)
+    closes = closes[np.isfinite(closes) & (closes > 0)]
+    return np.diff(np.log(closes))
+
+
+def historical_vol(closes):
+    returns = log_returns(closes)
+    if len(returns) < 2:
+        return None
+    return float(returns.std(ddof=1) * math.sqrt(TRADING_DAYS))
+
+
+def simulate_terminal(rng, n, spot, t, rate, model, sigma=None, returns=None):
+    if t <= 0:
+        return np.full(n, float(spot))
+    if model == "bootstrap":
+        # Resampled historical daily log returns summed over the trading days to expiry
+        days = max(1, round(t * TRADING_DAYS))
+        picks = rng.integers(0, len(returns), size=(n, days))
+        return spot * np.exp(returns[picks].sum(axis=1))
+    z = rng.standard_normal(n)
+    return spot * np.exp((rate - 0.5 * sigma * sigma) * t + sigma * math.sqrt(t) * z)
+
+
+def _chunk_stats(seed, n, spot, t, rate, model, sigma, returns, legs, tail_size):
+    # Profit counts, sums and the tail_size worst outcomes of every strategy on one chunk of paths
+    rng = np.random.default_rng(seed)
+    prices = simulate_terminal(rng, n, spot, t, rate, model, sigma, returns)
+    pnl = legs_pnl(prices, legs, len(STRATEGY_NAMES))
+    k = min(tail_size, n)
+    worst = np.partition(pnl, k - 1, axis=0)[:k] if k < n else pnl
+    return (pnl > 0).sum(axis=0), pnl.sum(axis=0), np.square(pnl).sum(axis=0), worst
+
+
+def _keep_worst(current, incoming, k):
+    merged = incoming if current is None else np.concatenate([current, incoming])
+    if len(merged) > k:
+        merged = np.partition(merged, k - 1, axis=0)[:k]
+    return merged
+
+
+def _combine(results, tail_size):
+    profitable = total = total_sq = 0
+    worst = None
+    for chunk_profitable, chunk_total, chunk_sq, chunk_worst in results:
+        profitable = profitable + chunk_profitable
+        total = total + chunk_total
+        total_sq = total_sq + chunk_sq
+        worst = _keep_worst(worst, chunk_worst, tail_size)
+    return profitable, total, total_sq, worst
+
+
+def run_simulation(legs, spot, t, rate, paths, model="lognormal", sigma=None, returns=None,
+                   confidence=0.95, seed=None):
+    # All twelve strategies are evaluated on the same terminal prices in one kernel call per chunk.
+    # Chunks get their own child of one SeedSequence, so results don't depend on the worker count.
+    arrays = strategy_leg_arrays(legs, spot)
+    days = max(1, round(t * TRADING_DAYS)) if model == "bootstrap" else 1
+    chunk_paths = max(1000, CHUNK_ELEMENTS // max(days, len(STRATEGY_NAMES)))
+    sizes = [chunk_paths] * (paths // chunk_paths) + ([paths % chunk_paths] if paths % chunk_paths else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    # Exact VaR/CVaR: the ceil((1 - confidence) * paths) worst outcomes are all that's needed
+    tail_size = max(1, math.ceil((1 - confidence) * paths))
+    args = [(s, n, spot, t, rate, model, sigma, returns, arrays, tail_size) for s, n in zip(seeds, sizes)]
+
+    if MONTECARLO_WORKERS > 1 and len(args) > 1:
+        try:
+            pool = workers.process_pool("montecarlo", MONTECARLO_WORKERS)
+            totals = _combine(pool.map(_chunk_stats, *zip(*args)), tail_size)
+        except BrokenProcessPool:
+            workers.discard_pool("montecarlo")
+            raise
+    else:
+        totals = _combine((_chunk_stats(*a) for a in args), tail_size)
+    profitable, total, total_sq, worst = totals
+
+    mean = total / paths
+    variance = np.maximum(total_sq / paths - mean * mean, 0.0)
+    worst = np.sort(worst, axis=0)
+    return {
+        name: {
+            "probability_of_profit": round(float(profitable[i] / paths), 4),
+            "expected_pnl": round(float(mean[i]), 2),
+            "std_error": round(float(math.sqrt(variance[i] / paths)), 2),
+            "var": round(float(-worst[-1, i]), 2),
+            "cvar": round(float(-worst[:, i].mean()), 2),
+        }
+        for i, name in enumerate(STRATEGY_NAMES)
+    }
+
+
+def resolve_vol(vol_source, chain, spot, t, rate, closes=None):
+    # Falls back to the other source, then to DEFAULT_VOL, when the preferred one can't be computed
+    implied = atm_implied_vol(chain, spot, t, rate)
+    historical = historical_vol(closes) if closes is not None else None
+    for sigma in ((implied, historical) if vol_source == "implied" else (historical, implied)):
+        if sigma is not None and sigma > 0:
+            return sigma
+    return DEFAULT_VOL
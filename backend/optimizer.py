@@ -0,0 +1,247 @@
+from math import comb
+
+import numpy as np
+
+from payoff import LEG_ACTIONS, LEG_TYPES, STRATEGY_TEMPLATES, kink_pnl, payoff_extremes
+
+# Combinations scored per kernel call, bounds the (rows, legs + 1, legs) temporaries
+CHUNK_ROWS = 200_000
+MAX_TOP_K = 200
+MAX_COMBINATIONS = 5_000_000
+SORT_KEYS = ("risk_reward", "max_profit", "max_loss")
+# Worst-case P&L within this of zero counts as no loss
+NO_LOSS_TOLERANCE = 0.005
+
+# Option legs of each template listed from the lowest strike to the highest. Pairs of
+# neighbouring legs in `equal` may share a strike, all others must be strictly increasing.
+# Families in FAMILY_SHAPES are enumerated by their own rule instead.
+FAMILY_ORDER = {
+    "long_call": ((0,), ()),
+    "long_put": ((0,), ()),
+    "covered_call": ((1,), ()),
+    "protective_put": ((1,), ()),
+    "straddle": ((0, 1), ()),
+    "strangle": ((1, 0), ()),
+    "bull_call_spread": ((0, 1), ()),
+    "bear_put_spread": ((1, 0), ()),
+    "bear_call_spread": ((0, 1), ()),
+    "bull_put_spread": ((1, 0), ()),
+    "iron_condor": ((0, 1, 2, 3), (1,)),
+    "butterfly_spread": ((0, 1, 2), ()),
+}
+# Straddles put both legs on one strike; butterflies keep both wings the same width
+FAMILY_SHAPES = {
+    "straddle": "same_strike",
+    "butterfly_spread": "equal_wings",
+}
+
+
+def increasing_tuples(m, k):
+    # Every index tuple 0 <= a1 < ... < ak < m, shape (C(m, k), k)
+    if k == 0 or m < k:
+        return np.zeros((1 if k == 0 else 0, k), dtype=np.intp)
+    rows = np.arange(m, dtype=np.intp)[:, None]
+    for _ in range(k - 1):
+        last = rows[:, -1]
+        counts = m - 1 - last
+        starts = np.repeat(last + 1, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        rows = np.column_stack([np.repeat(rows, counts, axis=0), starts + offsets])
+    return rows
+
+
+def _prefix_chunks(n, k, chunk_rows, start=0):
+    # Increasing tuples over [start, n), split on leading indices until each piece fits chunk_rows
+    if k <= 1 or comb(n - start, k) <= chunk_rows:
+        yield increasing_tuples(n - start, k) + start
+        return
+    for first in range(start, n - k + 1):
+        for rest in _prefix_chunks(n, k - 1, chunk_rows, first + 1):
+            yield np.column_stack([np.full(len(rest), first, dtype=np.intp), rest])
+
+
+def _buffered(chunks, chunk_rows):
+    pending, size = [], 0
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= chunk_rows:
+            yield np.concatenate(pending)
+            pending, size = [], 0
+    if pending:
+        yield np.concatenate(pending)
+
+
+def combination_count(n, k, equal=()):
+    return comb(n, k) + len(equal) * comb(n, k - 1)
+
+
+def tuple_chunks(n, k, equal=(), chunk_rows=CHUNK_ROWS):
+    # Sorted strike indices for k legs, at most ~chunk_rows at a time. Each position j in
+    # `equal` also allows a[j] == a[j+1], enumerated as k-1 strict indices with column j repeated.
+    yield from _buffered(_prefix_chunks(n, k, chunk_rows), chunk_rows)
+    for j in equal:
+        for chunk in _buffered(_prefix_chunks(n, k - 1, chunk_rows), chunk_rows):
+            yield np.insert(chunk, j + 1, chunk[:, j], axis=1)
+
+
+def _equal_wing_chunks(grid, chunk_rows):
+    # (lower, center) from every strict pair, upper where the grid lists 2 * center - lower
+    for pairs in _buffered(_prefix_chunks(len(grid), 2, chunk_rows), chunk_rows):
+        target = 2 * grid[pairs[:, 1]] - grid[pairs[:, 0]]
+        # The target can land a rounding error either side of the listed strike
+        above = np.minimum(np.searchsorted(grid, target), len(grid) - 1)
+        below = np.maximum(above - 1, 0)
+        upper = np.where(np.abs(grid[below] - target) < np.abs(grid[above] - target), below, above)
+        found = np.isclose(grid[upper], target, rtol=0, atol=1e-6) & (upper > pairs[:, 1])
+        yield np.column_stack([pairs[found], upper[found]])
+
+
+def family_count(strategy, n):
+    # Combinations enumerated for a family over n strikes, before any filtering by the grid
+    order, equal = FAMILY_ORDER[strategy]
+    shape = FAMILY_SHAPES.get(strategy)
+    if shape == "same_strike":
+        return n
+    if shape == "equal_wings":
+        return comb(n, 2)
+    return combination_count(n, len(order), equal)
+
+
+def family_chunks(strategy, grid, chunk_rows=CHUNK_ROWS):
+    # Strike indices per leg in FAMILY_ORDER column order, at most ~chunk_rows at a time
+    order, equal = FAMILY_ORDER[strategy]
+    shape = FAMILY_SHAPES.get(strategy)
+    if shape == "same_strike":
+        for start in range(0, len(grid), chunk_rows):
+            idx = np.arange(start, min(start + chunk_rows, len(grid)), dtype=np.intp)
+            yield np.column_stack([idx] * len(order))
+    elif shape == "equal_wings":
+        yield from _equal_wing_chunks(grid, chunk_rows)
+    else:
+        yield from tuple_chunks(len(grid), len(order), equal, chunk_rows)
+
+
+def sort_scores(metrics, sort_by):
+    # Larger is better for every key; undefined ratios sort last
+    if sort_by == "max_profit":
+        primary, secondary = metrics["max_profit"], metrics["max_loss"]
+    elif sort_by == "max_loss":
+        primary, secondary = metrics["max_loss"], metrics["max_profit"]
+    else:
+        primary, secondary = metrics["risk_reward"], metrics["max_profit"]
+    return np.nan_to_num(primary, nan=-np.inf), np.nan_to_num(secondary, nan=-np.inf)
+
+
+def top_k(primary, secondary, k):
+    # Partition on the primary key first so only ties at the cut-off reach the full sort
+    candidates = np.arange(len(primary))
+    if len(primary) > k:
+        threshold = np.partition(primary, len(primary) - k)[len(primary) - k]
+        candidates = np.nonzero(primary >= threshold)[0]
+    order = np.lexsort((-secondary[candidates], -primary[candidates]))
+    return candidates[order[:k]]
+
+
+def score_family(strategy, chain, spot, strike_range=None, defined_risk=False, sort_by="risk_reward",
+                 k=10, chunk_rows=CHUNK_ROWS, max_combinations=MAX_COMBINATIONS):
+    # Enumerates every valid strike combination for one template over the chain's strike grid
+    # and keeps the k best by sort_by, scoring each chunk with the analytic kink-point kernel
+    template = STRATEGY_TEMPLATES[strategy]
+    order, _ = FAMILY_ORDER[strategy]
+    types = np.array([LEG_TYPES[t] for t, _, _, _, _ in template])
+    quantities = np.array([LEG_ACTIONS[a] * q for _, a, q, _, _ in template], dtype=float)
+
+    grid = chain.strikes
+    if strike_range is not None:
+        grid = grid[(grid >= spot * (1 - strike_range)) & (grid <= spot * (1 + strike_range))]
+    # Premium of every grid strike on each side, NaN where that side doesn't list it
+    side_premiums = {}
+    for leg_type, side in ((LEG_TYPES["call"], chain.calls), (LEG_TYPES["put"], chain.puts)):
+        prem = np.full(len(grid), np.nan)
+        pos = np.searchsorted(side.strikes, grid)
+        pos_clipped = np.minimum(pos, max(len(side.strikes) - 1, 0))
+        if len(side.strikes):
+            listed = side.strikes[pos_clipped] == grid
+            prem[listed] = side.premiums[pos_clipped[listed]]
+        side_premiums[leg_type] = prem
+    total = family_count(strategy, len(grid))
+    if total > max_combinations:
+        raise ValueError(
+            f"{total} {strategy} combinations over {len(grid)} strikes, narrow strike_range "
+            f"to stay under {max_combinations}."
+        )
+
+    best = None
+    for idx in family_chunks(strategy, grid, chunk_rows):
+        if len(idx) == 0:
+            continue
+        strikes = np.zeros((len(idx), len(template)))
+        premiums = np.full((len(idx), len(template)), float(spot))
+        for column, leg in enumerate(order):
+            strikes[:, leg] = grid[idx[:, column]]
+            premiums[:, leg] = side_premiums[types[leg]][idx[:, column]]
+        valid = np.isfinite(premiums).all(axis=1)
+        strikes, premiums = strikes[valid], premiums[valid]
+        if len(strikes) == 0:
+            continue
+
+        points, pnl, slope = kink_pnl(types, strikes, quantities, premiums)
+        max_profit, max_loss, breakevens = payoff_extremes(points, pnl, slope)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Combinations that can't lose (below a cent) rank above any finite ratio
+            risk_reward = np.where(
+                max_loss < -NO_LOSS_TOLERANCE, max_profit / -max_loss, np.where(max_profit > 0, np.inf, np.nan)
+            )
+        metrics = {
+            "strikes": strikes, "premiums": premiums, "max_profit": max_profit, "max_loss": max_loss,
+            "breakevens": breakevens, "risk_reward": risk_reward,
+        }
+        if defined_risk:
+            keep = np.isfinite(max_loss)
+            metrics = {name: values[keep] for name, values in metrics.items()}
+        if best is not None:
+            metrics = {name: np.concatenate([best[name], metrics[name]]) for name in metrics}
+        picked = top_k(*sort_scores(metrics, sort_by), k)
+        best = {name: values[picked] for name, values in metrics.items()}
+    return best, types, quantities
+
+
+def _number(value, digits=2):
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def combination_rows(strategy, best, quantities):
+    # max_loss is the lowest P&L over all prices, positive when every price ends in a profit
+    # (an arbitrage in the quotes). Rows that can't lose have no finite risk_reward, which
+    # comes back null; no_loss and arbitrage tell them apart from an undefined ratio.
+    if best is None:
+        return []
+    template = STRATEGY_TEMPLATES[strategy]
+    rows = []
+    for i in range(len(best["strikes"])):
+        legs = [
+            {
+                "type": leg_type,
+                "action": action,
+                "quantity": quantity,
+                "strike": round(float(best["strikes"][i, j]), 2) if leg_type != "stock" else None,
+                "premium": round(float(best["premiums"][i, j]), 3),
+            }
+            for j, (leg_type, action, quantity, _, _) in enumerate(template)
+        ]
+        rows.append({
+            "legs": legs,
+            "net_premium": round(float((best["premiums"][i] * quantities).sum()), 3),
+            "max_profit": _number(best["max_profit"][i]),
+            "max_loss": _number(best["max_loss"][i]),
+            "unlimited_profit": bool(np.isposinf(best["max_profit"][i])),
+            "unlimited_loss": bool(np.isneginf(best["max_loss"][i])),
+            "no_loss": bool(best["max_loss"][i] >= -NO_LOSS_TOLERANCE),
+            "arbitrage": bool(best["max_loss"][i] > NO_LOSS_TOLERANCE),
+            "breakevens": [round(float(b), 2) for b in np.sort(best["breakevens"][i]) if np.isfinite(b)],
+            "risk_reward": _number(best["risk_reward"][i], 4),
+        })
+    return rows
@@ -0,0 +1,313 @@
+import numpy as np
+
+LOT_SIZE = 100
+
+STRATEGY_NAMES = [
+    "long_call", "long_put", "covered_call", "protective_put",
+    "straddle", "strangle", "bull_call_spread", "bear_put_spread",
+    "bear_call_spread", "bull_put_spread", "iron_condor", "butterfly_spread"
+]
+
+
+def apply_strategy_premiums(breakdown, strategy_premiums):
+    # User supplied per-strategy premiums win over the resolved market premiums
+    if not strategy_premiums:
+        return breakdown
+    merged = {}
+    for name, legs in breakdown.items():
+        overrides = strategy_premiums.get(name) or {}
+        merged[name] = dict(legs)
+        for key, value in overrides.items():
+            if key not in legs or value is None:
+                continue
+            try:
+                merged[name][key] = float(value)
+            except (TypeError, ValueError):
+                continue
+    return merged
+
+
+class StrategyLegs:
+    # Resolved strikes and premiums for every strategy, keyed like premium_breakdown()
+    def __init__(self, selected_strike, legs):
+        self.selected_strike = selected_strike
+        self.legs = legs
+
+    def __getitem__(self, name):
+        return self.legs[name]
+
+    def breakdown(self):
+        return {name: dict(legs) for name, legs in self.legs.items()}
+
+    def with_premiums(self, strategy_premiums):
+        if not strategy_premiums:
+            return self
+        return StrategyLegs(self.selected_strike, apply_strategy_premiums(self.legs, strategy_premiums))
+
+    def with_chain_premiums(self, call_premiums=None, put_premiums=None):
+        # Per-strike user premiums replace the premium of every leg quoted at that strike,
+        # the same lookup OptionStrategies.get_price does before falling back to the chain
+        if not call_premiums and not put_premiums:
+            return self
+        overrides = {"call": call_premiums or {}, "put": put_premiums or {}}
+        legs = self.breakdown()
+        for name, template in STRATEGY_TEMPLATES.items():
+            for leg_type, _, _, strike_key, premium_key in template:
+                by_strike = overrides.get(leg_type)
+                if by_strike and float(legs[name][strike_key]) in by_strike:
+                    legs[name][premium_key] = round(by_strike[float(legs[name][strike_key])], 3)
+        return StrategyLegs(self.selected_strike, legs)
+
+
+# Leg templates for the built-in strategies: (type, action, quantity, strike key, premium key).
+# Stock legs are entered at the current price.
+STRATEGY_TEMPLATES = {
+    "long_call": [("call", "buy", 1, "call_strike", "call_premium")],
+    "long_put": [("put", "buy", 1, "put_strike", "put_premium")],
+    "covered_call": [
+        ("stock", "buy", 1, None, None),
+        ("call", "sell", 1, "call_strike", "call_premium"),
+    ],
+    "protective_put": [
+        ("stock", "buy", 1, None, None),
+        ("put", "buy", 1, "put_strike", "put_premium"),
+    ],
+    "straddle": [
+        ("call", "buy", 1, "call_strike", "call_premium"),
+        ("put", "buy", 1, "put_strike", "put_premium"),
+    ],
+    "strangle": [
+        ("call", "buy", 1, "call_strike", "call_premium"),
+        ("put", "buy", 1, "put_strike", "put_premium"),
+    ],
+    "bull_call_spread": [
+        ("call", "buy", 1, "buy_strike", "buy_premium"),
+        ("call", "sell", 1, "sell_strike", "sell_premium"),
+    ],
+    "bear_put_spread": [
+        ("put", "buy", 1, "buy_strike", "buy_premium"),
+        ("put", "sell", 1, "sell_strike", "sell_premium"),
+    ],
+    "bear_call_spread": [
+        ("call", "sell", 1, "sell_strike", "sell_premium"),
+        ("call", "buy", 1, "buy_strike", "buy_premium"),
+    ],
+    "bull_put_spread": [
+        ("put", "sell", 1, "sell_strike", "sell_premium"),
+        ("put", "buy", 1, "buy_strike", "buy_premium"),
+    ],
+    "iron_condor": [
+        ("put", "buy", 1, "put_buy_strike", "put_buy_premium"),
+        ("put", "sell", 1, "put_sell_strike", "put_sell_premium"),
+        ("call", "sell", 1, "call_sell_strike", "call_sell_premium"),
+        ("call", "buy", 1, "call_buy_strike", "call_buy_premium"),
+    ],
+    "butterfly_spread": [
+        ("call", "buy", 1, "buy_lower_strike", "buy_lower_premium"),
+        ("call", "sell", 2, "sell_center_strike", "sell_center_premium"),
+        ("call", "buy", 1, "buy_upper_strike", "buy_upper_premium"),
+    ],
+}
+
+LEG_TYPES = {"call": 0, "put": 1, "stock": 2}
+LEG_ACTIONS = {"buy": 1.0, "sell": -1.0}
+
+
+class LegArrays:
+    # Column layout of a set of legs, `groups` maps each leg to the strategy it belongs to
+    def __init__(self, types, strikes, quantities, premiums, groups=None):
+        self.types = np.asarray(types, dtype=np.int8)
+        self.strikes = np.asarray(strikes, dtype=float)
+        self.quantities = np.asarray(quantities, dtype=float)  # signed, negative when sold
+        self.premiums = np.asarray(premiums, dtype=float)
+        self.groups = np.zeros(len(self.types), dtype=np.intp) if groups is None else np.asarray(groups, dtype=np.intp)
+
+    def __len__(self):
+        return len(self.types)
+
+    @classmethod
+    def from_legs(cls, legs, groups=None):
+        # legs: dicts or objects with type/strike/action/quantity/premium
+        types, strikes, quantities, premiums = [], [], [], []
+        for leg in legs:
+            get = leg.get if isinstance(leg, dict) else lambda k, leg=leg: getattr(leg, k)
+            leg_type = str(get("type")).lower()
+            action = str(get("action")).lower()
+            if leg_type not in LEG_TYPES:
+                raise ValueError(f"Unknown leg type: {get('type')}")
+            if action not in LEG_ACTIONS:
+                raise ValueError(f"Unknown leg action: {get('action')}")
+            if float(get("quantity")) <= 0:
+                raise ValueError("Leg quantity must be positive")
+            types.append(LEG_TYPES[leg_type])
+            strikes.append(float(get("strike") or 0.0))
+            quantities.append(LEG_ACTIONS[action] * float(get("quantity")))
+            premiums.append(float(get("premium")))
+        return cls(types, strikes, quantities, premiums, groups)
+
+
+def legs_payoff(prices, legs):
+    # Per-unit value of every leg at expiry, shape (len(prices), len(legs)). A 2-D prices
+    # array gives each leg its own underlying price per row.
+    p = np.asarray(prices, dtype=float)
+    p = p[:, None] if p.ndim == 1 else p
+    k = legs.strikes[None, :]
+    return np.where(
+        legs.types == LEG_TYPES["call"], np.maximum(p - k, 0.0),
+        np.where(legs.types == LEG_TYPES["put"], np.maximum(k - p, 0.0), p),
+    )
+
+
+def group_pnl(values, legs, n_groups=1):
+    # Sums per-unit leg values net of premium into lot P&L per group in one matrix product,
+    # the last axis of values runs over the legs and becomes n_groups
+    membership = np.zeros((len(legs), n_groups))
+    membership[np.arange(len(legs)), legs.groups] = 1.0
+    return (values - legs.premiums) * legs.quantities @ membership * LOT_SIZE
+
+
+def legs_pnl(prices, legs, n_groups=1):
+    # Leg P&L at expiry summed per group, shape (len(prices), n_groups)
+    return group_pnl(legs_payoff(prices, legs), legs, n_groups)
+
+
+def rounded_list(values, digits=2):
+    # NaN/inf become null so the result stays valid JSON
+    values = np.asarray(values, dtype=float)
+    rounded = np.round(values, digits).tolist()
+    return [v if ok else None for v, ok in zip(rounded, np.isfinite(values).tolist())]
+
+
+def template_legs(name, leg, current_price):
+    return [
+        {
+            "type": leg_type,
+            "action": action,
+            "quantity": quantity,
+            "strike": leg[strike_key] if strike_key else 0.0,
+            "premium": leg[premium_key] if premium_key else current_price,
+        }
+        for leg_type, action, quantity, strike_key, premium_key in STRATEGY_TEMPLATES[name]
+    ]
+
+
+def strategy_leg_arrays(legs, current_price, names=STRATEGY_NAMES):
+    stacked, groups = [], []
+    for i, name in enumerate(names):
+        template = template_legs(name, legs[name], current_price)
+        stacked.extend(template)
+        groups.extend([i] * len(template))
+    return LegArrays.from_legs(stacked, groups)
+
+
+def strategy_pnl_curves(prices, legs, current_price, strategy_premiums=None):
+    # Every built-in strategy is a leg template, so all of them go through one kernel call
+    priced = legs.with_premiums(strategy_premiums)
+    pnl = legs_pnl(prices, strategy_leg_arrays(priced, current_price), len(STRATEGY_NAMES))
+    return {name: pnl[:, i] for i, name in enumerate(STRATEGY_NAMES)}
+
+
+def kink_pnl(types, strikes, quantities, premiums):
+    # Expiry P&L is piecewise linear with kinks only at leg strikes, so the values at price 0 and
+    # at each strike plus the slope past the highest strike describe it exactly.
+    # types/quantities: (legs,), strikes/premiums: (n, legs). Returns points and pnl (n, legs + 1)
+    # and the slope per unit price above the last point, shape (n,).
+    types = np.asarray(types)
+    strikes = np.atleast_2d(np.asarray(strikes, dtype=float))
+    premiums = np.atleast_2d(np.asarray(premiums, dtype=float))
+    quantities = np.asarray(quantities, dtype=float)
+    points = np.concatenate([np.zeros((len(strikes), 1)), np.sort(strikes, axis=1)], axis=1)
+    # One (n, legs + 1) pass per leg rather than a 3-D broadcast, the leg count is tiny
+    pnl = np.zeros(points.shape)
+    for j, leg_type in enumerate(types):
+        k = strikes[:, j:j + 1]
+        if leg_type == LEG_TYPES["call"]:
+            value = np.maximum(points - k, 0.0)
+        elif leg_type == LEG_TYPES["put"]:
+            value = np.maximum(k - points, 0.0)
+        else:
+            value = points
+        pnl += (value - premiums[:, j:j + 1]) * quantities[j]
+    pnl *= LOT_SIZE
+    rising = (types == LEG_TYPES["call"]) | (types == LEG_TYPES["stock"])
+    slope = np.full(len(strikes), float(quantities[rising].sum()) * LOT_SIZE)
+    return points, pnl, slope
+
+
+def payoff_extremes(points, pnl, slope):
+    # Max profit/loss (+-inf when unbounded above) and breakevens, NaN-padded to (n, legs + 1)
+    max_profit = np.where(slope > 0, np.inf, pnl.max(axis=1))
+    max_loss = np.where(slope < 0, -np.inf, pnl.min(axis=1))
+    x0, x1 = points[:, :-1], points[:, 1:]
+    v0, v1 = pnl[:, :-1], pnl[:, 1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing = (v0 < 0) != (v1 < 0)
+        inner = np.where(crossing, x0 + (x1 - x0) * v0 / (v0 - v1), np.nan)
+        last = pnl[:, -1]
+        beyond = ((last < 0) & (slope > 0)) | ((last > 0) & (slope < 0))
+        tail = np.where(beyond, points[:, -1] - last / slope, np.nan)
+    return max_profit, max_loss, np.concatenate([inner, tail[:, None]], axis=1)
+
+
+def _extreme_ranges(points, pnl, target, open_ended):
+    # Price intervals [lo, hi] on which the piecewise-linear P&L sits at target; hi is None
+    # when it stays there past the last strike
+    hits = np.isclose(pnl, target, rtol=0.0, atol=1e-6).tolist()
+    ranges = []
+    for i, hit in enumerate(hits):
+        if not hit:
+            continue
+        if ranges and hits[i - 1]:
+            ranges[-1][1] = points[i]
+        else:
+            ranges.append([points[i], points[i]])
+    if ranges and hits[-1] and open_ended:
+        ranges[-1][1] = None
+    return [[round(lo, 2), None if hi is None else round(hi, 2)] for lo, hi in ranges]
+
+
+def payoff_summary(legs):
+    # Exact expiry extremes and breakevens of one set of legs from its kink points
+    points, pnl, slope = kink_pnl(legs.types, legs.strikes[None, :], legs.quantities, legs.premiums[None, :])
+    max_profit, max_loss, breakevens = payoff_extremes(points, pnl, slope)
+    points, pnl, slope = points[0].tolist(), pnl[0], float(slope[0])
+    max_profit, max_loss = float(max_profit[0]), float(max_loss[0])
+    return {
+        "max_profit": round(max_profit, 2) if np.isfinite(max_profit) else None,
+        "max_loss": round(max_loss, 2) if np.isfinite(max_loss) else None,
+        "unlimited_profit": bool(np.isposinf(max_profit)),
+        "unlimited_loss": bool(np.isneginf(max_loss)),
+        "max_profit_ranges": _extreme_ranges(points, pnl, max_profit, slope == 0) if np.isfinite(max_profit) else [],
+        "max_loss_ranges": _extreme_ranges(points, pnl, max_loss, slope == 0) if np.isfinite(max_loss) else [],
+        "breakevens": sorted(round(b, 2) for b in breakevens[0].tolist() if np.isfinite(b)),
+    }
+
+
+def strategy_payoff_summaries(legs, current_price, strategy_premiums=None, names=STRATEGY_NAMES):
+    priced = legs.with_premiums(strategy_premiums)
+    return {
+        name: payoff_summary(LegArrays.from_legs(template_legs(name, priced[name], current_price)))
+        for name in names
+    }
+
+
+def price_grid(center, price_range, points, strikes=()):
+    # Evenly spaced prices around center plus the strikes inside the window, where payoffs kink
+    lower, upper = center * (1 - price_range), center * (1 + price_range)
+    grid = np.linspace(lower, upper, points)
+    strikes = np.asarray(strikes, dtype=float)
+    strikes = strikes[(strikes >= lower) & (strikes <= upper)]
+    return np.unique(np.round(np.concatenate([grid, strikes]), 2))
+
+
+def pnl_rows(prices, curves):
+    # Row-per-price layout the frontend table reads
+    columns = {name: np.round(values, 2).tolist() for name, values in curves.items()}
+    finite = {name: np.isfinite(values).tolist() for name, values in curves.items()}
+    rows = []
+    for i, price in enumerate(prices):
+        row = {'Price at Expiry': f"${round(price, 2)}"}
+        for name in columns:
+            row[name] = columns[name][i] if finite[name][i] else "N/A"
+        rows.append(row)
+    return rows
@@ -0,0 +1,406 @@
+import asyncio
+import secrets
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
+
+import market_data
+import metrics
+from chain import ChainIndex, TermStructure
+from encoding import encode_columns
+from errors import RequestError
+from payoff import (
+    STRATEGY_NAMES, legs_pnl, pnl_rows, strategy_leg_arrays, strategy_payoff_summaries, strategy_pnl_curves,
+)
+from pricing import years_to_expiry
+from snapshots import validate_expiry, validate_ticker
+from strategies import resolve_strategy_legs
+
+# fetch -> index -> resolve -> evaluate -> serialize
+STAGES = ("fetch", "index", "resolve", "evaluate", "serialize")
+MAX_CACHED_INDEXES = 64
+MAX_CACHED_CONTEXTS = 256
+MAX_DELTA_SESSIONS = 512
+
+
+class StrategyDataError(RequestError):
+    pass
+
+
+class FetchedInputs:
+    def __init__(self, ticker, current_price, expiry_list, selected_expiry, calls, puts):
+        self.ticker = ticker.upper()
+        self.current_price = current_price
+        self.expiry_list = expiry_list
+        self.selected_expiry = selected_expiry
+        self.calls = calls
+        self.puts = puts
+
+    def quote(self):
+        # The same inputs without the chain DataFrames, for state that outlives the request
+        return FetchedInputs(self.ticker, self.current_price, self.expiry_list, self.selected_expiry, None, None)
+
+
+class StrategyContext:
+    # Everything about a (ticker, expiry, strike) request that doesn't depend on user premiums
+    def __init__(self, inputs, chain, atm_index, atm_strike, selected_strike, available_strikes, price_points, legs):
+        self.inputs = inputs
+        self.chain = chain
+        self.atm_index = atm_index
+        self.atm_strike = atm_strike
+        self.selected_strike = selected_strike
+        self.available_strikes = available_strikes
+        self.price_points = price_points
+        self.legs = legs
+        self._market_premiums = None
+
+    def premium_summary(self, premium_data=None):
+        if premium_data:
+            return {
+                "calls": self.chain.calls.premium_summary(premium_data.calls),
+                "puts": self.chain.puts.premium_summary(premium_data.puts),
+            }
+        if self._market_premiums is None:
+            self._market_premiums = {
+                "calls": self.chain.calls.premium_summary(),
+                "puts": self.chain.puts.premium_summary(),
+            }
+        return {side: dict(premiums) for side, premiums in self._market_premiums.items()}
+
+
+class Evaluation:
+    def __init__(self, context, payload, price_points, curves, legs=None, strategy_premiums=None):
+        self.context = context
+        self.payload = payload
+        self.price_points = price_points
+        self.curves = curves
+        # Legs with per-strike user premiums applied, per-strategy premiums kept separate
+        self.legs = legs if legs is not None else context.legs
+        self.strategy_premiums = strategy_premiums or {}
+
+
+class DeltaSession:
+    # One client's view of a context: the curves it was last sent and the premiums behind them
+    def __init__(self, evaluation):
+        self.context = evaluation.context
+        self.legs = evaluation.legs
+        self.strategy_premiums = {
+            name: dict(values) for name, values in evaluation.strategy_premiums.items()
+            if name in STRATEGY_NAMES and isinstance(values, dict)
+        }
+        self.curves = dict(evaluation.curves)
+        # Deltas for one session read and replace its premiums and curves as one step
+        self.lock = threading.Lock()
+
+
+class StageTimings:
+    def __init__(self):
+        self.durations = {}
+        # Stages answered from the index/context caches instead of being recomputed
+        self.cached = set()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = self.durations.get(name, 0.0) + time.perf_counter() - start
+
+
+class _IdentityLRU:
+    # Small LRU whose entries stay valid only while they were built from the same chain objects.
+    # The chains are held by weak reference, so a refreshed chain dropped by the market-data
+    # cache is freed rather than kept alive here; entries for dead chains are purged on put.
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, calls, puts):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0]() is calls and entry[1]() is puts:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            return None
+
+    def put(self, key, calls, puts, value):
+        with self._lock:
+            dead = [k for k, (c, p, _) in self._entries.items() if c() is None or p() is None]
+            for k in dead:
+                del self._entries[k]
+            self._entries[key] = (weakref.ref(calls), weakref.ref(puts), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def select_strike(chain, current_price, strike=None):
+    # Listed strike closest to spot, and the requested strike when it is listed
+    atm_index = chain.atm_index(current_price)
+    atm_strike = chain.strikes[atm_index].item()
+    selected_strike = strike if chain.has_strike(strike) else atm_strike
+    return atm_index, atm_strike, selected_strike
+
+
+def check_request(ticker, expiry=None):
+    # Malformed tickers and expiries never reach a provider
+    try:
+        validate_ticker(ticker)
+        if expiry:
+            validate_expiry(expiry)
+    except ValueError as e:
+        raise StrategyDataError(str(e))
+
+
+def check_strategy_premiums(strategy_premiums):
+    # {strategy: {premium_key: value}}; a bare value can't say which leg it prices
+    if not strategy_premiums:
+        return
+    if not isinstance(strategy_premiums, dict):
+        raise StrategyDataError("Strategy premiums must be an object keyed by strategy.")
+    invalid = sorted(name for name, values in strategy_premiums.items() if not isinstance(values, (dict, type(None))))
+    if invalid:
+        raise StrategyDataError(f"Premiums for {', '.join(invalid)} must be an object keyed by premium.")
+
+
+def validate_quote(ticker, current_price, expiry_list, expiry=None):
+    if pd.isna(current_price) or current_price <= 0:
+        raise StrategyDataError(f"Invalid price data for {ticker}.")
+    if not expiry_list:
+        raise StrategyDataError("No options data available.")
+    return expiry if expiry in expiry_list else expiry_list[0]
+
+
+class StrategyPipeline:
+    # Indexes and resolved contexts are cached against the chain objects they came from, so a
+    # premium edit on a chain still held by the market-data cache only re-runs evaluate
+    def __init__(self, max_indexes=MAX_CACHED_INDEXES, max_contexts=MAX_CACHED_CONTEXTS, max_sessions=MAX_DELTA_SESSIONS):
+        self._indexes = _IdentityLRU(max_indexes)
+        self._contexts = _IdentityLRU(max_contexts)
+        self._sessions = OrderedDict()
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self.stage_calls = {stage: 0 for stage in STAGES}
+        self.stage_seconds = {stage: 0.0 for stage in STAGES}
+        self.stage_cached = {stage: 0 for stage in STAGES}
+
+    async def fetch(self, ticker, expiry=None, timings=None):
+        timings = timings or StageTimings()
+        check_request(ticker, expiry)
+        with timings.stage("fetch"):
+            if expiry:
+                # With the expiry list cached, the chain for a listed expiry doesn't need to wait for the spot
+                market_data.prefetch_option_chain(ticker, expiry)
+            current_price, expiry_list = await asyncio.gather(
+                market_data.fetch_spot(ticker), market_data.fetch_expiries(ticker)
+            )
+            selected_expiry = validate_quote(ticker, current_price, expiry_list, expiry)
+            calls, puts = await market_data.fetch_option_chain(ticker, selected_expiry)
+        return FetchedInputs(ticker, current_price, expiry_list, selected_expiry, calls, puts)
+
+    async def fetch_term(self, ticker, expiry=None, count=4, timings=None):
+        # The selected expiry and up to count - 1 listed after it, all chains loaded concurrently
+        # and indexed into one TermStructure. Returns the near expiry's inputs with it.
+        timings = timings or StageTimings()
+        check_request(ticker, expiry)
+        with timings.stage("fetch"):
+            current_price, expiry_list = await asyncio.gather(
+                market_data.fetch_spot(ticker), market_data.fetch_expiries(ticker)
+            )
+            near_expiry = validate_quote(ticker, current_price, expiry_list, expiry)
+            start = list(expiry_list).index(near_expiry)
+            expiries = list(expiry_list[start:start + count])
+            chains = await asyncio.gather(*(market_data.fetch_option_chain(ticker, e) for e in expiries))
+        inputs = [
+            FetchedInputs(ticker, current_price, expiry_list, e, calls, puts)
+            for e, (calls, puts) in zip(expiries, chains)
+        ]
+        indexes = [self.index(i, timings) for i in inputs]
+        return inputs[0], TermStructure(expiries, indexes, [years_to_expiry(e) for e in expiries])
+
+    def index(self, inputs, timings=None):
+        timings = timings or StageTimings()
+        with timings.stage("index"):
+            key = (inputs.ticker, inputs.selected_expiry)
+            chain = self._indexes.get(key, inputs.calls, inputs.puts)
+            if chain is None:
+                chain = ChainIndex(inputs.calls, inputs.puts)
+                self._indexes.put(key, inputs.calls, inputs.puts, chain)
+            else:
+                timings.cached.add("index")
+        return chain
+
+    def resolve(self, inputs, strike=None, timings=None):
+        timings = timings or StageTimings()
+        key = (inputs.ticker, inputs.selected_expiry, strike, float(inputs.current_price))
+        context = self._contexts.get(key, inputs.calls, inputs.puts)
+        if context is not None:
+            timings.cached.update(("index", "resolve"))
+            return context
+
+        chain = self.index(inputs, timings)
+        with timings.stage("resolve"):
+            valid_strikes = chain.strike_list()
+            atm_index, atm_strike, selected_strike = select_strike(chain, inputs.current_price, strike)
+
+            start_idx = max(0, atm_index - 7)
+            end_idx = min(len(valid_strikes), atm_index + 8)
+            available_strikes = valid_strikes[start_idx:end_idx]
+
+            lower_bound = selected_strike * 0.9
+            upper_bound = selected_strike * 1.1
+            price_points = chain.strikes_between(lower_bound, upper_bound)
+
+            # Strikes and premiums don't depend on the price, resolve them once
+            legs = resolve_strategy_legs(
+                selected_strike, inputs.current_price, inputs.calls, inputs.puts, chain=chain
+            )
+            # Contexts are cached and kept by delta sessions, so they hold the index, not the frames
+            context = StrategyContext(
+                inputs.quote(), chain, atm_index, atm_strike, selected_strike, available_strikes, price_points, legs
+            )
+        self._contexts.put(key, inputs.calls, inputs.puts, context)
+        return context
+
+    def evaluate(self, context, premium_data=None, strategy_premiums=None, timings=None):
+        # User premiums are overlays on the cached market legs, never baked into the context
+        timings = timings or StageTimings()
+        check_strategy_premiums(strategy_premiums)
+        with timings.stage("evaluate"):
+            inputs = context.inputs
+            legs = context.legs
+            if premium_data:
+                legs = legs.with_chain_premiums(premium_data.calls, premium_data.puts)
+            curves = strategy_pnl_curves(context.price_points, legs, inputs.current_price, strategy_premiums)
+            payload = {
+                "ticker": inputs.ticker,
+                "current_price": round(inputs.current_price, 2),
+                "atm_strike": round(context.atm_strike, 2),
+                "selected_strike": round(context.selected_strike, 2),
+                "expiry": inputs.selected_expiry,
+                "available_expiries": inputs.expiry_list[:4],
+                "available_strikes": [round(s, 2) for s in context.available_strikes],
+                "premium_breakdown": legs.breakdown(),
+                "payoff_summary": strategy_payoff_summaries(legs, inputs.current_price, strategy_premiums),
+                "premiums": context.premium_summary(premium_data),
+            }
+        return Evaluation(context, payload, context.price_points, curves, legs, strategy_premiums)
+
+    def serialize(self, evaluation, response_format="json", timings=None):
+        timings = timings or StageTimings()
+        with timings.stage("serialize"):
+            if response_format == "json":
+                payload = dict(evaluation.payload)
+                payload["strategies"] = pnl_rows(evaluation.price_points, evaluation.curves)
+                return payload
+            return encode_columns(
+                response_format, evaluation.payload, {"price": evaluation.price_points, **evaluation.curves}
+            )
+
+    async def run(self, ticker, expiry=None, strike=None, premium_data=None, strategy_premiums=None, timings=None):
+        # fetch -> index -> resolve -> evaluate; callers add fields and then serialize.
+        # Everything after the fetch is CPU work and runs off the event loop.
+        timings = timings or StageTimings()
+        inputs = await self.fetch(ticker, expiry, timings)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self.evaluate(
+            self.resolve(inputs, strike, timings), premium_data, strategy_premiums, timings
+        ))
+
+    def open_session(self, evaluation):
+        # Keeps the evaluated state so later premium edits can be applied as deltas
+        session_id = secrets.token_urlsafe(12)
+        with self._lock:
+            self._sessions[session_id] = DeltaSession(evaluation)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session_id
+
+    def apply_delta(self, session_id, delta, timings=None):
+        # delta: {strategy: {premium_key: value}}, each entry replaces that strategy's overrides.
+        # Only the named strategies are repriced and only their columns are returned.
+        timings = timings or StageTimings()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+        if session is None:
+            raise StrategyDataError("Unknown or expired context, request the full strategy data again.", 404)
+        unknown = sorted(name for name in delta if name not in STRATEGY_NAMES)
+        if unknown:
+            raise StrategyDataError(f"Unknown strategies: {', '.join(unknown)}.")
+
+        with session.lock:
+            with timings.stage("evaluate"):
+                changed = [name for name in STRATEGY_NAMES if name in delta]
+                for name in changed:
+                    session.strategy_premiums[name] = dict(delta[name] or {})
+                if changed:
+                    context = session.context
+                    overrides = {name: session.strategy_premiums[name] for name in changed}
+                    priced = session.legs.with_premiums(overrides)
+                    legs = strategy_leg_arrays(priced, context.inputs.current_price, names=changed)
+                    pnl = legs_pnl(context.price_points, legs, len(changed))
+                    for i, name in enumerate(changed):
+                        session.curves[name] = pnl[:, i]
+                    summaries = strategy_payoff_summaries(priced, context.inputs.current_price, names=changed)
+                else:
+                    summaries = {}
+            # Curves are replaced, never written in place, so these stay as priced after the lock
+            curves = {name: session.curves[name] for name in changed}
+        with timings.stage("serialize"):
+            return {
+                "context_id": session_id,
+                "changed": changed,
+                "payoff_summary": summaries,
+                "strategies": pnl_rows(session.context.price_points, curves),
+            }
+
+    def record(self, timings, route="other"):
+        metrics.record_stages(timings, route)
+        with self._lock:
+            for stage, seconds in timings.durations.items():
+                self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            for stage in timings.cached:
+                self.stage_cached[stage] = self.stage_cached.get(stage, 0) + 1
+
+    def clear(self):
+        self._indexes.clear()
+        self._contexts.clear()
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self):
+        with self._lock:
+            stages = {
+                stage: {
+                    "calls": self.stage_calls.get(stage, 0),
+                    "total_ms": round(self.stage_seconds.get(stage, 0.0) * 1000, 3),
+                    "cached": self.stage_cached.get(stage, 0),
+                }
+                for stage in dict.fromkeys([*self.stage_calls, *self.stage_cached])
+            }
+        return {
+            "stages": stages,
+            "index_cache": {"hits": self._indexes.hits, "misses": self._indexes.misses},
+            "context_cache": {"hits": self._contexts.hits, "misses": self._contexts.misses},
+            "delta_sessions": len(self._sessions),
+        }
+
+
+pipeline = StrategyPipeline()
@@ -0,0 +1,146 @@
+import asyncio
+from collections import OrderedDict
+
+import numpy as np
+
+import market_data
+from payoff import LEG_TYPES, LegArrays, group_pnl, legs_payoff, rounded_list
+from pipeline import FetchedInputs, StrategyDataError, check_request, pipeline, validate_quote
+from pricing import RISK_FREE_RATE, bs_price, leg_vols, years_to_expiry
+
+MAX_PORTFOLIO_POSITIONS = 2000
+MAX_PORTFOLIO_LEGS = 20000
+MAX_SHOCKS = 201
+
+
+def shock_ladder(shock_range, steps):
+    # Evenly spaced spot moves from -shock_range to +shock_range, always including no move
+    shocks = np.linspace(-shock_range, shock_range, steps)
+    return np.unique(np.round(np.append(shocks, 0.0), 6))
+
+
+def stack_positions(positions):
+    # All legs of the book in one LegArrays, grouped by position, plus each leg's underlying and expiry
+    legs, groups, tickers, expiries = [], [], [], []
+    for i, position in enumerate(positions):
+        if not position.legs:
+            raise StrategyDataError(f"Position {i} has no legs.")
+        check_request(position.ticker)
+        ticker = position.ticker.upper()
+        for leg in position.legs:
+            if leg.type != "stock":
+                check_request(ticker, leg.expiry)
+            legs.append(leg)
+            groups.append(i)
+            tickers.append(ticker)
+            expiries.append(leg.expiry)
+    return LegArrays.from_legs(legs, groups), np.array(tickers), np.array(expiries)
+
+
+async def fetch_book_data(tickers, option_keys):
+    # One spot and expiry list per underlying and one chain per (underlying, expiry), all concurrent
+    quotes = await asyncio.gather(*(
+        asyncio.gather(market_data.fetch_spot(t), market_data.fetch_expiries(t)) for t in tickers
+    ))
+    spots = {}
+    expiry_lists = {}
+    for ticker, (spot, expiry_list) in zip(tickers, quotes):
+        validate_quote(ticker, spot, expiry_list)
+        spots[ticker] = float(spot)
+        expiry_lists[ticker] = expiry_list
+    for ticker, expiry in option_keys:
+        if expiry not in expiry_lists[ticker]:
+            raise StrategyDataError(f"Expiry {expiry} is not listed for {ticker}.")
+    chains = await asyncio.gather(*(market_data.fetch_option_chain(t, e) for t, e in option_keys))
+    indexes = {
+        (ticker, expiry): pipeline.index(
+            FetchedInputs(ticker, spots[ticker], expiry_lists[ticker], expiry, calls, puts)
+        )
+        for (ticker, expiry), (calls, puts) in zip(option_keys, chains)
+    }
+    return spots, indexes
+
+
+def leg_market_inputs(legs, tickers, expiries, spots, indexes, rate=RISK_FREE_RATE):
+    # Per-leg underlying spot, years to expiry and implied vol taken from its own chain
+    leg_spots = np.array([spots[t] for t in tickers], dtype=float)
+    years_left = np.zeros(len(legs))
+    sigmas = np.zeros(len(legs))
+    for (ticker, expiry), chain in indexes.items():
+        mask = (tickers == ticker) & (expiries == expiry) & (legs.types != LEG_TYPES["stock"])
+        if not mask.any():
+            continue
+        t = years_to_expiry(expiry)
+        subset = LegArrays(legs.types[mask], legs.strikes[mask], legs.quantities[mask], legs.premiums[mask])
+        years_left[mask] = t
+        sigmas[mask] = leg_vols(chain, subset, spots[ticker], t, rate)
+    return leg_spots, years_left, sigmas
+
+
+def shocked_pnl(legs, leg_spots, years_left, sigmas, shocks, n_groups, rate=RISK_FREE_RATE):
+    # Every leg of the book under every spot shock in one pass, summed per position.
+    # Returns (at_expiry, marked) P&L of shape (len(shocks), n_groups): the payoff if each leg
+    # expired at the shocked spot, and the Black-Scholes mark after an instant shock.
+    prices = (1.0 + np.asarray(shocks, dtype=float))[:, None] * leg_spots[None, :]
+    is_call = legs.types == LEG_TYPES["call"]
+    is_stock = legs.types == LEG_TYPES["stock"]
+    marks = np.where(is_stock, prices, bs_price(prices, legs.strikes, years_left, rate, sigmas, is_call))
+    return group_pnl(legs_payoff(prices, legs), legs, n_groups), group_pnl(marks, legs, n_groups)
+
+
+def _ladder_summary(shocks, at_expiry, marked):
+    worst = int(np.argmin(marked))
+    return {
+        "expiry_pnl": rounded_list(at_expiry),
+        "shock_pnl": rounded_list(marked),
+        "worst_shock": float(shocks[worst]),
+        "worst_shock_pnl": round(float(marked[worst]), 2),
+    }
+
+
+async def evaluate_portfolio(positions, shocks, rate=RISK_FREE_RATE):
+    legs, tickers, expiries = stack_positions(positions)
+    option_legs = legs.types != LEG_TYPES["stock"]
+    underlyings = list(OrderedDict.fromkeys(tickers.tolist()))
+    option_keys = list(OrderedDict.fromkeys(zip(tickers[option_legs].tolist(), expiries[option_legs].tolist())))
+    spots, indexes = await fetch_book_data(underlyings, option_keys)
+    leg_spots, years_left, sigmas = leg_market_inputs(legs, tickers, expiries, spots, indexes, rate)
+
+    loop = asyncio.get_running_loop()
+    at_expiry, marked = await loop.run_in_executor(
+        None, lambda: shocked_pnl(legs, leg_spots, years_left, sigmas, shocks, len(positions), rate)
+    )
+    # Positions roll up into their underlying and the whole book with one more matrix product
+    position_tickers = [p.ticker.upper() for p in positions]
+    rollup = np.zeros((len(positions), len(underlyings)))
+    rollup[np.arange(len(positions)), [underlyings.index(t) for t in position_tickers]] = 1.0
+    by_underlying_expiry, by_underlying_marked = at_expiry @ rollup, marked @ rollup
+    zero = int(np.flatnonzero(shocks == 0.0)[0])
+    return {
+        "shocks": [float(s) for s in shocks],
+        "rate": rate,
+        "chains_fetched": len(indexes),
+        "legs": len(legs),
+        "positions": [
+            {
+                "ticker": position_tickers[i],
+                "label": positions[i].label,
+                "current_pnl": round(float(marked[zero, i]), 2),
+                **_ladder_summary(shocks, at_expiry[:, i], marked[:, i]),
+            }
+            for i in range(len(positions))
+        ],
+        "underlyings": {
+            ticker: {
+                "spot": round(spots[ticker], 2),
+                "positions": position_tickers.count(ticker),
+                "current_pnl": round(float(by_underlying_marked[zero, j]), 2),
+                **_ladder_summary(shocks, by_underlying_expiry[:, j], by_underlying_marked[:, j]),
+            }
+            for j, ticker in enumerate(underlyings)
+        },
+        "portfolio": {
+            "current_pnl": round(float(marked[zero].sum()), 2),
+            **_ladder_summary(shocks, at_expiry.sum(axis=1), marked.sum(axis=1)),
+        },
+    }
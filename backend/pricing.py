@@ -0,0 +1,195 @@
+import math
+from datetime import date
+
+import numpy as np
+
+from payoff import LEG_TYPES, group_pnl
+
+RISK_FREE_RATE = 0.045
+MIN_VOL = 1e-4
+MAX_VOL = 5.0
+# Used when no row on a chain side has a solvable implied vol
+DEFAULT_VOL = 0.3
+
+try:
+    from scipy.special import ndtr as norm_cdf
+except ImportError:
+    def norm_cdf(x):
+        # erfc approximation from Numerical Recipes, fractional error below 1.2e-7
+        z = np.abs(np.asarray(x, dtype=float)) / math.sqrt(2.0)
+        t = 1.0 / (1.0 + 0.5 * z)
+        poly = -z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (
+            -0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (
+                -0.82215223 + t * 0.17087277))))))))
+        erfc = t * np.exp(poly)
+        return np.where(np.asarray(x) >= 0, 1.0 - 0.5 * erfc, 0.5 * erfc)
+
+
+def norm_pdf(x):
+    return np.exp(-0.5 * np.square(x)) / math.sqrt(2.0 * math.pi)
+
+
+def years_to_expiry(expiry, today=None):
+    # Calendar days to an ISO expiry date as a year fraction, never negative
+    today = today or date.today()
+    days = (date.fromisoformat(expiry) - today).days
+    return max(days, 0) / 365.0
+
+
+def _d1_d2(spot, strike, t, rate, sigma):
+    vol_sqrt_t = sigma * np.sqrt(t)
+    d1 = (np.log(spot / strike) + (rate + 0.5 * sigma * sigma) * t) / vol_sqrt_t
+    return d1, d1 - vol_sqrt_t
+
+
+def bs_price(spot, strike, t, rate, sigma, is_call):
+    # Vectorized over every argument; expired or zero-vol options are worth their discounted intrinsic value
+    spot, strike, t, sigma, is_call = np.broadcast_arrays(
+        np.asarray(spot, dtype=float), np.asarray(strike, dtype=float),
+        np.asarray(t, dtype=float), np.asarray(sigma, dtype=float), np.asarray(is_call, dtype=bool),
+    )
+    discount = np.exp(-rate * t)
+    live = (t > 0) & (sigma > 0) & (strike > 0) & (spot > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1, d2 = _d1_d2(spot, strike, np.where(live, t, 1.0), rate, np.where(live, sigma, 1.0))
+    call = spot * norm_cdf(d1) - strike * discount * norm_cdf(d2)
+    put = strike * discount * norm_cdf(-d2) - spot * norm_cdf(-d1)
+    intrinsic = np.where(is_call, np.maximum(spot - strike * discount, 0.0), np.maximum(strike * discount - spot, 0.0))
+    return np.where(live, np.where(is_call, call, put), intrinsic)
+
+
+def bs_greeks(spot, strike, t, rate, sigma, is_call):
+    # Theta is per calendar day and vega per one volatility point
+    spot, strike, t, sigma, is_call = np.broadcast_arrays(
+        np.asarray(spot, dtype=float), np.asarray(strike, dtype=float),
+        np.asarray(t, dtype=float), np.asarray(sigma, dtype=float), np.asarray(is_call, dtype=bool),
+    )
+    live = (t > 0) & (sigma > 0) & (strike > 0) & (spot > 0)
+    safe_t = np.where(live, t, 1.0)
+    safe_sigma = np.where(live, sigma, 1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1, d2 = _d1_d2(spot, strike, safe_t, rate, safe_sigma)
+    discount = np.exp(-rate * safe_t)
+    pdf = norm_pdf(d1)
+    sqrt_t = np.sqrt(safe_t)
+
+    delta = np.where(is_call, norm_cdf(d1), norm_cdf(d1) - 1.0)
+    gamma = pdf / (spot * safe_sigma * sqrt_t)
+    decay = -spot * pdf * safe_sigma / (2 * sqrt_t)
+    theta = np.where(
+        is_call,
+        decay - rate * strike * discount * norm_cdf(d2),
+        decay + rate * strike * discount * norm_cdf(-d2),
+    ) / 365.0
+    vega = spot * pdf * sqrt_t / 100.0
+
+    expired_delta = np.where(is_call, (spot > strike).astype(float), -(spot < strike).astype(float))
+    return {
+        "delta": np.where(live, delta, expired_delta),
+        "gamma": np.where(live, gamma, 0.0),
+        "theta": np.where(live, theta, 0.0),
+        "vega": np.where(live, vega, 0.0),
+    }
+
+
+def implied_vol(price, spot, strike, t, rate, is_call, tol=1e-8, max_iter=100):
+    # Newton steps on the whole chain at once, falling back to bisection for rows whose
+    # step leaves the bracket. Prices outside the no-arbitrage bounds come back as NaN.
+    price, spot, strike, t, is_call = np.broadcast_arrays(
+        np.asarray(price, dtype=float), np.asarray(spot, dtype=float),
+        np.asarray(strike, dtype=float), np.asarray(t, dtype=float), np.asarray(is_call, dtype=bool),
+    )
+    shape = price.shape
+    price, spot, strike, t, is_call = (a.ravel() for a in (price, spot, strike, t, is_call))
+
+    discount = np.exp(-rate * t)
+    lower_bound = np.where(is_call, np.maximum(spot - strike * discount, 0.0), np.maximum(strike * discount - spot, 0.0))
+    upper_bound = np.where(is_call, spot, strike * discount)
+    valid = (t > 0) & (spot > 0) & (strike > 0) & np.isfinite(price) & (price > lower_bound) & (price < upper_bound)
+
+    lo = np.full(price.shape, MIN_VOL)
+    hi = np.full(price.shape, MAX_VOL)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Brenner-Subrahmanyam starting point
+        sigma = np.clip(np.sqrt(2 * math.pi / np.where(t > 0, t, 1.0)) * price / spot, 0.05, 2.0)
+    active = np.nonzero(valid)[0]
+
+    for _ in range(max_iter):
+        if active.size == 0:
+            break
+        s, k, tt, c, sig = spot[active], strike[active], t[active], is_call[active], sigma[active]
+        diff = bs_price(s, k, tt, rate, sig, c) - price[active]
+
+        # Price is increasing in volatility, so the sign of diff tightens the bracket
+        too_high = diff > 0
+        hi[active] = np.where(too_high, sig, hi[active])
+        lo[active] = np.where(too_high, lo[active], sig)
+
+        done = (np.abs(diff) < tol) | (hi[active] - lo[active] < tol)
+        active, s, k, tt, sig, diff = (a[~done] for a in (active, s, k, tt, sig, diff))
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            d1, _ = _d1_d2(s, k, tt, rate, sig)
+            vega = s * norm_pdf(d1) * np.sqrt(tt)
+            step = sig - diff / vega
+        in_bracket = np.isfinite(step) & (step > lo[active]) & (step < hi[active])
+        sigma[active] = np.where(in_bracket, step, 0.5 * (lo[active] + hi[active]))
+
+    return np.where(valid, sigma, np.nan).reshape(shape)
+
+
+def chain_side_vols(side, spot, t, rate, is_call):
+    # Implied vol for every strike on one side of a ChainIndex
+    return implied_vol(side.premiums, spot, side.strikes, t, rate, is_call)
+
+
+def atm_implied_vol(chain, spot, t, rate):
+    # Mean of the call and put implied vols at the strike closest to spot
+    vols = []
+    for side, is_call in ((chain.calls, True), (chain.puts, False)):
+        if len(side) == 0:
+            continue
+        iv = chain_side_vols(side, spot, t, rate, is_call)[side.nearest_indices(spot)]
+        if np.isfinite(iv):
+            vols.append(float(iv))
+    return float(np.mean(vols)) if vols else None
+
+
+def chain_greeks(side, spot, t, rate, is_call):
+    iv = chain_side_vols(side, spot, t, rate, is_call)
+    greeks = bs_greeks(spot, side.strikes, t, rate, np.nan_to_num(iv), is_call)
+    nan = ~np.isfinite(iv)
+    return {
+        "strike": side.strikes,
+        "premium": side.premiums,
+        "iv": iv,
+        **{name: np.where(nan, np.nan, values) for name, values in greeks.items()},
+    }
+
+
+def leg_vols(chain, legs, spot, t, rate):
+    # Implied vol at each leg's strike (closest listed strike), falling back to the
+    # median of the side when that row can't be solved
+    sigmas = np.zeros(len(legs))
+    for leg_type, side in ((LEG_TYPES["call"], chain.calls), (LEG_TYPES["put"], chain.puts)):
+        mask = legs.types == leg_type
+        if not mask.any() or len(side) == 0:
+            continue
+        vols = chain_side_vols(side, spot, t, rate, leg_type == LEG_TYPES["call"])
+        fallback = np.nanmedian(vols) if np.isfinite(vols).any() else DEFAULT_VOL
+        picked = vols[side.nearest_indices(legs.strikes[mask])]
+        sigmas[mask] = np.where(np.isfinite(picked), picked, fallback)
+    return sigmas
+
+
+def legs_value_grid(prices, years_left, legs, sigmas, rate=RISK_FREE_RATE, n_groups=1):
+    # Mark-to-model P&L of every leg group on a (time x price) grid, shape (n_groups, len(years_left), len(prices)).
+    # years_left holds the time remaining to expiry at each grid date, 0 reproduces the at-expiry payoff.
+    p = np.asarray(prices, dtype=float)[None, :, None]
+    t = np.asarray(years_left, dtype=float)[:, None, None]
+    strikes = legs.strikes[None, None, :]
+    sig = np.asarray(sigmas, dtype=float)[None, None, :]
+    is_call = (legs.types == LEG_TYPES["call"])[None, None, :]
+    option_value = bs_price(p, strikes, t, rate, sig, is_call)
+    value = np.where((legs.types == LEG_TYPES["stock"])[None, None, :], p, option_value)
+    return np.moveaxis(group_pnl(value, legs, n_groups), -1, 0)
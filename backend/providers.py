@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+
+import pandas as pd
+
+from snapshots import SNAPSHOT_EXT, RecordingProvider, is_valid_expiry, read_table, table_meta, validate_expiry, validate_ticker
+
+try:
+    import yfinance as yf
+except ImportError:
+    yf = None
+
+CHAIN_SIDES = ("calls", "puts")
+
+
+class ProviderError(Exception):
+    pass
+
+
+class YFinanceProvider:
+    name = "yfinance"
+
+    def __init__(self):
+        if yf is None:
+            raise ProviderError("yfinance is not installed.")
+
+    def spot(self, ticker):
+        return yf.Ticker(ticker).history(period='1d')['Close'].iloc[-1]
+
+    def expiries(self, ticker):
+        return tuple(yf.Ticker(ticker).options)
+
+    def chain(self, ticker, expiry):
+        opt_chain = yf.Ticker(ticker).option_chain(expiry)
+        return opt_chain.calls, opt_chain.puts
+
+    def history(self, ticker, period="1y"):
+        return yf.Ticker(ticker).history(period=period)['Close'].to_numpy(dtype=float)
+
+
+def _read_frame(path):
+    if path.endswith(SNAPSHOT_EXT):
+        return read_table(path).to_pandas()
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def _side_file(directory, side):
+    for ext in (SNAPSHOT_EXT, ".parquet", ".csv"):
+        path = os.path.join(directory, side + ext)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+class ReplayProvider:
+    # Serves chains recorded on disk, laid out as
+    #   <root>/<TICKER>/quote.json                      {"spot": 101.3}
+    #   <root>/<TICKER>/history.csv                     daily closes in a Close column, oldest first
+    #   <root>/<TICKER>/<EXPIRY>/calls.parquet|csv      a single snapshot, or
+    #   <root>/<TICKER>/<EXPIRY>/<TIMESTAMP>/calls...   snapshots replayed in timestamp order
+    # which includes a SnapshotStore directory, whose .arrow files carry the spot in their metadata.
+    # Each chain load moves to the next snapshot and stays on the last one unless loop=True.
+    name = "replay"
+
+    def __init__(self, root, loop=False):
+        self.root = root
+        self.loop = loop
+        self._cursors = {}
+        self._lock = threading.Lock()
+
+    def _ticker_dir(self, ticker):
+        ticker = validate_ticker(ticker)
+        path = os.path.join(self.root, ticker)
+        if not os.path.isdir(path):
+            raise ProviderError(f"No recorded data for {ticker}.")
+        return path
+
+    def spot(self, ticker):
+        path = os.path.join(self._ticker_dir(ticker), "quote.json")
+        if os.path.isfile(path):
+            with open(path) as f:
+                return float(json.load(f)["spot"])
+        # Otherwise the spot recorded with the most recent stored snapshot
+        recorded = []
+        for expiry in self.expiries(ticker):
+            snapshots = self.snapshots(ticker, expiry)
+            path = _side_file(snapshots[-1], "calls") if snapshots else None
+            if path and path.endswith(SNAPSHOT_EXT):
+                meta = table_meta(read_table(path))
+                if meta.get("spot") is not None:
+                    recorded.append((meta.get("fetched_at", ""), meta["spot"]))
+        if not recorded:
+            raise ProviderError(f"No recorded spot price for {ticker.upper()}.")
+        return float(max(recorded)[1])
+
+    def history(self, ticker, period="1y"):
+        # Recorded history is served whole, whatever period is asked for
+        path = os.path.join(self._ticker_dir(ticker), "history.csv")
+        if not os.path.isfile(path):
+            raise ProviderError(f"No recorded price history for {ticker.upper()}.")
+        return pd.read_csv(path)['Close'].to_numpy(dtype=float)
+
+    def expiries(self, ticker):
+        base = self._ticker_dir(ticker)
+        return tuple(sorted(
+            name for name in os.listdir(base) if is_valid_expiry(name) and os.path.isdir(os.path.join(base, name))
+        ))
+
+    def snapshots(self, ticker, expiry):
+        base = os.path.join(self._ticker_dir(ticker), validate_expiry(expiry))
+        if not os.path.isdir(base):
+            return []
+        if _side_file(base, "calls"):
+            return [base]
+        return [
+            os.path.join(base, name) for name in sorted(os.listdir(base))
+            if not name.startswith(".") and _side_file(os.path.join(base, name), "calls")
+        ]
+
+    def chain(self, ticker, expiry):
+        snapshots = self.snapshots(ticker, expiry)
+        if not snapshots:
+            raise ProviderError(f"No recorded chain for {ticker.upper()} {expiry}.")
+        key = (ticker.upper(), expiry)
+        with self._lock:
+            position = self._cursors.get(key, 0)
+            self._cursors[key] = position + 1
+        position = position % len(snapshots) if self.loop else min(position, len(snapshots) - 1)
+        directory = snapshots[position]
+        frames = []
+        for side in CHAIN_SIDES:
+            path = _side_file(directory, side)
+            frames.append(_read_frame(path) if path else pd.DataFrame(columns=["strike", "lastPrice", "bid", "ask"]))
+        return tuple(frames)
+
+
+class FallbackProvider:
+    # Warm standby: every call goes to the primary and falls back to the secondary when it fails
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f"{primary.name}+{fallback.name}"
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+
+    def _call(self, method, *args):
+        try:
+            return getattr(self.primary, method)(*args)
+        except Exception:
+            with self._lock:
+                self.fallbacks += 1
+            return getattr(self.fallback, method)(*args)
+
+    def spot(self, ticker):
+        return self._call("spot", ticker)
+
+    def expiries(self, ticker):
+        return self._call("expiries", ticker)
+
+    def chain(self, ticker, expiry):
+        return self._call("chain", ticker, expiry)
+
+    def history(self, ticker, period="1y"):
+        return self._call("history", ticker, period)
+
+
+def provider_from_env(environ=os.environ, store=None):
+    # MARKET_DATA_PROVIDER=yfinance|replay, MARKET_DATA_REPLAY_DIR for recorded data and
+    # MARKET_DATA_FALLBACK_DIR to fall back to recorded data when yfinance fails.
+    # With a snapshot store only chains fetched live are recorded, never replayed ones.
+    kind = environ.get("MARKET_DATA_PROVIDER", "yfinance").lower()
+    loop = environ.get("MARKET_DATA_REPLAY_LOOP", "").lower() in ("1", "true", "yes")
+    if kind == "replay":
+        root = environ.get("MARKET_DATA_REPLAY_DIR")
+        if not root:
+            raise ProviderError("MARKET_DATA_REPLAY_DIR must be set for the replay provider.")
+        return ReplayProvider(root, loop=loop)
+    if kind != "yfinance":
+        raise ProviderError(f"Unknown market data provider '{kind}'.")
+    provider = YFinanceProvider()
+    if store is not None:
+        provider = RecordingProvider(provider, store)
+    fallback_dir = environ.get("MARKET_DATA_FALLBACK_DIR")
+    if fallback_dir:
+        return FallbackProvider(provider, ReplayProvider(fallback_dir, loop=loop))
+    return provider
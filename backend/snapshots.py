@@ -0,0 +1,196 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import date, datetime, timezone
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+CHAIN_SIDES = ("calls", "puts")
+SNAPSHOT_EXT = ".arrow"
+TIMESTAMP_FORMAT = "%Y%m%dT%H%M%S.%fZ"
+TICKER_PATTERN = re.compile(r"^[A-Z0-9.^=-]{1,15}$")
+
+
+def parse_timestamp(name):
+    return datetime.strptime(name, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+
+
+def validate_ticker(ticker):
+    # Tickers and expiries become path components, so anything else is rejected before a join
+    ticker = str(ticker).upper()
+    if not TICKER_PATTERN.match(ticker) or set(ticker) == {"."}:
+        raise ValueError(f"Invalid ticker '{ticker}'.")
+    return ticker
+
+
+def validate_expiry(expiry):
+    try:
+        if date.fromisoformat(expiry).isoformat() == expiry:
+            return expiry
+    except (TypeError, ValueError):
+        pass
+    raise ValueError(f"Invalid expiry '{expiry}', expected YYYY-MM-DD.")
+
+
+def is_valid_ticker(ticker):
+    try:
+        return validate_ticker(ticker) == ticker
+    except ValueError:
+        return False
+
+
+def is_valid_expiry(expiry):
+    try:
+        validate_expiry(expiry)
+        return True
+    except ValueError:
+        return False
+
+
+def read_table(path):
+    # Arrow IPC file through a memory map: column buffers point into the page cache and nothing
+    # is read up front. Converting the table to pandas copies the columns it touches.
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def table_meta(table):
+    raw = (table.schema.metadata or {}).get(b"snapshot")
+    return json.loads(raw) if raw else {}
+
+
+class SnapshotStore:
+    # Append-only chain history, one directory per fetch:
+    #   <root>/<TICKER>/<EXPIRY>/<UTC TIMESTAMP>/{calls,puts}.arrow
+    # Spot and fetch time travel in the Arrow schema metadata of both files.
+    def __init__(self, root):
+        if pa is None:
+            raise RuntimeError("pyarrow is required for the snapshot store.")
+        self.root = root
+        self.writes = 0
+        self.write_errors = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _ticker_dir(self, ticker):
+        return os.path.join(self.root, validate_ticker(ticker))
+
+    def _expiry_dir(self, ticker, expiry):
+        return os.path.join(self._ticker_dir(ticker), validate_expiry(expiry))
+
+    def write(self, ticker, expiry, calls, puts, spot=None, fetched_at=None):
+        fetched_at = fetched_at or datetime.now(timezone.utc)
+        name = fetched_at.strftime(TIMESTAMP_FORMAT)
+        meta = json.dumps({
+            "ticker": ticker.upper(),
+            "expiry": expiry,
+            "spot": None if spot is None else float(spot),
+            "fetched_at": fetched_at.isoformat(),
+        })
+        parent = self._expiry_dir(ticker, expiry)
+        os.makedirs(parent, exist_ok=True)
+        # Written under a temporary name and renamed so readers never see half a snapshot
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=parent)
+        try:
+            for side, df in zip(CHAIN_SIDES, (calls, puts)):
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"snapshot": meta.encode()})
+                with pa.OSFile(os.path.join(staging, side + SNAPSHOT_EXT), 'wb') as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+            os.rename(staging, os.path.join(parent, name))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            with self._lock:
+                self.write_errors += 1
+            raise
+        with self._lock:
+            self.writes += 1
+        return name
+
+    def tickers(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if is_valid_ticker(name) and os.path.isdir(os.path.join(self.root, name))
+        )
+
+    def expiries(self, ticker):
+        base = self._ticker_dir(ticker)
+        if not os.path.isdir(base):
+            return []
+        return sorted(
+            name for name in os.listdir(base) if is_valid_expiry(name) and os.path.isdir(os.path.join(base, name))
+        )
+
+    def snapshots(self, ticker, expiry):
+        base = self._expiry_dir(ticker, expiry)
+        if not os.path.isdir(base):
+            return []
+        return sorted(
+            name for name in os.listdir(base)
+            if not name.startswith(".") and os.path.isfile(os.path.join(base, name, "calls" + SNAPSHOT_EXT))
+        )
+
+    def latest(self, ticker, expiry):
+        names = self.snapshots(ticker, expiry)
+        return names[-1] if names else None
+
+    def load_tables(self, ticker, expiry, timestamp=None):
+        # (calls, puts, meta) as memory-mapped Arrow tables, without copying any column
+        timestamp = timestamp or self.latest(ticker, expiry)
+        if timestamp is None:
+            return None
+        parse_timestamp(timestamp)
+        directory = os.path.join(self._expiry_dir(ticker, expiry), timestamp)
+        tables = [read_table(os.path.join(directory, side + SNAPSHOT_EXT)) for side in CHAIN_SIDES]
+        return tables[0], tables[1], table_meta(tables[0])
+
+    def load(self, ticker, expiry, timestamp=None):
+        # (calls, puts, meta) as DataFrames, which the chain index needs; this copies the columns
+        tables = self.load_tables(ticker, expiry, timestamp)
+        if tables is None:
+            return None
+        calls, puts, meta = tables
+        return calls.to_pandas(), puts.to_pandas(), meta
+
+    def stats(self):
+        with self._lock:
+            return {"root": self.root, "writes": self.writes, "write_errors": self.write_errors}
+
+
+class RecordingProvider:
+    # Wraps a live provider and appends every chain it returns to the store.
+    # The spot stored with a chain is the last one this provider served for the ticker.
+    def __init__(self, inner, store):
+        self.inner = inner
+        self.store = store
+        self.name = inner.name
+        self._spots = {}
+
+    def spot(self, ticker):
+        value = self.inner.spot(ticker)
+        self._spots[ticker.upper()] = value
+        return value
+
+    def expiries(self, ticker):
+        return self.inner.expiries(ticker)
+
+    def history(self, ticker, period="1y"):
+        return self.inner.history(ticker, period)
+
+    def chain(self, ticker, expiry):
+        calls, puts = self.inner.chain(ticker, expiry)
+        try:
+            self.store.write(ticker, expiry, calls, puts, spot=self._spots.get(ticker.upper()))
+        except Exception:
+            # Losing a history entry must never fail the request that fetched it
+            pass
+        return calls, puts
@@ -0,0 +1,279 @@
+from chain import ChainIndex
+from payoff import LOT_SIZE, StrategyLegs
+
+
+class OptionStrategies:
+    def __init__(self, price, selected_strike, current_price, calls, puts, user_premiums=None, user_strategy_premiums=None, legs=None, chain=None):
+        self.price = price
+        self.selected_strike = selected_strike
+        self.current_price = current_price
+        self.calls = calls
+        self.puts = puts
+        self.user_premiums = user_premiums
+        self.user_strategy_premiums = user_strategy_premiums or {}
+        self.chain = chain if chain is not None else ChainIndex(calls, puts)
+        # Legs resolved for another price point can be shared, they don't depend on price
+        self._legs = legs
+        self._priced_legs = None
+
+    def get_price(self, df, strike, is_call=True):
+        strike = float(strike)
+        # Custom premium check (calls/puts by strike)
+        if self.user_premiums:
+            premium_dict = self.user_premiums.calls if is_call else self.user_premiums.puts
+            if strike in premium_dict:
+                premium = round(premium_dict[strike], 3)
+                return premium
+        # Fallback to market data, exact strike first and then the closest listed one
+        return self.chain.price(strike, is_call=is_call)
+
+    def get_nearest_strike(self, target_strike, is_call=True):
+        return self.chain.nearest_strike(target_strike, is_call=is_call)
+
+    @property
+    def legs(self):
+        if self._legs is None:
+            self._legs = self.resolve_legs()
+        return self._legs
+
+    def strategy_leg(self, name):
+        # Resolved leg with any per-strategy user premiums applied
+        if self._priced_legs is None:
+            self._priced_legs = self.legs.with_premiums(self.user_strategy_premiums)
+        return self._priced_legs[name]
+
+    def premium_breakdown(self):
+        return self.legs.breakdown()
+
+    def resolve_legs(self):
+        breakdown = {}
+
+        # Long Call
+        call_price = self.get_price(self.calls, self.selected_strike, is_call=True)
+        breakdown["long_call"] = {
+            "call_strike": self.selected_strike,
+            "call_premium": call_price
+        }
+
+        # Covered Call (modified)
+        call_strike = self.get_nearest_strike(self.selected_strike + 5, is_call=True)
+        call_price_covered = self.get_price(self.calls, call_strike, is_call=True)
+        breakdown["covered_call"] = {
+            "call_strike": call_strike,
+            "call_premium": call_price_covered
+        }
+
+        # Long Put 
+        put_price = self.get_price(self.puts, self.selected_strike, is_call=False)
+        breakdown["long_put"] = {
+            "put_strike": self.selected_strike,
+            "put_premium": put_price
+        }
+        # Protective Put (modified)
+        put_strike = self.get_nearest_strike(self.selected_strike - 5, is_call=False)
+        put_price_protect = self.get_price(self.puts, put_strike, is_call=False)
+        breakdown["protective_put"] = {
+            "put_strike": put_strike,
+            "put_premium": put_price_protect
+        }
+
+        # Straddle
+        breakdown["straddle"] = {
+            "call_strike": self.selected_strike,
+            "call_premium": call_price,
+            "put_strike": self.selected_strike,
+            "put_premium": put_price
+        }
+
+        # Strangle (same wings as the covered call / protective put)
+        breakdown["strangle"] = {
+            "call_strike": call_strike,
+            "call_premium": call_price_covered,
+            "put_strike": put_strike,
+            "put_premium": put_price_protect
+        }
+
+        # Bull Call Spread (Debit)
+        upper = self.get_nearest_strike(self.selected_strike + 10, is_call=True)
+        lower_price = call_price
+        upper_price = self.get_price(self.calls, upper, is_call=True)
+        breakdown["bull_call_spread"] = {
+            "buy_strike": self.selected_strike,
+            "buy_premium": lower_price,
+            "sell_strike": upper,
+            "sell_premium": upper_price
+        }
+
+        # Bear Put Spread (Debit)
+        higher = self.get_nearest_strike(self.selected_strike + 10, is_call=False)
+        premium_bought = self.get_price(self.puts, higher, is_call=False)
+        premium_sold = put_price
+        breakdown["bear_put_spread"] = {
+            "buy_strike": higher,
+            "buy_premium": premium_bought,
+            "sell_strike": self.selected_strike,
+            "sell_premium": premium_sold
+        }
+
+        # Bear Call Spread (Credit)
+        lower_bear_call = self.selected_strike - 10
+        premium_sold_bear_call = self.get_price(self.calls, lower_bear_call, is_call=True)
+        premium_bought_bear_call = call_price
+        breakdown["bear_call_spread"] = {
+            "sell_strike": lower_bear_call,
+            "sell_premium": premium_sold_bear_call,
+            "buy_strike": self.selected_strike,
+            "buy_premium": premium_bought_bear_call
+        }
+
+        # Bull Put Spread (Credit)
+        lower_bull_put = self.selected_strike
+        higher_bull_put = lower_bull_put + 10
+        premium_sold_bull_put = put_price
+        premium_bought_bull_put = self.get_price(self.puts, higher_bull_put, is_call=False)
+        breakdown["bull_put_spread"] = {
+            "sell_strike": lower_bull_put,
+            "sell_premium": premium_sold_bull_put,
+            "buy_strike": higher_bull_put,
+            "buy_premium": premium_bought_bull_put
+        }
+
+        # Iron Condor
+        put_sell = put_strike
+        put_buy = self.get_nearest_strike(put_sell - 5, is_call=False)
+        call_sell = call_strike
+        call_buy = self.get_nearest_strike(call_sell + 5, is_call=True)
+        breakdown["iron_condor"] = {
+            "put_buy_strike": put_buy,
+            "put_buy_premium": self.get_price(self.puts, put_buy, is_call=False),
+            "put_sell_strike": put_sell,
+            "put_sell_premium": put_price_protect,
+            "call_sell_strike": call_sell,
+            "call_sell_premium": call_price_covered,
+            "call_buy_strike": call_buy,
+            "call_buy_premium": self.get_price(self.calls, call_buy, is_call=True)
+        }
+
+        # Butterfly Spread
+        lower_butterfly = self.get_nearest_strike(self.selected_strike - 10, is_call=True)
+        upper_butterfly = upper
+        lower_price_butterfly = self.get_price(self.calls, lower_butterfly, is_call=True)
+        center_price_butterfly = call_price
+        upper_price_butterfly = upper_price
+        breakdown["butterfly_spread"] = {
+            "buy_lower_strike": lower_butterfly,
+            "buy_lower_premium": lower_price_butterfly,
+            "sell_center_strike": self.selected_strike,
+            "sell_center_premium": center_price_butterfly,
+            "buy_upper_strike": upper_butterfly,
+            "buy_upper_premium": upper_price_butterfly
+        }
+
+        return StrategyLegs(self.selected_strike, breakdown)
+
+    def long_call(self):
+        leg = self.strategy_leg("long_call")
+        profit = (max(self.price - leg["call_strike"], 0) - leg["call_premium"]) * LOT_SIZE
+        return round(profit, 3)
+
+    def long_put(self):
+        leg = self.strategy_leg("long_put")
+        profit = (max(leg["put_strike"] - self.price, 0) - leg["put_premium"]) * LOT_SIZE
+        return round(profit, 3)
+
+    def covered_call(self):
+        leg = self.strategy_leg("covered_call")
+        call_strike = leg["call_strike"]
+        profit = ((self.price - self.current_price) + leg["call_premium"] - max(self.price - call_strike, 0)) * LOT_SIZE
+        return round(profit, 3)
+
+    def protective_put(self):
+        leg = self.strategy_leg("protective_put")
+        put_strike = leg["put_strike"]
+        profit = ((self.price - self.current_price) - leg["put_premium"] + max(put_strike - self.price, 0)) * LOT_SIZE
+        return round(profit, 3)
+
+    def straddle(self):
+        leg = self.strategy_leg("straddle")
+        strike = leg["call_strike"]
+        profit = (max(self.price - strike, 0) + max(strike - self.price, 0) - leg["call_premium"] - leg["put_premium"]) * LOT_SIZE
+        return round(profit, 3)
+
+    def strangle(self):
+        leg = self.strategy_leg("strangle")
+        call_strike = leg["call_strike"]
+        put_strike = leg["put_strike"]
+        profit_per_unit = (max(self.price - call_strike, 0) + max(put_strike - self.price, 0) - (leg["call_premium"] + leg["put_premium"]))
+        return round(profit_per_unit * LOT_SIZE, 2)
+
+    def bull_call_spread(self):
+        leg = self.strategy_leg("bull_call_spread")
+        lower = leg["buy_strike"]
+        upper = leg["sell_strike"]
+        profit = (max(self.price - lower, 0) - max(self.price - upper, 0) - (leg["buy_premium"] - leg["sell_premium"])) * LOT_SIZE
+        return round(profit, 3)
+
+    def bear_put_spread(self):
+        leg = self.strategy_leg("bear_put_spread")
+        lower = leg["sell_strike"]
+        higher = leg["buy_strike"]
+        net_payoff = max(higher - self.price, 0) - max(lower - self.price, 0)
+        profit_per_unit = net_payoff - (leg["buy_premium"] - leg["sell_premium"])
+        return round(profit_per_unit * LOT_SIZE, 2)
+
+    def bear_call_spread(self):
+        leg = self.strategy_leg("bear_call_spread")
+        upper = leg["buy_strike"]
+        lower = leg["sell_strike"]
+        net_payoff = max(self.price - lower, 0) - max(self.price - upper, 0)
+        profit_per_unit = (leg["sell_premium"] - leg["buy_premium"]) - net_payoff
+        return round(profit_per_unit * LOT_SIZE, 2)
+
+    def bull_put_spread(self):
+        leg = self.strategy_leg("bull_put_spread")
+        lower = leg["sell_strike"]
+        higher = leg["buy_strike"]
+        net_payoff = max(lower - self.price, 0) - max(higher - self.price, 0)
+        profit_per_unit = (leg["sell_premium"] - leg["buy_premium"]) - net_payoff
+        return round(profit_per_unit * LOT_SIZE, 2)
+
+    def iron_condor(self):
+        leg = self.strategy_leg("iron_condor")
+        put_buy = leg["put_buy_strike"]
+        put_sell = leg["put_sell_strike"]
+        call_sell = leg["call_sell_strike"]
+        call_buy = leg["call_buy_strike"]
+
+        net_credit = leg["put_sell_premium"] - leg["put_buy_premium"] + leg["call_sell_premium"] - leg["call_buy_premium"]
+
+        if self.price <= put_buy:
+            profit = (net_credit - (put_sell - put_buy)) * LOT_SIZE
+        elif self.price <= put_sell:
+            profit = (net_credit - (put_sell - self.price)) * LOT_SIZE
+        elif self.price <= call_sell:
+            profit = net_credit * LOT_SIZE
+        elif self.price <= call_buy:
+            profit = (net_credit - (self.price - call_sell)) * LOT_SIZE
+        else:
+            profit = (net_credit - (call_buy - call_sell)) * LOT_SIZE
+
+        return round(profit, 3)
+
+    def butterfly_spread(self):
+        leg = self.strategy_leg("butterfly_spread")
+        lower = leg["buy_lower_strike"]
+        center = leg["sell_center_strike"]
+        upper = leg["buy_upper_strike"]
+        net_debit = leg["buy_lower_premium"] + leg["buy_upper_premium"] - 2 * leg["sell_center_premium"]
+        lower_call_payoff = max(self.price - lower, 0)
+        center_call_payoff = max(self.price - center, 0)
+        upper_call_payoff = max(self.price - upper, 0)
+        net_payoff = lower_call_payoff + upper_call_payoff - 2 * center_call_payoff
+        profit = (net_payoff - net_debit) * LOT_SIZE
+        return round(profit, 2)
+
+
+def resolve_strategy_legs(selected_strike, current_price, calls, puts, user_premiums=None, chain=None):
+    return OptionStrategies(
+        None, selected_strike, current_price, calls, puts, user_premiums=user_premiums, chain=chain
+    ).resolve_legs()
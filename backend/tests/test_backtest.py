@@ -0,0 +1,67 @@
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+import backtest
+import workers
+from benchmark import synthetic_chain
+from snapshots import SnapshotStore
+
+EXPIRIES = ("2026-01-09", "2026-01-16", "2026-01-23")
+
+
+@pytest.fixture(scope="module")
+def store_root(tmp_path_factory):
+    # Two tickers with a daily snapshot of every listed expiry, the spot drifting day to day
+    root = tmp_path_factory.mktemp("snapshots")
+    store = SnapshotStore(str(root))
+    rng = np.random.default_rng(0)
+    for t, ticker in enumerate(("AAA", "BBB")):
+        spot = 100.0
+        for d in range(19):
+            day = date(2026, 1, 5) + timedelta(days=d)
+            spot *= float(np.exp(rng.normal(0.0, 0.02)))
+            for expiry in EXPIRIES:
+                days_left = (date.fromisoformat(expiry) - day).days
+                if days_left < 0:
+                    continue
+                calls, puts = synthetic_chain(41, spot=spot, seed=100 * t + d, years=max(days_left, 1) / 365)
+                fetched_at = datetime(day.year, day.month, day.day, 21, 0, tzinfo=timezone.utc)
+                store.write(ticker, expiry, calls, puts, spot=spot, fetched_at=fetched_at)
+    return str(root)
+
+
+@pytest.fixture
+def backtest_workers(monkeypatch):
+    def use(n):
+        monkeypatch.setattr(backtest, "BACKTEST_WORKERS", n)
+    yield use
+    workers.shutdown_pools()
+
+
+@pytest.mark.parametrize("strategy", ["iron_condor", "covered_call"])
+def test_process_pool_matches_serial_run(store_root, backtest_workers, strategy):
+    backtest_workers(1)
+    serial = backtest.run_backtest(store_root, ["AAA", "bbb"], strategy)
+    # Spawned workers import backtest by name to unpickle run_trade, so this also checks the module
+    # is importable from a fresh interpreter
+    backtest_workers(3)
+    pooled = backtest.run_backtest(store_root, ["AAA", "bbb"], strategy)
+    assert "backtest" in workers._pools
+    assert pooled == serial
+    assert set(serial["tickers"]) == {"AAA", "BBB"}
+    trades = serial["tickers"]["AAA"]["trades"]
+    # Opens on the first day, holds each expiry to settlement and rolls into the next
+    assert [t["expiry"] for t in trades] == list(EXPIRIES)
+    assert all(t["settled"] for t in trades)
+    assert [t["entry"]["date"] for t in trades] == ["2026-01-05", "2026-01-10", "2026-01-17"]
+
+
+def test_range_and_strategy_errors(store_root):
+    with pytest.raises(backtest.BacktestError) as e:
+        backtest.run_backtest(store_root, ["AAA"], "calendar")
+    assert e.value.status_code == 400
+    with pytest.raises(backtest.BacktestError) as e:
+        backtest.run_backtest(store_root, ["AAA"], "straddle", start="2027-01-01")
+    assert e.value.status_code == 404
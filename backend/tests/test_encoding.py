@@ -0,0 +1,41 @@
+import pytest
+
+import encoding
+from encoding import FormatError, negotiate_format
+
+
+@pytest.fixture
+def all_formats(monkeypatch):
+    monkeypatch.setattr(encoding, "available_formats", lambda: ["json", "msgpack", "arrow"])
+
+
+@pytest.mark.parametrize("accept,expected", [
+    (None, "json"),
+    ("text/html, */*", "json"),
+    ("application/x-msgpack", "msgpack"),
+    ("application/json, application/x-msgpack", "json"),
+    ("application/json;q=0.5, application/x-msgpack", "msgpack"),
+    ("application/json;q=0.9, application/vnd.apache.arrow.stream;q=0.95, application/msgpack;q=0.8", "arrow"),
+    ("application/x-msgpack;q=0.7, application/vnd.apache.arrow.stream;q=0.7", "msgpack"),
+    ("application/x-msgpack; charset=utf-8; q=0.2, application/json;q=0.1", "msgpack"),
+    ("application/x-msgpack;q=0, application/json;q=0.1", "json"),
+    ("application/x-msgpack;q=abc, application/json;q=0.5", "msgpack"),
+])
+def test_accept_picks_highest_quality(all_formats, accept, expected):
+    assert negotiate_format(accept) == expected
+
+
+def test_explicit_format_wins(all_formats):
+    assert negotiate_format("application/x-msgpack", "JSON") == "json"
+    with pytest.raises(FormatError) as e:
+        negotiate_format(None, "xml")
+    assert e.value.status_code == 400
+
+
+def test_unavailable_formats(monkeypatch):
+    monkeypatch.setattr(encoding, "available_formats", lambda: ["json", "msgpack"])
+    # A lower ranked format the server has beats one it can't encode
+    assert negotiate_format("application/vnd.apache.arrow.stream, application/x-msgpack;q=0.5") == "msgpack"
+    with pytest.raises(FormatError) as e:
+        negotiate_format("application/vnd.apache.arrow.stream")
+    assert e.value.status_code == 406
@@ -0,0 +1,164 @@
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import benchmark
+
+# Keep the app off the network before it builds its default provider
+benchmark._setup_offline()
+
+import market_data  # noqa: E402
+from app import app, normalize_premiums  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from payoff import STRATEGY_NAMES, strategy_payoff_summaries, template_legs  # noqa: E402
+from pipeline import pipeline  # noqa: E402
+from strategies import OptionStrategies  # noqa: E402
+
+TICKER = benchmark.TICKER
+# (strikes, seed) of the synthetic chains, each checked at the default and several explicit strikes
+CHAIN_CASES = [(8, 0), (25, 1), (61, 2), (150, 3), (400, 4)]
+STRIKE_CASES = [None, 75.0, 100.0, 101.37, 130.0]
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+    market_data.cache.clear()
+    pipeline.clear()
+
+
+def use_chain(n_strikes, seed):
+    provider = benchmark.SyntheticProvider(n_strikes, seed)
+    market_data.set_provider(provider)
+    pipeline.clear()
+    return provider.chain(TICKER, None)
+
+
+def assert_rows_match_scalar(response, calls, puts, user_premiums=None, strategy_premiums=None):
+    # Every row against the per-price OptionStrategies methods the endpoints used to call
+    strike = response["selected_strike"]
+    reference = OptionStrategies(None, strike, benchmark.SPOT, calls, puts, user_premiums=user_premiums,
+                                 user_strategy_premiums=strategy_premiums)
+    # Per-strategy premiums only reprice the curves, the breakdown stays the market legs
+    assert response["premium_breakdown"] == reference.premium_breakdown()
+    assert response["strategies"]
+    for row in response["strategies"]:
+        price = float(row["Price at Expiry"].lstrip("$"))
+        scalar = OptionStrategies(price, strike, benchmark.SPOT, calls, puts, user_premiums=user_premiums,
+                                  user_strategy_premiums=strategy_premiums, legs=reference.legs)
+        for name in STRATEGY_NAMES:
+            # Both sides round to cents, from values rounded to 2 or 3 decimals on the scalar side
+            assert row[name] == pytest.approx(getattr(scalar, name)(), abs=0.011), (price, name)
+
+
+@pytest.mark.parametrize("n_strikes,seed", CHAIN_CASES)
+def test_get_matches_scalar_baseline(client, n_strikes, seed):
+    calls, puts = use_chain(n_strikes, seed)
+    for strike in STRIKE_CASES:
+        params = {"ticker": TICKER} if strike is None else {"ticker": TICKER, "strike": strike}
+        response = client.get("/options-strategy-pnl", params=params)
+        assert response.status_code == 200, response.text
+        assert_rows_match_scalar(response.json(), calls, puts)
+
+
+@pytest.mark.parametrize("n_strikes,seed", CHAIN_CASES)
+def test_custom_premiums_match_scalar_baseline(client, n_strikes, seed):
+    calls, puts = use_chain(n_strikes, seed)
+    strikes = sorted(set(calls["strike"]) & set(puts["strike"]))
+    body = {
+        "calls": {str(s): round(1.0 + i * 0.37, 2) for i, s in enumerate(strikes[::3])},
+        "puts": {str(s): round(0.5 + i * 0.21, 2) for i, s in enumerate(strikes[1::4])},
+    }
+    user_premiums = SimpleNamespace(calls=normalize_premiums(body["calls"]), puts=normalize_premiums(body["puts"]))
+    for strike in STRIKE_CASES:
+        params = {"ticker": TICKER} if strike is None else {"ticker": TICKER, "strike": strike}
+        response = client.post("/options-strategy-pnl-custom", params=params, json=body)
+        assert response.status_code == 200, response.text
+        assert_rows_match_scalar(response.json(), calls, puts, user_premiums=user_premiums)
+
+
+def test_custom_strategy_premiums_match_scalar_baseline(client):
+    calls, puts = use_chain(61, 5)
+    body = {
+        "long_call": {"call_premium": 7.5},
+        "bear_put_spread": {"buy_premium": 3.2, "sell_premium": 1.1},
+        "iron_condor": {"put_buy_premium": 0.4, "call_sell_premium": 2.2},
+    }
+    for strike in STRIKE_CASES:
+        params = {"ticker": TICKER} if strike is None else {"ticker": TICKER, "strike": strike}
+        response = client.post("/options-strategy-pnl-custom", params=params, json=body)
+        assert response.status_code == 200, response.text
+        assert_rows_match_scalar(response.json(), calls, puts, strategy_premiums=body)
+
+
+def test_get_and_custom_share_market_legs(client):
+    use_chain(61, 6)
+    get = client.get("/options-strategy-pnl", params={"ticker": TICKER}).json()
+    custom = client.post("/options-strategy-pnl-custom", params={"ticker": TICKER}, json={}).json()
+    for key in ("selected_strike", "premium_breakdown", "payoff_summary", "strategies"):
+        assert get[key] == custom[key]
+    assert np.isfinite([row["iron_condor"] for row in get["strategies"]]).all()
+
+
+@pytest.mark.parametrize("name", STRATEGY_NAMES)
+def test_legs_endpoint_matches_builtin_template(client, name):
+    calls, puts = use_chain(61, 7)
+    reference = OptionStrategies(None, 100.0, benchmark.SPOT, calls, puts)
+    legs = [
+        {**leg, "expiry": "2030-01-18"}
+        for leg in template_legs(name, reference.legs[name], benchmark.SPOT)
+    ]
+    response = client.post("/options-strategy-legs", params={"points": 81},
+                           json={"spot_price": benchmark.SPOT, "legs": legs})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["payoff_summary"]["custom_strategy"] == strategy_payoff_summaries(
+        reference.legs, benchmark.SPOT, names=[name]
+    )[name]
+    for row in body["strategies"]:
+        price = float(row["Price at Expiry"].lstrip("$"))
+        scalar = OptionStrategies(price, 100.0, benchmark.SPOT, calls, puts, legs=reference.legs)
+        assert row["custom_strategy"] == pytest.approx(getattr(scalar, name)(), abs=0.011), price
+
+
+@pytest.mark.parametrize("leg,error", [
+    ({"type": "future"}, "Unknown leg type"),
+    ({"action": "hold"}, "Unknown leg action"),
+    ({"quantity": 0}, "quantity must be positive"),
+])
+def test_legs_endpoint_rejects_bad_legs(client, leg, error):
+    legs = [{"type": "call", "strike": 100.0, "expiry": "2030-01-18", "action": "buy", "quantity": 1,
+             "premium": 2.0, **leg}]
+    response = client.post("/options-strategy-legs", json={"spot_price": 100.0, "legs": legs})
+    assert response.status_code == 400
+    assert error in response.json()["error"]
+
+
+@pytest.mark.parametrize("body", [{"long_call": 5}, {"iron_condor": [1.0, 2.0]}, ["long_call"]])
+def test_custom_rejects_malformed_strategy_premiums(client, body):
+    use_chain(25, 0)
+    response = client.post("/options-strategy-pnl-custom", params={"ticker": TICKER}, json=body)
+    assert response.status_code == 400
+    assert "must be an object" in response.json()["error"]
+
+
+def test_concurrent_deltas_keep_premiums_and_curves_together(client):
+    use_chain(61, 8)
+    context_id = client.get("/options-strategy-pnl", params={"ticker": TICKER}).json()["context_id"]
+    session = pipeline._sessions[context_id]
+
+    def edit(i):
+        pipeline.apply_delta(context_id, {"long_call": {"call_premium": 1.0 + i % 7},
+                                          "iron_condor": {"put_sell_premium": 2.0 + i % 5}})
+
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(edit, range(200)))
+    # Whichever edit landed last, the stored curves are the ones its premiums price to
+    final = {name: dict(session.strategy_premiums[name]) for name in ("long_call", "iron_condor")}
+    curves = {name: session.curves[name].copy() for name in final}
+    pipeline.apply_delta(context_id, final)
+    for name in final:
+        np.testing.assert_array_equal(session.curves[name], curves[name])
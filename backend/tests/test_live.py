@@ -0,0 +1,42 @@
+import asyncio
+
+import benchmark
+
+# Keep the default provider off the network
+benchmark._setup_offline()
+
+import market_data  # noqa: E402
+from live import LiveHub  # noqa: E402
+from pipeline import pipeline  # noqa: E402
+
+
+def test_stream_shares_one_delta_session():
+    async def scenario():
+        hub = LiveHub(refresh_seconds=3600)
+        first = await hub.subscribe(benchmark.TICKER)
+        second = await hub.subscribe(benchmark.TICKER)
+        snapshots = [first.queue.get_nowait(), second.queue.get_nowait()]
+        opened = len(pipeline._sessions)
+
+        # A new chain moves the premium breakdown, which reopens the stream's session once
+        market_data.set_provider(benchmark.SyntheticProvider(40, seed=1))
+        market_data.cache.clear()
+        key, state = next(iter(hub._streams.items()))
+        await hub._refresh(key, state)
+        updates = [first.queue.get_nowait(), second.queue.get_nowait()]
+        reopened = len(pipeline._sessions)
+        hub.unsubscribe(first)
+        hub.unsubscribe(second)
+        return snapshots, opened, updates, reopened
+
+    market_data.set_provider(benchmark.SyntheticProvider(40, seed=0))
+    pipeline.clear()
+    try:
+        snapshots, opened, updates, reopened = asyncio.run(scenario())
+    finally:
+        market_data.cache.clear()
+        pipeline.clear()
+    assert opened == 1
+    assert snapshots[0]["context_id"] == snapshots[1]["context_id"] is not None
+    assert reopened == 2
+    assert updates[0]["fields"]["context_id"] == updates[1]["fields"]["context_id"] != snapshots[0]["context_id"]
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import benchmark
+
+# Keep the module's default provider off the network
+benchmark._setup_offline()
+
+import market_data  # noqa: E402
+from market_data import MarketDataCache  # noqa: E402
+from snapshots import SnapshotStore  # noqa: E402
+
+NOW = datetime(2026, 10, 17, 15, 0, tzinfo=timezone.utc)
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def remaining_ttl(cache, kind, key):
+    expires_at, _, _ = cache._entries[(kind,) + key]
+    return expires_at - cache.clock()
+
+
+@pytest.fixture
+def warm_store(tmp_path, monkeypatch):
+    store = SnapshotStore(str(tmp_path))
+    cache = MarketDataCache(ttls={"spot": 15, "expiries": 3600, "chain": 60, "history": 3600}, clock=Clock())
+    monkeypatch.setattr(market_data, "store", store)
+    monkeypatch.setattr(market_data, "cache", cache)
+    calls, puts = benchmark.synthetic_chain(20)
+    for ticker, age in (("AAA", 10), ("BBB", 600), ("CCC", 7200)):
+        store.write(ticker, "2026-11-20", calls, puts, spot=100.0, fetched_at=NOW - timedelta(seconds=age))
+    return store, cache
+
+
+def test_warm_cache_serves_chains_until_max_age(warm_store):
+    _, cache = warm_store
+    assert market_data.warm_cache(now=NOW, max_age=3600) == 2
+    # Past the 60s chain TTL: the warmed entry lives for what is left of the warm window
+    assert remaining_ttl(cache, "chain", ("AAA", "2026-11-20")) == pytest.approx(3590)
+    assert remaining_ttl(cache, "chain", ("BBB", "2026-11-20")) == pytest.approx(3000)
+    assert cache.get("chain", ("CCC", "2026-11-20"))[0] is False
+    # The spot is only seeded while it would still be fresh
+    assert remaining_ttl(cache, "spot", ("AAA",)) == pytest.approx(5)
+    assert ("spot", "BBB") not in cache._entries
+    cache.clock.now += 3001
+    assert cache.get("chain", ("AAA", "2026-11-20"))[0] is True
+    assert cache.get("chain", ("BBB", "2026-11-20"))[0] is False
+
+
+def test_warm_window_can_be_shorter_than_chain_ttl(warm_store):
+    _, cache = warm_store
+    assert market_data.warm_cache(now=NOW, max_age=30) == 1
+    assert remaining_ttl(cache, "chain", ("AAA", "2026-11-20")) == pytest.approx(20)
+
+
+def sized(n):
+    # Values whose estimated size is known, so byte limits can be set exactly
+    value = b"x" * n
+    return value, market_data.estimate_size(value)
+
+
+def test_entries_expire_after_their_kind_ttl():
+    cache = MarketDataCache(ttls={"spot": 15, "chain": 60}, clock=Clock())
+    cache.put("spot", ("AAA",), 101.0)
+    cache.put("chain", ("AAA", "2026-11-20"), "chain")
+    cache.put("history", ("AAA", "1y"), "no ttl, never stored")
+    cache.clock.now += 14.9
+    assert cache.get("spot", ("AAA",)) == (True, 101.0)
+    cache.clock.now += 0.1
+    assert cache.get("spot", ("AAA",)) == (False, None)
+    assert cache.get("chain", ("AAA", "2026-11-20")) == (True, "chain")
+    assert cache.get("history", ("AAA", "1y")) == (False, None)
+    # Expired entries are dropped on read and give their bytes back
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["hits"] == {"spot": 1, "chain": 1}
+    assert cache.stats()["misses"] == {"spot": 1, "chain": 0, "history": 1}
+
+
+def test_eviction_drops_least_recently_used_first():
+    value, size = sized(100)
+    cache = MarketDataCache(ttls={"chain": 60}, max_bytes=3 * size, clock=Clock())
+    for ticker in ("AAA", "BBB", "CCC"):
+        cache.put("chain", (ticker,), value)
+    # Reading AAA makes BBB the oldest
+    assert cache.get("chain", ("AAA",))[0] is True
+    cache.put("chain", ("DDD",), value)
+    assert [cache.get("chain", (t,), count=False)[0] for t in ("AAA", "BBB", "CCC", "DDD")] == [
+        True, False, True, True
+    ]
+    # Replacing an entry moves it to the newest end without evicting anything
+    cache.put("chain", ("CCC",), value)
+    cache.put("chain", ("EEE",), value)
+    assert [cache.get("chain", (t,), count=False)[0] for t in ("AAA", "CCC", "DDD", "EEE")] == [
+        False, True, True, True
+    ]
+    assert cache.evictions == 2
+
+
+def test_size_limit_bounds_stored_bytes():
+    small, small_size = sized(100)
+    large, large_size = sized(small_size + 50)
+    cache = MarketDataCache(ttls={"chain": 60}, max_bytes=2 * small_size + 10, clock=Clock())
+    cache.put("chain", ("AAA",), small)
+    cache.put("chain", ("BBB",), small)
+    assert cache.stats()["bytes"] == 2 * small_size
+    # Too big to ever fit: not stored, and nothing is evicted for it
+    too_big, _ = sized(3 * small_size)
+    cache.put("chain", ("CCC",), too_big)
+    assert cache.get("chain", ("CCC",), count=False)[0] is False
+    assert cache.stats()["entries"] == 2
+    # Fits alone, so it pushes out both older entries
+    cache.put("chain", ("DDD",), large)
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["bytes"] == large_size <= cache.max_bytes
+    cache.invalidate("chain")
+    assert cache.stats()["bytes"] == 0
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    cache = MarketDataCache(ttls={"spot": 15})
+    monkeypatch.setattr(market_data, "cache", cache)
+    return cache
+
+
+def test_concurrent_fetches_share_one_load(fresh_cache):
+    calls = []
+
+    def loader():
+        calls.append(threading.get_ident())
+        time.sleep(0.05)
+        return 101.0
+
+    async def fetch_many():
+        return await asyncio.gather(*(market_data._fetch("spot", ("AAA",), loader) for _ in range(10)))
+
+    assert asyncio.run(fetch_many()) == [101.0] * 10
+    assert len(calls) == 1
+    assert market_data._inflight == {}
+    assert fresh_cache.get("spot", ("AAA",)) == (True, 101.0)
+
+
+def test_failed_load_reaches_every_waiter_and_is_not_cached(fresh_cache):
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.05)
+        raise RuntimeError("upstream down")
+
+    async def fetch_many():
+        return await asyncio.gather(*(market_data._fetch("spot", ("AAA",), loader) for _ in range(5)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(fetch_many())
+    assert len(calls) == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert fresh_cache.get("spot", ("AAA",))[0] is False
+    # The next caller retries instead of getting the old failure
+    asyncio.run(fetch_many())
+    assert len(calls) == 2
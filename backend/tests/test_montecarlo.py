@@ -0,0 +1,90 @@
+import math
+
+import numpy as np
+import pytest
+
+import montecarlo
+from benchmark import SPOT, synthetic_chain
+from montecarlo import run_simulation, simulate_terminal
+from payoff import STRATEGY_NAMES, legs_pnl, strategy_leg_arrays
+from strategies import resolve_strategy_legs
+
+RATE = 0.045
+T = 30 / 365
+
+
+@pytest.fixture(scope="module")
+def legs():
+    calls, puts = synthetic_chain(61, seed=3)
+    return resolve_strategy_legs(SPOT, SPOT, calls, puts)
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    # Several chunks per run, so the tail merge across chunks is exercised
+    monkeypatch.setattr(montecarlo, "CHUNK_ELEMENTS", 3000 * len(STRATEGY_NAMES))
+    monkeypatch.setattr(montecarlo, "MONTECARLO_WORKERS", 1)
+
+
+def all_path_pnl(legs, paths, seed, model, sigma=None, returns=None):
+    # The same chunked draws run_simulation makes, kept whole
+    days = max(1, round(T * montecarlo.TRADING_DAYS)) if model == "bootstrap" else 1
+    chunk = max(1000, montecarlo.CHUNK_ELEMENTS // max(days, len(STRATEGY_NAMES)))
+    sizes = [chunk] * (paths // chunk) + ([paths % chunk] if paths % chunk else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    prices = np.concatenate([
+        simulate_terminal(np.random.default_rng(s), n, SPOT, T, RATE, model, sigma, returns)
+        for s, n in zip(seeds, sizes)
+    ])
+    return legs_pnl(prices, strategy_leg_arrays(legs, SPOT), len(STRATEGY_NAMES))
+
+
+@pytest.mark.parametrize("model,confidence", [("lognormal", 0.95), ("lognormal", 0.99), ("bootstrap", 0.9)])
+def test_tail_statistics_match_full_sort(legs, small_chunks, model, confidence):
+    paths = 10_007
+    returns = np.random.default_rng(1).normal(0.0005, 0.02, 250)
+    results = run_simulation(legs, SPOT, T, RATE, paths, model=model, sigma=0.3, returns=returns,
+                             confidence=confidence, seed=42)
+    pnl = np.sort(all_path_pnl(legs, paths, 42, model, 0.3, returns), axis=0)
+    k = math.ceil((1 - confidence) * paths)
+    for i, name in enumerate(STRATEGY_NAMES):
+        # VaR is the k-th worst outcome and CVaR the mean of the k worst
+        assert results[name]["var"] == pytest.approx(-pnl[k - 1, i], abs=0.005), name
+        assert results[name]["cvar"] == pytest.approx(-pnl[:k, i].mean(), abs=0.005), name
+        assert results[name]["probability_of_profit"] == pytest.approx((pnl[:, i] > 0).mean(), abs=5e-5), name
+        assert results[name]["expected_pnl"] == pytest.approx(pnl[:, i].mean(), abs=0.005), name
+
+
+def test_same_seed_reproduces_results(legs, small_chunks):
+    first = run_simulation(legs, SPOT, T, RATE, 20_000, sigma=0.25, seed=7)
+    assert run_simulation(legs, SPOT, T, RATE, 20_000, sigma=0.25, seed=7) == first
+    assert run_simulation(legs, SPOT, T, RATE, 20_000, sigma=0.25, seed=8) != first
+
+
+def test_lognormal_terminal_prices_are_risk_neutral():
+    rng = np.random.default_rng(0)
+    prices = simulate_terminal(rng, 400_000, SPOT, 0.5, RATE, "lognormal", sigma=0.3)
+    assert prices.mean() == pytest.approx(SPOT * math.exp(RATE * 0.5), rel=2e-3)
+    assert np.log(prices).std() == pytest.approx(0.3 * math.sqrt(0.5), rel=5e-3)
+
+
+def test_bootstrap_resamples_daily_returns_over_the_horizon():
+    days = round(T * montecarlo.TRADING_DAYS)
+    # A single recorded return: every path compounds it once per trading day
+    flat = simulate_terminal(np.random.default_rng(0), 100, SPOT, T, RATE, "bootstrap", returns=np.array([0.01]))
+    np.testing.assert_allclose(flat, SPOT * math.exp(0.01 * days))
+    # Only recorded returns are drawn, so the log move is a sum of exactly `days` of them
+    returns = np.array([-0.02, 0.0, 0.03])
+    moves = np.log(simulate_terminal(np.random.default_rng(1), 5000, SPOT, T, RATE, "bootstrap", returns=returns)
+                   / SPOT)
+    steps = np.round(moves / 0.01).astype(int)
+    np.testing.assert_allclose(moves, steps * 0.01, atol=1e-9)
+    assert steps.min() >= -2 * days and steps.max() <= 3 * days
+    # and its drift is the historical one, not the rate
+    assert moves.mean() == pytest.approx(days * returns.mean(), abs=0.01)
+
+
+def test_expired_horizon_pins_the_spot():
+    for model in montecarlo.MODELS:
+        prices = simulate_terminal(np.random.default_rng(0), 10, SPOT, 0.0, RATE, model, 0.3, np.array([0.01]))
+        np.testing.assert_array_equal(prices, SPOT)
@@ -0,0 +1,124 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import optimizer
+from benchmark import SPOT, synthetic_chain
+from chain import ChainIndex
+from payoff import LEG_ACTIONS, LEG_TYPES, STRATEGY_TEMPLATES, kink_pnl, payoff_extremes
+
+
+@pytest.fixture(scope="module")
+def chain():
+    return ChainIndex(*synthetic_chain(61))
+
+
+def leg_strikes(strategy, strikes):
+    # {strike key of the template: column of strikes}
+    return {key: strikes[:, j] for j, (_, _, _, key, _) in enumerate(STRATEGY_TEMPLATES[strategy]) if key}
+
+
+def family_shape(strategy, legs):
+    # Which rows of {strike key: column} have the shape their family is named for
+    if strategy == "straddle":
+        return legs["call_strike"] == legs["put_strike"]
+    if strategy == "strangle":
+        return legs["put_strike"] < legs["call_strike"]
+    if strategy == "butterfly_spread":
+        lower, center, upper = legs["buy_lower_strike"], legs["sell_center_strike"], legs["buy_upper_strike"]
+        return (lower < center) & (center < upper) & np.isclose(center - lower, upper - center, rtol=0, atol=1e-6)
+    if strategy == "iron_condor":
+        return ((legs["put_buy_strike"] < legs["put_sell_strike"])
+                & (legs["put_sell_strike"] <= legs["call_sell_strike"])
+                & (legs["call_sell_strike"] < legs["call_buy_strike"]))
+    if strategy in ("bull_call_spread", "bull_put_spread"):
+        return legs["buy_strike"] < legs["sell_strike"]
+    if strategy in ("bear_put_spread", "bear_call_spread"):
+        return legs["sell_strike"] < legs["buy_strike"]
+    return np.ones(len(next(iter(legs.values()))), dtype=bool)
+
+
+@pytest.mark.parametrize("strategy", list(optimizer.FAMILY_ORDER))
+def test_combinations_have_family_shape(chain, strategy):
+    for sort_by in optimizer.SORT_KEYS:
+        best, _, _ = optimizer.score_family(strategy, chain, SPOT, sort_by=sort_by, k=200)
+        assert best is not None and len(best["strikes"])
+        assert family_shape(strategy, leg_strikes(strategy, best["strikes"])).all()
+
+
+def brute_force(strategy, chain, spot, sort_by, k):
+    # Every assignment of listed strikes to the template's legs, filtered to the family's shape
+    template = STRATEGY_TEMPLATES[strategy]
+    option_legs = [j for j, (leg_type, _, _, _, _) in enumerate(template) if leg_type != "stock"]
+    grid = chain.strikes
+    picks = np.array(list(itertools.product(range(len(grid)), repeat=len(option_legs))))
+    strikes = np.zeros((len(picks), len(template)))
+    premiums = np.full((len(picks), len(template)), float(spot))
+    for column, j in enumerate(option_legs):
+        strikes[:, j] = grid[picks[:, column]]
+        side = chain.calls if template[j][0] == "call" else chain.puts
+        grid_premiums = np.where(np.isin(grid, side.strikes), side.premiums[side.nearest_indices(grid)], np.nan)
+        premiums[:, j] = grid_premiums[picks[:, column]]
+    keep = family_shape(strategy, leg_strikes(strategy, strikes)) & np.isfinite(premiums).all(axis=1)
+    strikes, premiums = strikes[keep], premiums[keep]
+    types = np.array([LEG_TYPES[t] for t, _, _, _, _ in template])
+    quantities = np.array([LEG_ACTIONS[a] * q for _, a, q, _, _ in template], dtype=float)
+    points, pnl, slope = kink_pnl(types, strikes, quantities, premiums)
+    max_profit, max_loss, _ = payoff_extremes(points, pnl, slope)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        risk_reward = np.where(max_loss < -0.005, max_profit / -max_loss, np.where(max_profit > 0, np.inf, np.nan))
+    metrics = {"max_profit": max_profit, "max_loss": max_loss, "risk_reward": risk_reward}
+    primary, secondary = optimizer.sort_scores(metrics, sort_by)
+    order = np.lexsort((-secondary, -primary))[:k]
+    return primary[order], secondary[order]
+
+
+@pytest.mark.parametrize("strategy", list(optimizer.FAMILY_ORDER))
+@pytest.mark.parametrize("sort_by", optimizer.SORT_KEYS)
+def test_top_k_matches_brute_force(strategy, sort_by):
+    # A small chain whose every strike assignment can be scored directly
+    chain = ChainIndex(*synthetic_chain(14, seed=3))
+    best, _, _ = optimizer.score_family(strategy, chain, SPOT, sort_by=sort_by, k=15, chunk_rows=37)
+    primary, secondary = optimizer.sort_scores(best, sort_by)
+    expected_primary, expected_secondary = brute_force(strategy, chain, SPOT, sort_by, 15)
+    # Ties may pick different strikes, the scores at every rank must agree
+    np.testing.assert_allclose(primary, expected_primary, rtol=1e-12)
+    np.testing.assert_allclose(secondary, expected_secondary, rtol=1e-12)
+
+
+def test_family_enumeration_counts():
+    grid = np.arange(80.0, 121.0)
+    n = len(grid)
+    rows = {s: sum(len(c) for c in optimizer.family_chunks(s, grid, chunk_rows=97)) for s in optimizer.FAMILY_ORDER}
+    assert rows["straddle"] == n
+    assert rows["long_call"] == n
+    assert rows["strangle"] == n * (n - 1) // 2
+    assert rows["iron_condor"] == optimizer.combination_count(n, 4, (1,))
+    # Evenly spaced grid: one butterfly per (lower, center) whose upper wing is still listed
+    assert rows["butterfly_spread"] == sum(min(c, n - 1 - c) for c in range(n))
+
+
+def test_increasing_tuples_are_all_strict_tuples():
+    tuples = optimizer.increasing_tuples(7, 3)
+    assert len(tuples) == 35
+    assert (np.diff(tuples, axis=1) > 0).all()
+    assert len({tuple(t) for t in tuples.tolist()}) == 35
+
+
+def test_rows_flag_no_loss_and_arbitrage():
+    # Iron butterflies: a fair one, one that can't lose and one that profits at every price
+    best = {
+        "strikes": np.array([[90.0, 100.0, 100.0, 110.0]] * 3),
+        "premiums": np.array([[1.0, 4.0, 4.0, 1.0], [1.0, 6.0, 6.0, 1.0], [0.5, 6.0, 6.0, 0.5]]),
+        "breakevens": np.full((3, 5), np.nan),
+    }
+    types = np.array([LEG_TYPES[t] for t, _, _, _, _ in STRATEGY_TEMPLATES["iron_condor"]])
+    quantities = np.array([LEG_ACTIONS[a] * q for _, a, q, _, _ in STRATEGY_TEMPLATES["iron_condor"]])
+    points, pnl, slope = kink_pnl(types, best["strikes"], quantities, best["premiums"])
+    best["max_profit"], best["max_loss"], _ = payoff_extremes(points, pnl, slope)
+    best["risk_reward"] = np.array([0.6, np.inf, np.inf])
+    rows = optimizer.combination_rows("iron_condor", best, quantities)
+    assert [(r["no_loss"], r["arbitrage"]) for r in rows] == [(False, False), (True, False), (True, True)]
+    assert rows[0]["max_loss"] == -400.0 and rows[1]["max_loss"] == 0.0 and rows[2]["max_loss"] == 100.0
+    assert rows[1]["risk_reward"] is None and rows[2]["risk_reward"] is None
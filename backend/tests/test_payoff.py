@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+
+from benchmark import SPOT, synthetic_chain
+from chain import ChainIndex
+from payoff import (
+    LEG_TYPES, LOT_SIZE, STRATEGY_NAMES, LegArrays, StrategyLegs, legs_pnl, payoff_summary, price_grid,
+    strategy_pnl_curves,
+)
+from strategies import OptionStrategies, resolve_strategy_legs
+
+# (strikes, seed) of the synthetic chains the vectorized curves are checked against
+CHAIN_CASES = [(5, 0), (20, 1), (61, 2), (200, 3), (1000, 4)]
+
+
+def scalar_curves(prices, strike, calls, puts, strategy_premiums=None):
+    # The per-price OptionStrategies loop the endpoints ran before the vectorized engine
+    chain = ChainIndex(calls, puts)
+    legs = resolve_strategy_legs(strike, SPOT, calls, puts, chain=chain)
+    return {
+        name: np.array([
+            getattr(OptionStrategies(p, strike, SPOT, calls, puts, user_strategy_premiums=strategy_premiums,
+                                     legs=legs, chain=chain), name)()
+            for p in prices
+        ])
+        for name in STRATEGY_NAMES
+    }
+
+
+def with_iron_condor(leg):
+    # strategy_pnl_curves evaluates every built-in strategy; the others come from a real chain
+    calls, puts = synthetic_chain(20)
+    legs = resolve_strategy_legs(SPOT, SPOT, calls, puts).breakdown()
+    legs["iron_condor"] = leg
+    return StrategyLegs(SPOT, legs)
+
+
+@pytest.mark.parametrize("n_strikes,seed", CHAIN_CASES)
+def test_curves_match_scalar_methods(n_strikes, seed):
+    calls, puts = synthetic_chain(n_strikes, seed=seed)
+    chain = ChainIndex(calls, puts)
+    for strike in (chain.strikes[0], chain.nearest_strike(SPOT), chain.strikes[len(chain.strikes) // 3],
+                   chain.strikes[-1]):
+        prices = price_grid(SPOT, 0.5, 101, chain.strikes)
+        legs = resolve_strategy_legs(strike, SPOT, calls, puts, chain=chain)
+        curves = strategy_pnl_curves(prices, legs, SPOT)
+        expected = scalar_curves(prices, strike, calls, puts)
+        for name in STRATEGY_NAMES:
+            # The scalar methods round to 2 or 3 decimals
+            np.testing.assert_allclose(curves[name], expected[name], rtol=0, atol=0.006, err_msg=name)
+
+
+def test_curves_apply_strategy_premiums_like_scalar_methods():
+    calls, puts = synthetic_chain(61, seed=5)
+    strike = ChainIndex(calls, puts).nearest_strike(SPOT)
+    overrides = {
+        "bull_call_spread": {"buy_premium": 4.25, "sell_premium": None},
+        "iron_condor": {"call_buy_premium": 0.1, "put_sell_premium": "2.5"},
+        "butterfly_spread": {"sell_center_premium": 3.0, "unknown_premium": 9.0},
+    }
+    prices = price_grid(SPOT, 0.3, 61)
+    legs = resolve_strategy_legs(strike, SPOT, calls, puts)
+    curves = strategy_pnl_curves(prices, legs, SPOT, overrides)
+    expected = scalar_curves(prices, strike, calls, puts, overrides)
+    for name in STRATEGY_NAMES:
+        np.testing.assert_allclose(curves[name], expected[name], rtol=0, atol=0.006, err_msg=name)
+
+
+def test_iron_condor_is_four_leg_sum():
+    rng = np.random.default_rng(7)
+    prices = np.linspace(0.0, 250.0, 501)
+    for _ in range(200):
+        # Any order of strikes, including crossed wings the piecewise formula never handled
+        put_buy, put_sell, call_sell, call_buy = rng.uniform(50.0, 150.0, 4).round(2)
+        premiums = rng.uniform(0.0, 10.0, 4).round(3)
+        leg = {
+            "put_buy_strike": put_buy, "put_buy_premium": premiums[0],
+            "put_sell_strike": put_sell, "put_sell_premium": premiums[1],
+            "call_sell_strike": call_sell, "call_sell_premium": premiums[2],
+            "call_buy_strike": call_buy, "call_buy_premium": premiums[3],
+        }
+        curve = strategy_pnl_curves(prices, with_iron_condor(leg), SPOT)["iron_condor"]
+        expected = (
+            np.maximum(put_buy - prices, 0) - premiums[0]
+            - (np.maximum(put_sell - prices, 0) - premiums[1])
+            - (np.maximum(prices - call_sell, 0) - premiums[2])
+            + np.maximum(prices - call_buy, 0) - premiums[3]
+        ) * LOT_SIZE
+        np.testing.assert_allclose(curve, expected, rtol=0, atol=1e-9)
+
+
+def test_iron_condor_matches_piecewise_formula_when_ordered():
+    prices = np.linspace(60.0, 140.0, 161)
+    leg = {
+        "put_buy_strike": 85.0, "put_buy_premium": 0.8,
+        "put_sell_strike": 95.0, "put_sell_premium": 2.1,
+        "call_sell_strike": 105.0, "call_sell_premium": 1.9,
+        "call_buy_strike": 115.0, "call_buy_premium": 0.6,
+    }
+    curve = strategy_pnl_curves(prices, with_iron_condor(leg), SPOT)
+    credit = 2.1 - 0.8 + 1.9 - 0.6
+    expected = np.select(
+        [prices <= 85.0, prices <= 95.0, prices <= 105.0, prices <= 115.0],
+        [credit - 10.0, credit - (95.0 - prices), np.full_like(prices, credit), credit - (prices - 105.0)],
+        credit - 10.0,
+    ) * LOT_SIZE
+    np.testing.assert_allclose(curve["iron_condor"], expected, rtol=0, atol=1e-9)
+
+
+
+def random_legs(rng):
+    n = rng.integers(1, 6)
+    return LegArrays(
+        rng.choice([LEG_TYPES["call"], LEG_TYPES["put"], LEG_TYPES["stock"]], n, p=[0.45, 0.45, 0.1]),
+        rng.choice(np.arange(50.0, 151.0, 2.5), n),
+        rng.choice([-1.0, 1.0], n) * rng.integers(1, 4, n),
+        rng.uniform(0.0, 15.0, n).round(2),
+    )
+
+
+def test_payoff_summary_matches_dense_grid():
+    rng = np.random.default_rng(11)
+    for _ in range(3000):
+        legs = random_legs(rng)
+        summary = payoff_summary(legs)
+        # The P&L is linear past the last strike, so this grid holds every extreme it can reach
+        prices = np.unique(np.concatenate([np.linspace(0.0, 300.0, 6001), legs.strikes]))
+        pnl = legs_pnl(prices, legs)[:, 0]
+        # Outputs are rounded to cents, which moves the P&L by at most this much
+        tolerance = np.abs(legs.quantities).sum() * LOT_SIZE * 0.005 + 1e-6
+        rising, falling = pnl[-1] > pnl[-2] + 1e-9, pnl[-1] < pnl[-2] - 1e-9
+        assert summary["unlimited_profit"] == rising
+        assert summary["unlimited_loss"] == falling
+        if not rising:
+            assert summary["max_profit"] == pytest.approx(pnl.max(), abs=0.006)
+            for lo, hi in summary["max_profit_ranges"]:
+                assert legs_pnl([lo], legs)[0, 0] == pytest.approx(pnl.max(), abs=tolerance)
+        if not falling:
+            assert summary["max_loss"] == pytest.approx(pnl.min(), abs=0.006)
+            for lo, hi in summary["max_loss_ranges"]:
+                assert legs_pnl([lo], legs)[0, 0] == pytest.approx(pnl.min(), abs=tolerance)
+        # Every breakeven prices to zero and every sign change on the grid holds one
+        breakevens = np.array(summary["breakevens"])
+        if len(breakevens):
+            assert np.abs(legs_pnl(breakevens, legs)[:, 0]).max() <= tolerance
+        crossings = np.flatnonzero(np.sign(pnl[:-1]) * np.sign(pnl[1:]) < 0)
+        for i in crossings:
+            assert ((breakevens >= prices[i] - 0.005) & (breakevens <= prices[i + 1] + 0.005)).any()
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from benchmark import SPOT, synthetic_chain
+from chain import ChainIndex
+from payoff import LegArrays, legs_pnl
+from pricing import RISK_FREE_RATE, bs_greeks, bs_price, chain_side_vols, implied_vol, legs_value_grid
+
+RATE = RISK_FREE_RATE
+
+
+@pytest.fixture(scope="module")
+def quotes():
+    rng = np.random.default_rng(0)
+    n = 20000
+    strikes = rng.uniform(0.6, 1.4, n) * SPOT
+    years = rng.uniform(0.01, 2.0, n)
+    sigmas = rng.uniform(0.05, 1.5, n)
+    is_call = rng.random(n) < 0.5
+    return strikes, years, sigmas, is_call, bs_price(SPOT, strikes, years, RATE, sigmas, is_call)
+
+
+def test_implied_vol_round_trips(quotes):
+    strikes, years, sigmas, is_call, prices = quotes
+    iv = implied_vol(prices, SPOT, strikes, years, RATE, is_call)
+    vega = bs_greeks(SPOT, strikes, years, RATE, sigmas, is_call)["vega"]
+    # Wherever the price still moves with volatility the solved vol is the one priced in
+    priced = vega > 0.01
+    assert priced.mean() > 0.9
+    assert np.abs(iv[priced] - sigmas[priced]).max() < 1e-7
+    # and every solved row reprices its quote to the solver tolerance
+    solved = np.isfinite(iv)
+    repriced = bs_price(SPOT, strikes[solved], years[solved], RATE, iv[solved], is_call[solved])
+    assert np.abs(repriced - prices[solved]).max() < 1e-7
+
+
+def test_implied_vol_rejects_prices_outside_bounds():
+    strikes = np.array([90.0, 110.0, 100.0, 100.0, 100.0])
+    t = np.array([0.5, 0.5, 0.0, 0.5, 0.5])
+    prices = np.array([5.0, SPOT + 1.0, 3.0, np.nan, -1.0])
+    assert np.isnan(implied_vol(prices, SPOT, strikes, t, RATE, True)).all()
+
+
+def test_implied_vol_keeps_input_shape():
+    strikes = np.linspace(80.0, 120.0, 12).reshape(3, 4)
+    prices = bs_price(SPOT, strikes, 0.25, RATE, 0.3, False)
+    iv = implied_vol(prices, SPOT, strikes, 0.25, RATE, False)
+    assert iv.shape == (3, 4)
+    np.testing.assert_allclose(iv, 0.3, atol=1e-7)
+
+
+def test_put_call_parity():
+    strikes = np.linspace(50.0, 150.0, 101)
+    calls = bs_price(SPOT, strikes, 0.75, RATE, 0.35, True)
+    puts = bs_price(SPOT, strikes, 0.75, RATE, 0.35, False)
+    np.testing.assert_allclose(calls - puts, SPOT - strikes * np.exp(-RATE * 0.75), atol=1e-9)
+
+
+@pytest.mark.parametrize("is_call", [True, False])
+def test_greeks_match_finite_differences(is_call):
+    strikes = np.linspace(70.0, 130.0, 25)
+    t, sigma, h = 0.4, 0.28, 1e-3
+    greeks = bs_greeks(SPOT, strikes, t, RATE, sigma, is_call)
+
+    def price(spot=SPOT, years=t, vol=sigma):
+        return bs_price(spot, strikes, years, RATE, vol, is_call)
+
+    np.testing.assert_allclose(greeks["delta"], (price(SPOT + h) - price(SPOT - h)) / (2 * h), atol=1e-6)
+    np.testing.assert_allclose(
+        greeks["gamma"], (price(SPOT + h) - 2 * price() + price(SPOT - h)) / h ** 2, atol=1e-4
+    )
+    # Vega per vol point and theta per calendar day, like the endpoint reports them
+    np.testing.assert_allclose(greeks["vega"], (price(vol=sigma + h) - price(vol=sigma - h)) / (2 * h) / 100, atol=1e-6)
+    np.testing.assert_allclose(greeks["theta"], -(price(years=t + h) - price(years=t - h)) / (2 * h) / 365, atol=1e-6)
+
+
+def test_chain_vols_recover_synthetic_smile():
+    calls, puts = synthetic_chain(200)
+    chain = ChainIndex(calls, puts)
+    # The synthetic quotes are rounded mids of Black-Scholes prices; out of the money rows with some
+    # premium carry enough time value to pin the vol down
+    iv = chain_side_vols(chain.calls, SPOT, 30 / 365, 0.045, True)
+    moneyness = np.log(chain.calls.strikes / SPOT)
+    expected = 0.25 - 0.1 * moneyness + 0.4 * moneyness * moneyness
+    liquid = np.isfinite(iv) & (chain.calls.strikes >= SPOT) & (chain.calls.premiums > 0.5)
+    assert liquid.sum() > 10
+    np.testing.assert_allclose(iv[liquid], expected[liquid], atol=5e-3)
+
+
+def test_value_grid_at_expiry_is_payoff():
+    legs = LegArrays.from_legs([
+        {"type": "call", "action": "buy", "quantity": 1, "strike": 95.0, "premium": 6.0},
+        {"type": "put", "action": "sell", "quantity": 2, "strike": 105.0, "premium": 7.5},
+        {"type": "stock", "action": "buy", "quantity": 1, "strike": 0.0, "premium": SPOT},
+    ])
+    prices = np.linspace(60.0, 140.0, 81)
+    grid = legs_value_grid(prices, np.array([0.0, 0.25]), legs, np.full(3, 0.3))
+    np.testing.assert_allclose(grid[0, 0], legs_pnl(prices, legs)[:, 0], atol=1e-9)
@@ -0,0 +1,121 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+from benchmark import synthetic_chain
+from providers import FallbackProvider, ProviderError, ReplayProvider
+from snapshots import SnapshotStore
+
+EXPIRY = "2026-11-20"
+
+
+def side_frame(premium):
+    return pd.DataFrame({"strike": [95.0, 100.0, 105.0], "lastPrice": [premium] * 3,
+                         "bid": [premium - 0.1] * 3, "ask": [premium + 0.1] * 3})
+
+
+@pytest.fixture
+def replay_root(tmp_path):
+    # AAA replays three timestamped snapshots, BBB a single undated one
+    ticker = tmp_path / "AAA"
+    ticker.mkdir()
+    (ticker / "quote.json").write_text(json.dumps({"spot": 101.5}))
+    pd.DataFrame({"Close": [99.0, 100.0, 101.5]}).to_csv(ticker / "history.csv", index=False)
+    for i, stamp in enumerate(("20261016T150000", "20261016T150500", "20261016T151000")):
+        directory = ticker / EXPIRY / stamp
+        directory.mkdir(parents=True)
+        side_frame(1.0 + i).to_csv(directory / "calls.csv", index=False)
+        side_frame(10.0 + i).to_csv(directory / "puts.csv", index=False)
+    single = tmp_path / "BBB" / EXPIRY
+    single.mkdir(parents=True)
+    side_frame(7.0).to_csv(single / "calls.csv", index=False)
+    return tmp_path
+
+
+def call_premium(provider, ticker="AAA"):
+    calls, _ = provider.chain(ticker, EXPIRY)
+    return float(calls["lastPrice"].iloc[0])
+
+
+class FailingProvider:
+    name = "failing"
+
+    def __init__(self):
+        self.calls = 0
+
+    def _fail(self, *args):
+        self.calls += 1
+        raise ConnectionError("upstream down")
+
+    spot = expiries = chain = history = _fail
+
+
+def test_replay_cursor_advances_and_holds_the_last_snapshot(replay_root):
+    provider = ReplayProvider(str(replay_root))
+    assert [call_premium(provider) for _ in range(5)] == [1.0, 2.0, 3.0, 3.0, 3.0]
+    # A single undated snapshot is served on every load
+    assert [call_premium(provider, "BBB") for _ in range(2)] == [7.0, 7.0]
+    _, puts = provider.chain("BBB", EXPIRY)
+    assert puts.empty and list(puts.columns) == ["strike", "lastPrice", "bid", "ask"]
+
+
+def test_replay_loop_wraps_around(replay_root):
+    provider = ReplayProvider(str(replay_root), loop=True)
+    assert [call_premium(provider) for _ in range(7)] == [1.0, 2.0, 3.0, 1.0, 2.0, 3.0, 1.0]
+
+
+def test_replay_serves_quote_history_and_expiries(replay_root):
+    provider = ReplayProvider(str(replay_root))
+    assert provider.spot("aaa") == 101.5
+    assert provider.history("AAA").tolist() == [99.0, 100.0, 101.5]
+    assert provider.expiries("AAA") == (EXPIRY,)
+    with pytest.raises(ProviderError):
+        provider.chain("AAA", "2026-12-18")
+    with pytest.raises(ProviderError):
+        provider.spot("CCC")
+    with pytest.raises(ProviderError):
+        provider.history("BBB")
+
+
+def test_replay_reads_a_snapshot_store(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    calls, puts = synthetic_chain(10)
+    start = datetime(2026, 10, 16, 15, 0, tzinfo=timezone.utc)
+    for i, spot in enumerate((100.0, 100.8)):
+        store.write("AAA", EXPIRY, calls.assign(lastPrice=calls["lastPrice"] + i), puts, spot=spot,
+                    fetched_at=start + timedelta(minutes=5 * i))
+    provider = ReplayProvider(str(tmp_path))
+    # Without a quote.json the spot comes from the newest snapshot's metadata
+    assert provider.spot("AAA") == 100.8
+    first, second = provider.chain("AAA", EXPIRY)[0], provider.chain("AAA", EXPIRY)[0]
+    assert (second["lastPrice"] - first["lastPrice"]).tolist() == pytest.approx([1.0] * len(calls))
+
+
+def test_fallback_serves_replay_when_primary_fails(replay_root):
+    primary = FailingProvider()
+    provider = FallbackProvider(primary, ReplayProvider(str(replay_root)))
+    assert provider.name == "failing+replay"
+    assert provider.spot("AAA") == 101.5
+    # Each fallback chain load still moves the replay cursor on
+    assert [call_premium(provider) for _ in range(3)] == [1.0, 2.0, 3.0]
+    assert provider.expiries("AAA") == (EXPIRY,)
+    assert primary.calls == 5
+    assert provider.fallbacks == 5
+
+
+def test_fallback_prefers_a_working_primary(replay_root):
+    replay = ReplayProvider(str(replay_root))
+    provider = FallbackProvider(ReplayProvider(str(replay_root), loop=True), replay)
+    assert [call_premium(provider) for _ in range(4)] == [1.0, 2.0, 3.0, 1.0]
+    assert provider.fallbacks == 0
+    # The standby was never touched, so its cursor is still at the start
+    assert call_premium(replay) == 1.0
+
+
+def test_fallback_raises_when_both_fail(replay_root):
+    provider = FallbackProvider(FailingProvider(), ReplayProvider(str(replay_root)))
+    with pytest.raises(ProviderError):
+        provider.chain("CCC", EXPIRY)
+    assert provider.fallbacks == 1
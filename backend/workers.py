@@ -0,0 +1,36 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Long-lived process pools shared by every request, one per named workload. Workers are
+# spawned rather than forked: forking a process that runs an event loop and thread pools
+# copies their locks in whatever state they happen to be in. A spawned worker imports the
+# module of the function it runs by name and re-runs an importable __main__, so jobs must be
+# module-level functions of backend modules and scripts that submit them need a __main__ guard.
+_pools = {}
+_lock = threading.Lock()
+
+
+def process_pool(name, workers):
+    with _lock:
+        pool = _pools.get(name)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pools[name] = pool
+        return pool
+
+
+def discard_pool(name):
+    # A pool whose worker died is broken for good, the next request gets a fresh one
+    with _lock:
+        pool = _pools.pop(name, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pools():
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
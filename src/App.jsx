@@ -5,6 +5,29 @@ import "./App.css";
 
 const SKELETON_ROW_COUNT = 8; // Number of shimmer rows to show when loading
 
+const priceOf = (row) => parseFloat(row["Price at Expiry"].replace("$", ""));
+
+const applyLiveUpdate = (data, update) => {
+  const rows = new Map(
+    (data.strategies || []).map((row) => [row["Price at Expiry"], row])
+  );
+  update.removed_rows.forEach((label) => rows.delete(label));
+  update.rows.forEach((row) =>
+    rows.set(row["Price at Expiry"], { ...rows.get(row["Price at Expiry"]), ...row })
+  );
+  const premiums = {};
+  Object.keys(update.premiums).forEach((side) => {
+    premiums[side] = { ...data.premiums?.[side], ...update.premiums[side] };
+    update.removed_premiums[side].forEach((strike) => delete premiums[side][strike]);
+  });
+  return {
+    ...data,
+    ...update.fields,
+    premiums,
+    strategies: [...rows.values()].sort((a, b) => priceOf(a) - priceOf(b)),
+  };
+};
+
 const App = () => {
   const [ticker, setTicker] = useState("AAPL");
   const [stockInfo, setStockInfo] = useState(null);
@@ -59,6 +82,33 @@ const App = () => {
         [selectedStrategy]: premiums,
       };
 
+      // Incremental path: reprice only this strategy against the server-side context
+      if (stockInfo?.context_id) {
+        try {
+          const deltaRes = await axios.post(
+            `http://localhost:8000/options-strategy-pnl-delta?context_id=${stockInfo.context_id}`,
+            payload
+          );
+          const delta = deltaRes.data;
+          const byPrice = Object.fromEntries(
+            delta.strategies.map((row) => [row["Price at Expiry"], row])
+          );
+          setStockInfo((prev) => ({
+            ...prev,
+            payoff_summary: { ...prev.payoff_summary, ...delta.payoff_summary },
+            strategies: prev.strategies.map((row) => ({
+              ...row,
+              ...byPrice[row["Price at Expiry"]],
+            })),
+          }));
+          setError(null);
+          setLoading(false);
+          return;
+        } catch {
+          // Context expired or unknown, fall back to the full recompute below
+        }
+      }
+
       const url =
         `http://localhost:8000/options-strategy-pnl-custom?ticker=${symbol}` +
         (expiry ? `&expiry=${expiry}` : "") +
@@ -86,6 +136,27 @@ const App = () => {
     // eslint-disable-next-line
   }, [selectedExpiry, selectedStrike]);
 
+  // Live quotes: the server pushes only the rows and premiums that changed, with a new
+  // context_id whenever the legs move so later premium edits reprice the current ones
+  const liveTicker = stockInfo?.ticker;
+  const liveExpiry = stockInfo?.expiry;
+  const liveStrike = stockInfo?.selected_strike;
+  const hasCustomPremiums = Object.keys(customPremiums).length > 0;
+  useEffect(() => {
+    if (!liveTicker || hasCustomPremiums) return undefined;
+    const socket = new WebSocket(
+      `ws://localhost:8000/ws/options-strategy-pnl?ticker=${liveTicker}` +
+        `&expiry=${liveExpiry}&strike=${liveStrike}`
+    );
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.type === "update") {
+        setStockInfo((prev) => (prev ? applyLiveUpdate(prev, message) : prev));
+      }
+    };
+    return () => socket.close();
+  }, [liveTicker, liveExpiry, liveStrike, hasCustomPremiums]);
+
   useEffect(() => {
     if (
       stockInfo &&
@@ -160,10 +231,14 @@ const App = () => {
 
   // Use selectedStrategy to get premium breakdown for current strategy
   const premiumData =
-    stockInfo?.strategies?.[0]?.premium_breakdown?.[selectedStrategy] || {};
+    stockInfo?.premium_breakdown?.[selectedStrategy] || {};
 
   const strategyLegs = extractLegs(premiumData);
 
+  const payoffSummary = stockInfo?.payoff_summary?.[selectedStrategy];
+  const formatExtreme = (value, unlimited) =>
+    unlimited ? "Unlimited" : `$${Number(value).toFixed(2)}`;
+
   // Premium Change Handler triggers POST ONLY on Enter
   const handlePremiumKeyDown = (e, key) => {
     if (e.key === "Enter") {
@@ -272,6 +347,25 @@ const App = () => {
               ))}
             </div>
           )}
+
+          {payoffSummary && (
+            <div className="selectors-row">
+              <label>
+                Max Profit:{" "}
+                {formatExtreme(payoffSummary.max_profit, payoffSummary.unlimited_profit)}
+              </label>
+              <label>
+                Max Loss:{" "}
+                {formatExtreme(payoffSummary.max_loss, payoffSummary.unlimited_loss)}
+              </label>
+              <label>
+                Breakevens:{" "}
+                {payoffSummary.breakevens.length > 0
+                  ? payoffSummary.breakevens.map((b) => `$${b}`).join(", ")
+                  : "None"}
+              </label>
+            </div>
+          )}
         </div>
       )}
 